@@ -1,12 +1,13 @@
-import csv
 import os
 from pathlib import Path
 import soundfile as sf
 import numpy as np
-from .sync_utils import time_to_seconds
-import librosa
-import demucs.separate
-import shutil
+from .subtitle_table import SubtitleTable
+from .timeline import ms_to_samples
+from .envelope import DEFAULT_ATTACK, DEFAULT_RELEASE, DuckingEnvelope
+from .resample import resample, resample_file
+from .segment_journal import SegmentJournal, probe_segment
+from contextlib import ExitStack
 
 
 def _write_audio_file(path: str | Path, data: np.ndarray, sample_rate: int, subtype: str | None = None) -> None:
@@ -21,162 +22,121 @@ def _write_audio_file(path: str | Path, data: np.ndarray, sample_rate: int, subt
     else:
         sf.write(path, data, sample_rate)
 
-def prepare_and_normalize_accompaniment(acomponiment_temp: Path,
-                                        acomponiment_temp_stereo: Path,
-                                        acompaniment_output: Path,
-                                        sample_rate: int,
-                                        subtype: str = 'PCM_16'):
+def separate_accompaniment(audio: np.ndarray, sample_rate: int, volume_intervals=None, context: float = 2.0,
+                           crossfade: float = 0.5, checkpoint_dir=None, chunk_seconds: float = 60.0,
+                           chunk_overlap: float = 2.0, workers: int = 0, **separation_options) -> np.ndarray:
+    """Accompaniment of ``(frames, channels)`` ``audio`` as stereo float32 at ``sample_rate``.
+
+    Uses the process-wide Demucs model for ``separation_options`` (see
+    :class:`~srt2audiotrack.separation.DemucsSeparator`), so the model is
+    loaded once per process instead of once per film. With
+    ``volume_intervals`` only the subtitle windows are separated and the
+    rest of the track is ``audio`` itself (see
+    :func:`~srt2audiotrack.separation.separate_windows`). With a
+    ``checkpoint_dir`` the audio is separated in ``chunk_seconds`` chunks by
+    ``workers`` processes and finished chunks survive an interruption (see
+    :class:`~srt2audiotrack.separation.ChunkedSeparator`); the pool stays up
+    for the next job. The chunks are kept until the caller has stored a
+    track built from the result and calls :func:`clear_separation_checkpoints`.
     """
-    Read demucs output, resample to sample_rate, ensure stereo and normalize.
-    Returns path to final accompaniment file (acomponiment).
-    """
-    # read with soundfile to keep float32 and channel count intact
-    data, sr_in = sf.read(str(acomponiment_temp), dtype='float32', always_2d=True)  # (frames, channels)
-    channels = data.shape[1]
-
-    # resample per-channel if needed
-    if sr_in != sample_rate:
-        resampled_ch = []
-        for ch in range(channels):
-            resampled_ch.append(librosa.resample(data[:, ch], orig_sr=sr_in, target_sr=sample_rate))
-        # stack channels => (channels, frames) then transpose to (frames, channels)
-        resampled = np.vstack(resampled_ch).T
-        sr_out = sample_rate
+    from .separation import ChunkedSeparator, get_shared_separator, separate_windows
+
+    audio = np.asarray(audio, dtype=np.float32)
+    audio = np.repeat(audio[:, :1], 2, axis=1) if audio.shape[1] == 1 else audio[:, :2]
+    if checkpoint_dir is None:
+        separator = get_shared_separator(**separation_options)
     else:
-        resampled = data
-        sr_out = sr_in
+        separator = ChunkedSeparator(checkpoint_dir, chunk_seconds, chunk_overlap, workers, **separation_options)
+    if volume_intervals is not None:
+        result = separate_windows(separator.accompaniment_many, audio, sample_rate, volume_intervals, context,
+                                  crossfade)
+    else:
+        result = separator.accompaniment(audio, sample_rate)[:, :2]
+    return result
 
-    # write a resampled temp file (don't overwrite demucs original)
-    temp_resampled = Path(acomponiment_temp).with_name(f"{acomponiment_temp.stem}_resampled.flac")
-    _write_audio_file(temp_resampled, resampled, sr_out, subtype=subtype)
 
-    # ensure stereo: if mono duplicate channel, if >2 keep first two
-    if resampled.shape[1] == 1:
-        convert_mono_to_stereo(str(temp_resampled), str(acomponiment_temp_stereo))
-    else:
-        if resampled.shape[1] > 2:
-            res_stereo = resampled[:, :2]
-        else:
-            res_stereo = resampled
-        _write_audio_file(acomponiment_temp_stereo, res_stereo, sr_out, subtype=subtype)
-
-    # normalize the stereo file (uses existing normalize_stereo_audio implementation)
-    normalize_stereo_audio(str(acomponiment_temp_stereo), str(acompaniment_output))
-
-
-def extract_acomponiment_or_vocals(directory, subtitle_name, out_ukr_audio,
-        sample_rate,
-        pipeline_suffix="_extracted.flac",
-        model_demucs = "mdx_extra",
-        sound_name="no_vocals.wav",
-        subtype='PCM_16'  # Use 16-bit PCM
-    ):
-    acomp_output = directory / f"{subtitle_name}{pipeline_suffix}"
-    model_folder = directory / model_demucs
-    demucs_folder = model_folder / out_ukr_audio.stem
-    acomponiment_temp = demucs_folder / sound_name
-    acomponiment_temp_stereo = directory / f"{subtitle_name}{pipeline_suffix}_stereo.flac"
-    demucs.separate.main(["--jobs", "4","-o", str(directory), "--two-stems", "vocals", "-n", model_demucs, str(out_ukr_audio)])
-
-    if acomponiment_temp.exists():
-            prepare_and_normalize_accompaniment(acomponiment_temp,
-                                        acomponiment_temp_stereo,
-                                        acomp_output,
-                                        sample_rate,
-                                        subtype = 'PCM_16')
-            # Load and normalize the audio
-            # y, sr = librosa.load(acomponiment_temp, sr=44100)  # load with 44.1k
-            # y_16k = librosa.resample(y, orig_sr=44100, target_sr=sample_rate)
-            # sf.write(acomponiment_temp, y_16k, sample_rate)
-            # convert_mono_to_stereo(acomponiment_temp, acomponiment_temp_stereo)
-            # normalize_stereo_audio(acomponiment_temp_stereo, acomponiment)
-            # Clean up
-            shutil.rmtree(model_folder)
-
-    # Verify the accompaniment exists and is valid
-    if not acomp_output.exists():
-        raise FileNotFoundError(f"Failed to extract accompaniment: {acomp_output}")
-    return acomp_output
-        
-    
-
-def collect_full_audiotrack(fragments_folder, csv_file, output_audio_file):
-    """Concatenate all audio segments in the specified order from csv_file into a full audio track, using start times to add silence."""
-    audio_segments = []
+def clear_separation_checkpoints(checkpoint_dir) -> None:
+    """Remove the chunks :func:`separate_accompaniment` saved in ``checkpoint_dir``."""
+    from .separation import ChunkedSeparator
+
+    ChunkedSeparator(checkpoint_dir).clear()
+
+
+def read_audio(path: str | Path) -> tuple[np.ndarray, int]:
+    """Read ``path`` as a float32 ``(frames, channels)`` array."""
+
+    return sf.read(str(path), dtype='float32', always_2d=True)
+
+
+def write_audio(path: str | Path, data: np.ndarray, sample_rate: int, subtype: str | None = None) -> None:
+    _write_audio_file(path, data, sample_rate, subtype=subtype)
+
+
+def render_full_audiotrack(fragments_folder, csv_file):
+    """Place all segments of ``csv_file`` at their start times in one mono track.
+
+    The timeline length is computed from the journal or segment headers first, so the
+    track is a single preallocated float32 buffer and every segment lands at
+    ``int(start * sr)``. A segment running past the start of the next line
+    overlaps it instead of delaying every later line; overlaps are summed and
+    the result is hard-limited to ``[-1, 1]``.
+
+    Returns ``(audio, sample_rate)``, or ``(None, None)`` when no segment exists.
+    """
+    placements = []
     sample_rate = None
+    entries = SegmentJournal(fragments_folder).load()
+    for i, start_ms in enumerate(SubtitleTable.load(csv_file)['Start Time'].tolist()):
+        segment_file = os.path.join(fragments_folder, f"segment_{i + 1}.wav")
+        probed = probe_segment(segment_file, entries.get(i))
+        if probed is None:
+            print(f"Warning: Expected segment {segment_file} not found.")
+            continue
+
+        frames, sr = probed
+        # Ensure sample rate consistency
+        if sample_rate is None:
+            sample_rate = sr
+        elif sample_rate != sr:
+            raise ValueError(f"Sample rate mismatch in segment {segment_file}")
+        placements.append((int(ms_to_samples(start_ms, sample_rate)), frames, segment_file))
+
+    if not placements:
+        return None, None
+
+    audio = np.zeros(max(offset + frames for offset, frames, _ in placements), dtype=np.float32)
+    overlaps = 0
+    previous_end = 0
+    for offset, frames, segment_file in placements:
+        wav, _ = sf.read(segment_file, dtype='float32')
+        if wav.ndim > 1:
+            wav = wav.mean(axis=1)
+        wav = wav[:frames]
+        audio[offset:offset + len(wav)] += wav
+        overlaps += offset < previous_end
+        previous_end = max(previous_end, offset + len(wav))
+
+    peak = float(np.max(np.abs(audio)))
+    if peak > 1.0:
+        np.clip(audio, -1.0, 1.0, out=audio)
+    print(f"Placed {len(placements)} segments on a {len(audio) / sample_rate:.1f}s timeline"
+          + (f", {overlaps} overlapping the previous line" if overlaps else ""))
+    return audio, sample_rate
 
-    with open(csv_file, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        previous_end_time = 0.0  # Start at 0 for initial silence
-
-        for i, row in enumerate(reader):
-            start_time_str = row.get('Start Time')
-
-            if start_time_str is None:
-                print(f"Warning: 'Start Time' missing in row {i + 1}. Skipping segment.")
-                continue
-
-            try:
-                start_time = time_to_seconds(start_time_str)
-            except ValueError as e:
-                print(f"Error in row {i + 1}: {e}. Skipping segment.")
-                continue
-
-            segment_file = os.path.join(fragments_folder, f"segment_{i + 1}.wav")
-
-            if os.path.exists(segment_file):
-                wav, sr = sf.read(segment_file)
-
-                # Ensure sample rate consistency
-                if sample_rate is None:
-                    sample_rate = sr
-                elif sample_rate != sr:
-                    raise ValueError(f"Sample rate mismatch in segment {segment_file}")
-
-                # Calculate silence duration (in samples) needed before this segment
-                if start_time > previous_end_time:
-                    silence_duration = int((start_time - previous_end_time) * sample_rate)
-                    silence = np.zeros(silence_duration)
-                    audio_segments.append(silence)
-
-                # Add the current segment
-                audio_segments.append(wav)
-                print(f"Processed start time: {start_time_str} - {previous_end_time/60}")
-                # Update previous_end_time to reflect the end time of the current segment
-                previous_end_time = start_time + len(wav) / sample_rate
-            else:
-                print(f"Warning: Expected segment {segment_file} not found.")
-
-    # Concatenate all segments with silences
-    if audio_segments:
-        full_audio = np.concatenate(audio_segments)
-        _write_audio_file(output_audio_file, full_audio, sample_rate)
-        print(f"Full audio track saved to {output_audio_file}")
-    else:
-        print("No audio segments to concatenate. Please check the input files.")
-
-def convert_mono_to_stereo(input_path: str, output_path: str):
-    # Load mono audio
-    audio, sr = librosa.load(input_path, sr=None, mono=True)
-    if audio.ndim == 1:
-        # Duplicate mono channel to create stereo
-        stereo_audio = np.vstack([audio, audio])
-    else:
-        print("The input file is not mono. Just copying to {output_path}.")
 
-    # Save as stereo WAV
-    _write_audio_file(output_path, stereo_audio.T, sr)
+def mono_to_stereo(audio: np.ndarray) -> np.ndarray:
+    """Return ``audio`` as ``(frames, 2)``; multichannel input is downmixed first."""
 
-    print(f"Converted {input_path} to stereo and saved as {output_path}")
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    return np.repeat(audio[:, None], 2, axis=1)
 
 
-def normalize_stereo_audio(input_path: str, output_path: str, target_db: float = -18.0, max_gain_db: float = 0.0, subtype: str = 'PCM_16'):
+def normalize_stereo(audio: np.ndarray, target_db: float = -18.0, max_gain_db: float = 0.0) -> np.ndarray:
     """
-    Normalize stereo audio per channel to target_db (dBFS).
+    Normalize ``(frames, channels)`` audio per channel to target_db (dBFS).
     Prevents positive boosting above max_gain_db (default 0 dB) and avoids clipping by peak-limiting.
     """
-    # read with soundfile to preserve exact shape/dtype: returns (frames, channels)
-    audio, sr = sf.read(input_path, dtype='float32', always_2d=True)
     if audio.ndim == 1 or audio.shape[1] < 2:
         raise ValueError("The input file is mono. Use a mono-specific normalization function.")
 
@@ -204,49 +164,89 @@ def normalize_stereo_audio(input_path: str, output_path: str, target_db: float =
 
     # final safety clip
     normalized = np.clip(normalized, -1.0, 1.0)
+    return normalized.T.astype(np.float32)
+
 
-    # write back as (frames, channels) with explicit subtype
-    _write_audio_file(output_path, normalized.T.astype(np.float32), sr, subtype=subtype)
-    print(f"Normalized {input_path} to {target_db} dB per channel (max_gain_db={max_gain_db}) and saved as {output_path}")
+def _duck_block(background, accompaniment, original, gain, acomponiment_coef, voice_coef):
+    """``background`` blended towards the other tracks by the per-sample ``gain``."""
+    return background + gain[:, None] * (
+        acomponiment_coef * (accompaniment - background) + voice_coef * (original - background)
+    )
 
 
-def adjust_stereo_volume_with_librosa(
-        original_wav,
-        input_audio,
-        output_audio,
-        volume_intervals,
-        acomponiment,
-        acomponiment_coef,
-        voice_coef,
-    ):
+def mix_voice_intervals(original, background, accompaniment, sample_rate, volume_intervals,
+                        acomponiment_coef, voice_coef, attack=DEFAULT_ATTACK, release=DEFAULT_RELEASE,
+                        blocksize=1 << 16):
+    """Blend the original mix back in under the subtitle intervals.
+
+    All arrays are ``(frames, channels)``; ``volume_intervals`` are
+    ``(start, end)`` times in milliseconds. Outside them the
+    result is ``background``; inside them it is
+    ``background * (1 - acomponiment_coef - voice_coef) + accompaniment * acomponiment_coef
+    + original * voice_coef``, reached over ``attack`` seconds before an
+    interval and left over ``release`` seconds after it (see
+    :class:`~srt2audiotrack.envelope.DuckingEnvelope`).
     """
-    Adjusts the volume of a stereo audio file using librosa.
-
-    :param input_audio: Path to input WAV file
-    :param output_audio: Path to output WAV file
-    :param volume_intervals: List of tuples (start_time, end_time) where volume needs adjustment
-    :param acomponiment: Path to extracted accompaniment audio
-    :param acomponiment_coef: Volume coefficient for the accompaniment track
-    :param voice_coef: Volume coefficient for the original voice
+    y = np.array(background, dtype=np.float32, copy=True)
+    length = min(len(y), len(accompaniment), len(original))
+    envelope = DuckingEnvelope.from_ms(volume_intervals, sample_rate, attack, release)
+    for offset in range(0, length, blocksize):
+        block = slice(offset, min(offset + blocksize, length))
+        gain = envelope.gain(offset, block.stop - offset)
+        if gain is not None:
+            y[block] = _duck_block(y[block], accompaniment[block], original[block], gain,
+                                   acomponiment_coef, voice_coef)
+    return y
+
+
+def _open_audio_writer(path: str | Path, sample_rate: int, channels: int, subtype: str | None = None) -> sf.SoundFile:
+    """Open ``path`` for incremental writing with the format :func:`_write_audio_file` would use."""
+
+    suffix = Path(path).suffix.lower()
+    if suffix == ".flac":
+        return sf.SoundFile(str(path), "w", sample_rate, channels, subtype=subtype or "PCM_16", format="FLAC")
+    if suffix == ".wav":
+        return sf.SoundFile(str(path), "w", sample_rate, channels, subtype=subtype or "PCM_16", format="WAV")
+    return sf.SoundFile(str(path), "w", sample_rate, channels, subtype=subtype)
+
+
+def _read_block(track: sf.SoundFile, frames: int, channels: int) -> np.ndarray:
+    block = track.read(frames, dtype='float32', always_2d=True)
+    if block.shape[1] != channels:
+        block = np.repeat(block[:, :1], channels, axis=1) if block.shape[1] == 1 else block[:, :channels]
+    return block
+
+
+def mix_voice_intervals_to_file(original_path, background_path, accompaniment_path, output_path,
+                                volume_intervals, acomponiment_coef, voice_coef, attack=DEFAULT_ATTACK,
+                                release=DEFAULT_RELEASE, blocksize=1 << 16, subtype=None):
+    """Streaming version of :func:`mix_voice_intervals` with bounded memory.
+
+    The tracks are read ``blocksize`` frames at a time and the result is
+    written block by block, so memory does not grow with the film length.
+    When ``accompaniment_path`` is ``background_path`` the file is read once.
     """
-    # Load audio file with stereo channels
-    y, sr = librosa.load(input_audio, sr=None, mono=False)
-    a, sr = librosa.load(acomponiment, sr=None, mono=False)
-    original, sr = librosa.load(original_wav, sr=None, mono=False)
-
-    # Convert time to sample index
-    for start_time, end_time in volume_intervals:
-        start_time, end_time = time_to_seconds(start_time), time_to_seconds(end_time)
-        start_sample = int(librosa.time_to_samples(float(start_time), sr=sr))
-        end_sample = int(librosa.time_to_samples(float(end_time), sr=sr))
-
-        # Apply volume adjustment in the given range for both channels
-        y[:, start_sample:end_sample] = \
-             y[:, start_sample:end_sample] * (1 - acomponiment_coef - voice_coef) +\
-             a[:, start_sample:end_sample]*acomponiment_coef + \
-             original[:, start_sample:end_sample]*voice_coef
-
-    # Save the modified audio
-    sf.write(output_audio, y.T, sr)  # Transpose y to match the expected shape for stereo
-
-    print(f"Stereo volume adjusted and saved to {output_audio}")
+    with ExitStack() as stack:
+        background = stack.enter_context(sf.SoundFile(str(background_path)))
+        sample_rate, channels = background.samplerate, background.channels
+        original = stack.enter_context(sf.SoundFile(str(original_path)))
+        same = Path(accompaniment_path).resolve() == Path(background_path).resolve()
+        accompaniment = None if same else stack.enter_context(sf.SoundFile(str(accompaniment_path)))
+        output = stack.enter_context(_open_audio_writer(output_path, sample_rate, channels, subtype))
+        envelope = DuckingEnvelope.from_ms(volume_intervals, sample_rate, attack, release)
+        offset = 0
+        while True:
+            y = _read_block(background, blocksize, channels)
+            if not len(y):
+                break
+            a = y if same else _read_block(accompaniment, len(y), channels)
+            o = _read_block(original, len(y), channels)
+            # Beyond the end of a shorter track the background passes through.
+            mixed_frames = min(len(y), len(a), len(o))
+            gain = envelope.gain(offset, mixed_frames)
+            if gain is not None:
+                y[:mixed_frames] = _duck_block(y[:mixed_frames], a[:mixed_frames], o[:mixed_frames], gain,
+                                               acomponiment_coef, voice_coef)
+            output.write(y)
+            offset += len(y)
+    print(f"Stereo volume adjusted and saved to {output_path}")
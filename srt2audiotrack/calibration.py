@@ -0,0 +1,137 @@
+"""Speed calibration sweep for a speaker reference (``speeds.csv``)."""
+
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+
+from .hashing import file_digest, text_digest
+from .lazy_imports import cache_dir
+
+CALIBRATION_TEXT = (
+    "Some call me nature, others call me mother nature. Let's try some long text. "
+    "We are just trying to get more fidelity. It's OK!"
+)
+CALIBRATION_SPEEDS = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 1.8, 1.9,
+                      2.0, 2.1, 2.2, 2.3, 2.4, 2.5]
+# Bump when the sweep changes in a way that invalidates cached ``speeds.csv`` files.
+CALIBRATION_VERSION = 1
+KEY_SUFFIX = ".sha1"
+
+
+def calibration_key(ref_file: str | Path, ref_text: str) -> str:
+    """Identity of a calibration: reference audio, its text and the sweep itself."""
+
+    return text_digest(CALIBRATION_VERSION, file_digest(ref_file), ref_text, CALIBRATION_TEXT,
+                       *CALIBRATION_SPEEDS)
+
+
+def interpolate_durations(measured: dict[float, float], speeds: Sequence[float]) -> list[float]:
+    """Interpolate durations for ``speeds`` from the ``measured`` points.
+
+    F5-TTS sizes its output as ``length / speed``, so duration is close to
+    linear in ``1 / speed``; interpolating there keeps the curve exact for
+    an ideal voice and monotone for a real one.
+    """
+
+    points = sorted(measured.items(), key=lambda item: 1.0 / item[0])
+    inverse = np.array([1.0 / speed for speed, _ in points])
+    durations = np.array([duration for _, duration in points])
+    return np.interp(1.0 / np.asarray(speeds, dtype=float), inverse, durations).tolist()
+
+
+def adaptive_sweep(
+    measure: Callable[[list[float]], list[float]],
+    speeds: Sequence[float] = CALIBRATION_SPEEDS,
+    anchors: int = 3,
+    tolerance: float = 0.03,
+) -> tuple[list[float], set[float]]:
+    """Measure as few ``speeds`` as needed to describe the duration curve.
+
+    ``measure(speeds)`` synthesizes a batch of speeds and returns their
+    durations. ``anchors`` evenly spaced speeds are measured first; then the
+    midpoint of every gap between measured speeds is measured in one batch
+    per round. A gap whose midpoint lands within ``tolerance`` (relative) of
+    the interpolated value is considered smooth and filled by interpolation,
+    otherwise both halves are refined.
+
+    Returns the durations for all ``speeds`` and the set of measured speeds.
+    """
+
+    speeds = sorted(speeds)
+    last = len(speeds) - 1
+    measured: dict[float, float] = {}
+
+    def run(indices):
+        for index, duration in zip(indices, measure([speeds[index] for index in indices])):
+            measured[speeds[index]] = duration
+
+    indices = sorted({round(n * last / max(anchors - 1, 1)) for n in range(max(anchors, 2))})
+    run(indices)
+    gaps = [(lo, hi) for lo, hi in zip(indices, indices[1:]) if hi - lo > 1]
+    while gaps:
+        mids = [(lo + hi) // 2 for lo, hi in gaps]
+        run(mids)
+        refine = []
+        for (lo, hi), mid in zip(gaps, mids):
+            bounds = {speeds[lo]: measured[speeds[lo]], speeds[hi]: measured[speeds[hi]]}
+            predicted = interpolate_durations(bounds, [speeds[mid]])[0]
+            actual = measured[speeds[mid]]
+            if abs(predicted - actual) <= tolerance * actual:
+                continue
+            refine.extend(gap for gap in ((lo, mid), (mid, hi)) if gap[1] - gap[0] > 1)
+        gaps = refine
+    return interpolate_durations(measured, speeds), set(measured)
+
+
+def _shared_copy(key: str) -> Path:
+    return cache_dir() / "calibration" / f"{key}.csv"
+
+
+def _key_file(speeds_file: Path) -> Path:
+    return speeds_file.with_name(speeds_file.name + KEY_SUFFIX)
+
+
+def _copy_atomic(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".part")
+    shutil.copyfile(source, partial)
+    os.replace(partial, target)
+
+
+def restore(speeds_file: str | Path, key: str) -> bool:
+    """Make ``speeds_file`` hold the calibration ``key`` without synthesizing.
+
+    A ``speeds.csv`` written before keys existed is adopted as is. Returns
+    ``False`` when the voice has to be (re)calibrated.
+    """
+
+    speeds_file = Path(speeds_file)
+    key_file = _key_file(speeds_file)
+    if speeds_file.is_file():
+        if not key_file.is_file():
+            store(speeds_file, key)
+            return True
+        if key_file.read_text(encoding="utf-8").strip() == key:
+            return True
+    shared = _shared_copy(key)
+    if shared.is_file():
+        _copy_atomic(shared, speeds_file)
+        key_file.write_text(key, encoding="utf-8")
+        return True
+    return False
+
+
+def store(speeds_file: str | Path, key: str) -> None:
+    """Record ``speeds_file`` as calibration ``key`` locally and in the user cache."""
+
+    speeds_file = Path(speeds_file)
+    _key_file(speeds_file).write_text(key, encoding="utf-8")
+    try:
+        _copy_atomic(speeds_file, _shared_copy(key))
+    except OSError as exc:
+        print(f"Could not cache calibration {speeds_file}: {exc}")
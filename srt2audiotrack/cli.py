@@ -1,11 +1,14 @@
 import argparse
+import importlib
 import os
 import socket
+import time
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable
 
 from .subtitle_csv import get_speakers_from_folder, check_texts, check_speeds_csv
 from .vocabulary import check_vocabular
+from .lazy_imports import LazyModule
 from .pipeline import SubtitlePipeline, ActivePipelineLockError
 
 
@@ -72,6 +75,18 @@ def main():
     parser.add_argument('--acomponiment_coef', type=float, help="Acomponiment coeficient", default=0.2)
     # Add voice coeficient
     parser.add_argument('--voice_coef', type=float, help="Voice coeficient", default=0.2)
+    parser.add_argument(
+        '--duck-attack-ms',
+        type=float,
+        help="Fade into the original mix over this many milliseconds before each line",
+        default=50.0,
+    )
+    parser.add_argument(
+        '--duck-release-ms',
+        type=float,
+        help="Fade out of the original mix over this many milliseconds after each line",
+        default=50.0,
+    )
     # Add output folder
     parser.add_argument('--output_folder', type=str, help="Output folder", default="")
     # Job manifest and coordination options
@@ -99,6 +114,152 @@ def main():
         help="Seconds between lock heartbeat updates",
         default=60.0,
     )
+    parser.add_argument(
+        '--tts-batch-size',
+        type=int,
+        help="Number of subtitle lines of one speaker synthesized per F5-TTS forward pass",
+        default=1,
+    )
+    parser.add_argument(
+        '--tts-duration-mode',
+        choices=["fixed", "search"],
+        help="Size the first take from the subtitle duration and speeds.csv (fixed) "
+             "or search for a speed by regenerating (search)",
+        default="fixed",
+    )
+    parser.add_argument(
+        '--stt-device',
+        type=str,
+        help="Device for Whisper validation (e.g. cpu, cuda:1); defaults to Whisper's choice",
+        default="",
+    )
+    parser.add_argument(
+        '--stt-backend',
+        choices=["openai", "faster-whisper"],
+        help="Speech-to-text backend used to validate generated segments",
+        default="openai",
+    )
+    parser.add_argument(
+        '--stt-model',
+        type=str,
+        help="Whisper model name used for validation",
+        default="large-v3",
+    )
+    parser.add_argument(
+        '--stt-compute-type',
+        type=str,
+        help="CTranslate2 compute type for the faster-whisper backend (int8, int8_float16, float16...)",
+        default="int8",
+    )
+    parser.add_argument(
+        '--stt-fast-model',
+        type=str,
+        help="Small Whisper model (e.g. tiny, base) that checks every segment first; "
+        "only segments it does not accept are re-checked with --stt-model",
+        default="",
+    )
+    parser.add_argument(
+        '--validation-accept-similarity',
+        type=float,
+        help="Similarity at which the fast model's transcription is accepted without escalation",
+        default=1.0,
+    )
+    parser.add_argument(
+        '--validation-short-chars',
+        type=int,
+        help="Lines with fewer characters count as short for --validation-short-sample",
+        default=0,
+    )
+    parser.add_argument(
+        '--validation-short-sample',
+        type=float,
+        help="Fraction of short lines that are validated at all (0 skips them, 1 checks all)",
+        default=1.0,
+    )
+    parser.add_argument(
+        '--segment-cache-dir',
+        type=str,
+        help="Directory of a content-addressed cache of synthesized lines shared by jobs and workers",
+        default="",
+    )
+    parser.add_argument(
+        '--segment-cache-size-gb',
+        type=float,
+        help="Size at which least recently used cache entries are evicted",
+        default=10.0,
+    )
+    parser.add_argument(
+        '--checkpoint',
+        # "none" keeps every track in memory and muxes nothing, so it is only
+        # offered to library users through SubtitlePipeline.render_audio().
+        choices=["all", "final"],
+        help="Full-length tracks written to the job folder: all of them or only the two the mux needs",
+        default="all",
+    )
+    parser.add_argument(
+        '--csv-views',
+        action='store_true',
+        help="Also write the intermediate subtitle tables as CSV (the last one is always written)",
+    )
+    parser.add_argument('--demucs-model', type=str, help="Demucs model used to separate the accompaniment",
+                        default="mdx_extra")
+    parser.add_argument(
+        '--demucs-segment',
+        type=float,
+        help="Length in seconds of the chunks Demucs processes at once (0 uses the model's default)",
+        default=0.0,
+    )
+    parser.add_argument(
+        '--separation-scope',
+        choices=["full", "windows"],
+        help="Separate the whole soundtrack, or only the subtitle windows and keep the original mix elsewhere",
+        default="full",
+    )
+    parser.add_argument(
+        '--separation-context',
+        type=float,
+        help="Seconds of context around each subtitle window in --separation-scope windows",
+        default=2.0,
+    )
+    parser.add_argument(
+        '--demucs-chunk-seconds',
+        type=float,
+        help="Separate the soundtrack in chunks of this length, in parallel and resumably (0 = one call)",
+        default=60.0,
+    )
+    parser.add_argument(
+        '--demucs-workers',
+        type=int,
+        help="Processes separating chunks (0 = sized to the machine, one on CUDA)",
+        default=0,
+    )
+    parser.add_argument('--demucs-overlap', type=float, help="Overlap between Demucs chunks", default=0.25)
+    parser.add_argument('--demucs-shifts', type=int, help="Random shifts averaged by Demucs (slower, better)",
+                        default=1)
+    parser.add_argument('--demucs-threads', type=int, help="CPU threads for Demucs (0 keeps torch's default)",
+                        default=0)
+    parser.add_argument(
+        '--output-sample-rate',
+        type=int,
+        help="Sample rate of the soundtrack: extracted, separated, mixed and encoded at it",
+        default=44100,
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help="Keep models loaded and keep consuming jobs from --job-manifest-dir",
+    )
+    parser.add_argument(
+        '--poll-interval',
+        type=float,
+        help="Seconds the daemon waits before re-reading an idle manifest directory",
+        default=30.0,
+    )
+    parser.add_argument(
+        '--exit-when-idle',
+        action='store_true',
+        help="Stop the daemon after a pass that finds no pending job instead of polling",
+    )
 
     # Parse the arguments
     args = parser.parse_args()
@@ -120,6 +281,10 @@ def main():
     worker_id = args.worker_id or _default_worker_id()
     lock_timeout = args.lock_timeout
     heartbeat_interval = args.lock_heartbeat
+    daemon = args.daemon
+    if daemon and not job_manifest_dir:
+        print("--daemon requires --job-manifest-dir.")
+        exit(1)
 
     print(f"Processing folder: {subtitle}")
 
@@ -127,7 +292,18 @@ def main():
 
     vocabular_pth = check_vocabular(voice_dir)
     check_texts(voice_dir)
-    check_speeds_csv(voice_dir)
+    tts_options = {
+        "stt_backend": args.stt_backend,
+        "stt_model": args.stt_model,
+        "stt_compute_type": args.stt_compute_type,
+        "stt_fast_model": args.stt_fast_model or None,
+        "validation_accept_similarity": args.validation_accept_similarity,
+        "validation_short_chars": args.validation_short_chars,
+        "validation_short_sample": args.validation_short_sample,
+    }
+    if args.stt_device:
+        tts_options["stt_device"] = args.stt_device
+    check_speeds_csv(voice_dir, tts_options=tts_options)
 
     speakers = get_speakers_from_folder(voice_dir)
     if not speakers:
@@ -135,6 +311,52 @@ def main():
         exit(1)
     default_speaker = speakers.get(speakers["default_speaker_name"])
 
+    pipeline_settings = {
+        "vocabular": vocabular_pth,
+        "speakers": speakers,
+        "default_speaker": default_speaker,
+        "acomponiment_coef": acomponiment_coef,
+        "voice_coef": voice_coef,
+        "output_folder": output_folder,
+        "tts_batch_size": max(args.tts_batch_size, 1),
+        "tts_duration_mode": args.tts_duration_mode,
+        "tts_options": tts_options,
+        "segment_cache_dir": args.segment_cache_dir or None,
+        "segment_cache_max_bytes": int(args.segment_cache_size_gb * 1024**3),
+        "checkpoint": args.checkpoint,
+        "csv_views": args.csv_views,
+        "duck_attack": max(args.duck_attack_ms, 0.0) / 1000,
+        "duck_release": max(args.duck_release_ms, 0.0) / 1000,
+        "separation_options": {
+            "model": args.demucs_model,
+            "segment": args.demucs_segment or None,
+            "overlap": args.demucs_overlap,
+            "shifts": max(args.demucs_shifts, 1),
+            "threads": max(args.demucs_threads, 0),
+        },
+        "separation_scope": args.separation_scope,
+        "separation_context": max(args.separation_context, 0.0),
+        "separation_chunk_seconds": max(args.demucs_chunk_seconds, 0.0),
+        "separation_workers": max(args.demucs_workers, 0),
+        "output_sample_rate": args.output_sample_rate,
+    }
+    run_settings = {
+        "worker_id": worker_id,
+        "lock_timeout": lock_timeout,
+        "heartbeat_interval": heartbeat_interval,
+    }
+
+    if daemon:
+        run_worker(
+            job_manifest_dir,
+            pipeline_settings,
+            videoext,
+            poll_interval=args.poll_interval,
+            exit_when_idle=args.exit_when_idle,
+            **run_settings,
+        )
+        return
+
     if job_manifest_dir:
         sbt_paths = load_jobs_from_manifest(job_manifest_dir)
     else:
@@ -147,19 +369,40 @@ def main():
         if Path(subtitle).is_file():
             sbt_paths = [Path(subtitle)]
 
+    process_jobs(sbt_paths, pipeline_settings, videoext, **run_settings)
+
+
+def process_jobs(
+    sbt_paths: Iterable[Path],
+    pipeline_settings: dict,
+    videoext: str,
+    *,
+    worker_id: str,
+    lock_timeout: float,
+    heartbeat_interval: float,
+    tts_engine=None,
+    failed: set[Path] | None = None,
+    pipeline_factory: Callable[..., SubtitlePipeline] = SubtitlePipeline,
+) -> int:
+    """Run the pipeline for every subtitle whose muxed video is missing.
+
+    Pipelines without an injected ``tts_engine`` use the process-wide shared
+    engine, so the models stay resident between jobs. When ``failed`` is given,
+    a failing job is recorded there and skipped instead of aborting the run.
+    Returns the number of jobs that were processed.
+    """
+    processed = 0
     for subtitle in sbt_paths:
+        if failed is not None and subtitle in failed:
+            continue
         video_path = subtitle.with_suffix(videoext)
         ready_video_file_name = subtitle.stem + "_out_mix.mp4"
         ready_video_path = video_path.parent / ready_video_file_name
         if video_path.is_file() and not ready_video_path.is_file():
-            pipeline = SubtitlePipeline(
+            pipeline = pipeline_factory(
                 subtitle,
-                vocabular_pth,
-                speakers,
-                default_speaker,
-                acomponiment_coef,
-                voice_coef,
-                output_folder,
+                tts_engine=tts_engine,
+                **pipeline_settings,
             )
             if SubtitlePipeline.cleanup_stale_lock(pipeline.directory, lock_timeout):
                 print(f"Recovered stale lock for {subtitle}. Re-claiming job.")
@@ -170,12 +413,78 @@ def main():
                     heartbeat_interval=heartbeat_interval,
                     lock_timeout=lock_timeout,
                 )
+                processed += 1
             except ActivePipelineLockError:
                 print(
                     f"Lock already active for {subtitle}. Skipping job for worker {worker_id}."
                 )
+            except Exception as exc:
+                if failed is None:
+                    raise
+                print(f"Job {subtitle} failed: {exc}. It will not be retried by this worker.")
+                failed.add(subtitle)
+    return processed
 
 
+def run_worker(
+    manifest_dir: Path,
+    pipeline_settings: dict,
+    videoext: str,
+    *,
+    worker_id: str,
+    lock_timeout: float,
+    heartbeat_interval: float,
+    poll_interval: float = 30.0,
+    max_iterations: int | None = None,
+    exit_when_idle: bool = False,
+    tts_engine=None,
+    pipeline_factory: Callable[..., SubtitlePipeline] = SubtitlePipeline,
+) -> None:
+    """Keep draining ``manifest_dir`` with models loaded once per process.
+
+    The manifest directory is re-read on every iteration, so new manifest
+    files and new lines are picked up without restarting the worker. When a
+    pass finds nothing to do the worker sleeps for ``poll_interval`` seconds,
+    or stops with ``exit_when_idle``. Every job gets the same ``tts_engine``;
+    by default the shared engine for ``pipeline_settings["tts_options"]``,
+    loaded when the first job needs it.
+    """
+    if tts_engine is None:
+        tts_options = pipeline_settings.get("tts_options") or {}
+        tts_engine = LazyModule(
+            "F5TTS",
+            loader=lambda: importlib.import_module(f"{__package__}.tts_audio").get_shared_tts(**tts_options),
+        )
+    failed: set[Path] = set()
+    iteration = 0
+    print(f"Worker {worker_id} watching {manifest_dir}")
+    try:
+        while max_iterations is None or iteration < max_iterations:
+            iteration += 1
+            try:
+                sbt_paths = load_jobs_from_manifest(manifest_dir)
+            except FileNotFoundError as exc:
+                print(exc)
+                sbt_paths = []
+            processed = process_jobs(
+                sbt_paths,
+                pipeline_settings,
+                videoext,
+                worker_id=worker_id,
+                lock_timeout=lock_timeout,
+                heartbeat_interval=heartbeat_interval,
+                tts_engine=tts_engine,
+                failed=failed,
+                pipeline_factory=pipeline_factory,
+            )
+            if not processed:
+                if exit_when_idle:
+                    print(f"Worker {worker_id}: no pending jobs, exiting.")
+                    break
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print(f"Worker {worker_id} stopped.")
+
 
 if __name__ == "__main__":
     main()
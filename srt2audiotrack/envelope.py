@@ -0,0 +1,82 @@
+"""Ducking gain envelope for blending the original mix under subtitle lines."""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from .timeline import ms_to_samples
+
+# Default ramp lengths (seconds) in and out of a ducked interval.
+DEFAULT_ATTACK = 0.05
+DEFAULT_RELEASE = 0.05
+
+# Stand-in for a zero-length ramp so the breakpoints stay strictly increasing.
+_EDGE = 1e-3
+
+
+class DuckingEnvelope:
+    """Piecewise-linear gain in ``[0, 1]`` over sample positions.
+
+    The gain is 1 on every sample of an interval, ramps up over ``attack``
+    seconds before it and back down over ``release`` seconds after it.
+    Intervals are sorted and coalesced once: overlapping or adjacent ones, and
+    ones so close that their ramps would meet, become a single interval, so
+    each sample is covered by at most one ramp. With zero ramps this reduces
+    to the hard switch at ``int(seconds * sample_rate)``.
+    """
+
+    def __init__(
+        self,
+        intervals: Iterable[tuple[int, int]],
+        sample_rate: int,
+        attack: float = DEFAULT_ATTACK,
+        release: float = DEFAULT_RELEASE,
+    ) -> None:
+        self.sample_rate = sample_rate
+        attack_samples = max(attack * sample_rate, _EDGE)
+        release_samples = max(release * sample_rate, _EDGE)
+
+        merged: list[list[int]] = []
+        for start, end in sorted((start, end) for start, end in intervals if end > start):
+            if merged and start - attack_samples <= merged[-1][1] - 1 + release_samples:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.intervals = [tuple(span) for span in merged]
+
+        spans = np.array(merged, dtype=np.float64).reshape(-1, 2)
+        starts, last = spans[:, 0], spans[:, 1] - 1
+        self._x = np.stack(
+            [starts - attack_samples, starts, last, last + release_samples], axis=1
+        ).ravel()
+        self._y = np.tile([0.0, 1.0, 1.0, 0.0], len(merged))
+
+    @classmethod
+    def from_ms(
+        cls,
+        volume_intervals,
+        sample_rate: int,
+        attack: float = DEFAULT_ATTACK,
+        release: float = DEFAULT_RELEASE,
+    ) -> "DuckingEnvelope":
+        """Build the envelope from ``(start, end)`` subtitle times in integer milliseconds.
+
+        ``volume_intervals`` is an ``(n, 2)`` array such as the one returned by
+        :func:`~srt2audiotrack.ffmpeg_utils.parse_volume_intervals`, or pairs.
+        """
+
+        spans = ms_to_samples(np.asarray(volume_intervals, dtype=np.int64).reshape(-1, 2), sample_rate)
+        return cls(map(tuple, spans.tolist()), sample_rate, attack, release)
+
+    def gain(self, offset: int, frames: int) -> np.ndarray | None:
+        """Gain of samples ``offset .. offset + frames``, or ``None`` where it is all zero."""
+
+        if not len(self._x) or offset >= self._x[-1] or offset + frames <= self._x[0]:
+            return None
+        first, last = np.searchsorted(self._x, [offset, offset + frames])
+        if first == last and first % 4 == 0:
+            return None  # the block falls in a gap between two intervals
+        positions = np.arange(offset, offset + frames, dtype=np.float64)
+        return np.interp(positions, self._x, self._y, left=0.0, right=0.0).astype(np.float32)
@@ -1,14 +1,16 @@
-import csv
 import ffmpeg
+import numpy as np
 
+from .subtitle_table import SubtitleTable
 
-# Read CSV file to get volume reduction time intervals
-def parse_volume_intervals(csv_file) -> list[tuple[str, str]]:
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        return [(row['Start Time'], row['End Time']) for row in reader]
 
-def extract_audio(input_video, output_audio, target_lufs=-16.0, target_peak=-1.0):
+# Read the subtitle table to get volume reduction time intervals
+def parse_volume_intervals(csv_file) -> np.ndarray:
+    """``(n, 2)`` ``int64`` array of the subtitle ``(start, end)`` times in milliseconds."""
+    table = SubtitleTable.load(csv_file)
+    return np.stack([table['Start Time'], table['End Time']], axis=1).astype(np.int64, copy=False)
+
+def extract_audio(input_video, output_audio, target_lufs=-16.0, target_peak=-1.0, sample_rate=44100):
     """Extract and normalize audio from video file.
     
     Args:
@@ -16,6 +18,8 @@ def extract_audio(input_video, output_audio, target_lufs=-16.0, target_peak=-1.0
         output_audio: Path to save output audio file
         target_lufs: Target loudness in LUFS (default: -16.0, typical for streaming)
         target_peak: True peak value in dB (default: -1.0)
+        sample_rate: Output sample rate; ffmpeg resamples once while decoding
+            (default: 44100, the rate Demucs separates at)
     """
     (
         ffmpeg
@@ -26,7 +30,7 @@ def extract_audio(input_video, output_audio, target_lufs=-16.0, target_peak=-1.0
                 tp=target_peak)
         .output(str(output_audio),
                 acodec='flac',
-                ar='48000',
+                ar=str(sample_rate),
                 ac=2
                 )
         .overwrite_output()
@@ -34,7 +38,7 @@ def extract_audio(input_video, output_audio, target_lufs=-16.0, target_peak=-1.0
     )
 
 # Create the ffmpeg command to mix two audio files
-def create_ffmpeg_mix_video_file_command(video_file, audio_file_1, audio_file_2, output_video):
+def create_ffmpeg_mix_video_file_command(video_file, audio_file_1, audio_file_2, output_video, sample_rate=44100):
     """Create an FFmpeg command that mixes two audio files into ``video_file``."""
 
     video = ffmpeg.input(str(video_file))
@@ -51,11 +55,11 @@ def create_ffmpeg_mix_video_file_command(video_file, audio_file_1, audio_file_2,
             vcodec="copy",
             acodec="aac",
             audio_bitrate="320k",
-            ar=44100,
+            ar=sample_rate,
         ).overwrite_output()
     )
 
-def create_ffmpeg_mix_video(video_file, audio_file_1, audio_file_2, output_video):
+def create_ffmpeg_mix_video(video_file, audio_file_1, audio_file_2, output_video, sample_rate=44100):
     """Create an FFmpeg command that mixes two audio files into ``video_file``."""
 
     video = ffmpeg.input(str(video_file))
@@ -72,7 +76,7 @@ def create_ffmpeg_mix_video(video_file, audio_file_1, audio_file_2, output_video
             vcodec="copy",
             acodec="aac",
             audio_bitrate="320k",
-            ar=44100,
+            ar=sample_rate,
         ).overwrite_output()
     )
 
@@ -0,0 +1,51 @@
+"""Content hashing helpers shared by the caches."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+_CHUNK_SIZE = 1 << 20
+
+# (resolved path, size, mtime_ns) -> hex digest
+_digest_cache: dict[tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str | Path) -> str:
+    """Return the SHA-1 hex digest of a file's content.
+
+    Digests are memoized per ``(path, size, mtime)`` so repeated lookups for an
+    unchanged file only cost a ``stat`` call.
+    """
+
+    resolved = str(Path(path).resolve())
+    stat = os.stat(resolved)
+    key = (resolved, stat.st_size, stat.st_mtime_ns)
+    digest = _digest_cache.get(key)
+    if digest is None:
+        sha1 = hashlib.sha1()
+        with open(resolved, "rb") as handle:
+            for chunk in iter(lambda: handle.read(_CHUNK_SIZE), b""):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+        _digest_cache[key] = digest
+    return digest
+
+
+def text_digest(*parts: object) -> str:
+    """Return the SHA-1 hex digest of ``parts`` joined by a separator."""
+
+    joined = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+def array_digest(array, *parts: object) -> str:
+    """Return the SHA-1 hex digest of an array's samples, shape and ``parts``."""
+
+    import numpy as np
+
+    array = np.ascontiguousarray(array)
+    sha1 = hashlib.sha1(text_digest(array.dtype, array.shape, *parts).encode("ascii"))
+    sha1.update(memoryview(array).cast("B"))
+    return sha1.hexdigest()
@@ -0,0 +1,143 @@
+"""Deferred imports for the heavy runtime dependencies.
+
+Importing torch, f5_tts, whisper, demucs or librosa costs seconds, so the
+pipeline modules only pull them in when the stage that needs them runs.
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+# Modules that must not be imported by ``python -m srt2audiotrack --help``.
+HEAVY_MODULES = (
+    "torch",
+    "f5_tts",
+    "hydra",
+    "whisper",
+    "faster_whisper",
+    "cached_path",
+    "demucs",
+    "librosa",
+    "numba",
+    "pandas",
+)
+
+# Wall-clock budget for importing the CLI in a fresh interpreter.
+STARTUP_BUDGET_SECONDS = float(os.environ.get("SRT2AUDIOTRACK_STARTUP_BUDGET", "1.5"))
+
+
+def cache_dir() -> Path:
+    """Return the per-user cache directory used by srt2audiotrack."""
+
+    base = os.environ.get("SRT2AUDIOTRACK_CACHE_DIR")
+    if base:
+        return Path(base)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    return (Path(xdg) if xdg else Path.home() / ".cache") / "srt2audiotrack"
+
+
+def import_librosa():
+    """Import librosa with a persistent numba cache.
+
+    librosa compiles its numba kernels with ``cache=True``; pointing
+    ``NUMBA_CACHE_DIR`` at a writable directory lets later processes load the
+    compiled code instead of JIT-compiling it again.
+    """
+
+    if "librosa" not in sys.modules:
+        numba_dir = cache_dir() / "numba"
+        numba_dir.mkdir(parents=True, exist_ok=True)
+        os.environ.setdefault("NUMBA_CACHE_DIR", str(numba_dir))
+    return importlib.import_module("librosa")
+
+
+class LazyModule:
+    """Proxy that imports ``name`` on first attribute access."""
+
+    def __init__(self, name: str, loader: Callable[[], object] | None = None) -> None:
+        self._name = name
+        self._loader = loader
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            if self._loader is not None:
+                self._module = self._loader()
+            else:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def measure_startup(module: str = "srt2audiotrack.cli") -> tuple[float, list[str]]:
+    """Import ``module`` in a fresh interpreter.
+
+    Returns the wall-clock import time in seconds and the heavy modules the
+    import loaded or tried to load. Attempts are recorded by a meta path
+    finder, so an eager import is caught even where the heavy package is not
+    installed.
+    """
+
+    code = (
+        "import sys, time\n"
+        f"HEAVY = {HEAVY_MODULES!r}\n"
+        "attempted = set()\n"
+        "class Watch:\n"
+        "    def find_spec(self, name, path=None, target=None):\n"
+        "        if name.partition('.')[0] in HEAVY:\n"
+        "            attempted.add(name.partition('.')[0])\n"
+        "        return None\n"
+        "sys.meta_path.insert(0, Watch())\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "heavy = [m for m in HEAVY if m in attempted or m in sys.modules]\n"
+        "print(elapsed)\n"
+        "print(','.join(heavy))\n"
+    )
+    root = Path(__file__).resolve().parents[1]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(root), env.get("PYTHONPATH", "")]))
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    lines = result.stdout.strip().splitlines()
+    elapsed = float(lines[0]) if lines else time.perf_counter() - started
+    heavy = [name for name in (lines[1].split(",") if len(lines) > 1 else []) if name]
+    return elapsed, heavy
+
+
+def check_startup_budget(
+    module: str = "srt2audiotrack.cli",
+    budget: float = STARTUP_BUDGET_SECONDS,
+) -> tuple[bool, float, list[str]]:
+    """Return whether importing ``module`` stays within ``budget`` seconds
+    without loading any of :data:`HEAVY_MODULES`."""
+
+    elapsed, heavy = measure_startup(module)
+    return elapsed <= budget and not heavy, elapsed, heavy
+
+
+if __name__ == "__main__":
+    ok, elapsed, heavy = check_startup_budget()
+    print(f"startup: {elapsed:.3f}s (budget {STARTUP_BUDGET_SECONDS:.3f}s)")
+    if heavy:
+        print(f"heavy modules imported: {', '.join(heavy)}")
+    sys.exit(0 if ok else 1)
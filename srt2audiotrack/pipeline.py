@@ -12,14 +12,20 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
-import librosa
 
 from . import subtitle_csv
-from . import tts_audio
-from . import sync_utils
-from . import audio_utils
-from . import ffmpeg_utils
 from . import vocabulary
+from .lazy_imports import LazyModule, import_librosa
+from .resample import RatePlan
+from .stages import StageManifest
+from .subtitle_table import snapshot_path, table_files
+
+
+# Which full-length tracks are written to the job directory: every one, only
+# those the final mux needs (_5.3 and _6), or none.
+CHECKPOINT_POLICIES = ("all", "final", "none")
+# Whether Demucs separates the whole soundtrack or only the subtitle windows.
+SEPARATION_SCOPES = ("full", "windows")
 
 
 class PipelineLockError(RuntimeError):
@@ -38,6 +44,19 @@ class _LockConfig:
     stale_timeout: float
 
 
+@dataclass(frozen=True)
+class _AudioSource:
+    """How later stages get the buffer of a full-length audio stage."""
+
+    path: Path
+    run: Callable[[], None]
+    # What a stage reading the buffer fingerprints: the file when persisted,
+    # otherwise the inputs and parameters of the stage that makes it.
+    inputs: list
+    params: dict
+    persisted: bool
+
+
 class _PipelineLock(AbstractContextManager[None]):
     """Context manager that manages a lock file for a pipeline run."""
 
@@ -158,12 +177,32 @@ class SubtitlePipeline:
         *,
         vocabulary_module=vocabulary,
         subtitle_csv_module=subtitle_csv,
-        tts_audio_module=tts_audio,
-        sync_utils_module=sync_utils,
-        audio_utils_module=audio_utils,
-        ffmpeg_utils_module=ffmpeg_utils,
-        librosa_module=librosa,
+        tts_audio_module=None,
+        sync_utils_module=None,
+        audio_utils_module=None,
+        ffmpeg_utils_module=None,
+        librosa_module=None,
+        tts_engine=None,
+        tts_options: dict | None = None,
+        tts_batch_size: int = 1,
+        tts_duration_mode: str = "fixed",
+        segment_cache_dir: str | Path | None = None,
+        segment_cache_max_bytes: int = 10 * 1024**3,
+        checkpoint: str = "all",
+        duck_attack: float = 0.05,
+        duck_release: float = 0.05,
+        separation_options: dict | None = None,
+        separation_scope: str = "full",
+        separation_context: float = 2.0,
+        separation_chunk_seconds: float = 60.0,
+        separation_workers: int = 0,
+        output_sample_rate: int = 44100,
+        csv_views: bool = False,
     ) -> None:
+        if checkpoint not in CHECKPOINT_POLICIES:
+            raise ValueError(f"Unknown checkpoint policy {checkpoint!r}, expected one of {CHECKPOINT_POLICIES}")
+        if separation_scope not in SEPARATION_SCOPES:
+            raise ValueError(f"Unknown separation scope {separation_scope!r}, expected one of {SEPARATION_SCOPES}")
         # Convert string paths to Path objects if needed
         self.subtitle = Path(subtitle) if isinstance(subtitle, str) else subtitle
         self.vocabular = Path(vocabular) if isinstance(vocabular, str) else vocabular
@@ -178,6 +217,24 @@ class SubtitlePipeline:
         self.default_speaker = default_speaker
         self.acomponiment_coef = acomponiment_coef
         self.voice_coef = voice_coef
+        # Ramps (seconds) into and out of the original mix around each line.
+        self.duck_attack = duck_attack
+        self.duck_release = duck_release
+        # Keyword arguments of the shared Demucs separator (model, segment, overlap...).
+        self.separation_options = dict(separation_options or {})
+        # "windows" separates only the padded subtitle intervals and keeps the
+        # original mix elsewhere.
+        self.separation_scope = separation_scope
+        self.separation_context = separation_context
+        # Chunks separated in parallel and checkpointed under the job folder;
+        # 0 separates the track in one call.
+        self.separation_chunk_seconds = separation_chunk_seconds
+        self.separation_workers = separation_workers
+        # Subtitle tables are handed on as snapshots; their CSV views are
+        # written for the intermediate stages only on request.
+        self.csv_views = csv_views
+        # The soundtrack is extracted at the output rate and stays there.
+        self.rates = RatePlan.for_output(output_sample_rate)
         self.subtitle_name: str = self.subtitle.stem
 
         self.directory: Path = self.output_folder / self.subtitle.stem
@@ -197,15 +254,31 @@ class SubtitlePipeline:
         self.output_ukr_audio = self.directory / f"{self.subtitle_name}_6_out_reduced_ukr.flac"
         
         self.mix_video = self.output_folder / f"{self.subtitle_name}_out_mix.mp4"
+        self.separation_chunk_dir = self.directory / "separation_chunks"
         self.sample_rate = None
+        # Fingerprints of the stages already run for this job.
+        self.stages = StageManifest(self.directory)
+        # Full-length tracks handed between stages as float32 (data, sample_rate).
+        self.checkpoint = checkpoint
+        self.buffers: dict[str, tuple] = {}
+        self._audio_sources: dict[str, _AudioSource] = {}
 
         self.vocabulary = vocabulary_module
         self.subtitle_csv = subtitle_csv_module
-        self.tts_audio = tts_audio_module
-        self.sync_utils = sync_utils_module
-        self.audio_utils = audio_utils_module
-        self.ffmpeg_utils = ffmpeg_utils_module
-        self.librosa = librosa_module
+        # Stage modules with heavy dependencies are imported on first use.
+        self.tts_audio = tts_audio_module or LazyModule(f"{__package__}.tts_audio")
+        self.sync_utils = sync_utils_module or LazyModule(f"{__package__}.sync_utils")
+        self.audio_utils = audio_utils_module or LazyModule(f"{__package__}.audio_utils")
+        self.ffmpeg_utils = ffmpeg_utils_module or LazyModule(f"{__package__}.ffmpeg_utils")
+        self.librosa = librosa_module or LazyModule("librosa", loader=import_librosa)
+        # Resident F5TTS instance; created on first use unless injected.
+        self.tts_engine = tts_engine
+        self.tts_options = tts_options or {}
+        self.tts_batch_size = tts_batch_size
+        self.tts_duration_mode = tts_duration_mode
+        # Shared cache of synthesized lines; off unless a directory is given.
+        self.segment_cache_dir = Path(segment_cache_dir) if segment_cache_dir else None
+        self.segment_cache_max_bytes = segment_cache_max_bytes
 
     def run(
         self,
@@ -215,6 +288,7 @@ class SubtitlePipeline:
         heartbeat_interval: float = 60.0,
         lock_timeout: float = 1800.0,
     ) -> None:
+        self._require_mux()
         self.directory.mkdir(parents=True, exist_ok=True)
         if worker_id:
             heartbeat_interval = max(heartbeat_interval, 1.0)
@@ -238,100 +312,381 @@ class SubtitlePipeline:
 
     def process_video_file(self, video_path: str) -> None:
         """Process a video file using already generated audio tracks."""
+        self._require_mux()
         self._extract_ukrainian_audio(video_path)
         self._separate_accompaniment()
         self._adjust_volume()
         self._mix_video(video_path)
+        self.buffers.clear()
+
+    def _require_mux(self) -> None:
+        # Checked before any work: under "none" the tracks are never written,
+        # so nothing could be muxed from them.
+        if self.checkpoint == "none":
+            raise ValueError("Checkpoint policy 'none' muxes no video; use render_audio() for in-memory tracks")
+
+    def render_audio(self, video_path: str) -> dict[str, tuple]:
+        """Run every stage up to the final mix and return its audio in memory.
+
+        Returns ``{"voice": (data, sr), "mix": (data, sr)}`` with float32
+        ``(frames, channels)`` arrays: the stereo voice-over and the original
+        soundtrack with the voice reduced under the subtitles. Which
+        full-length tracks are also written to the job directory is decided by
+        the ``checkpoint`` policy; nothing is muxed.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._prepare_subtitles()
+        self._convert_subs_to_audio()
+        self._extract_ukrainian_audio(video_path)
+        self._separate_accompaniment()
+        self._adjust_volume()
+        tracks = {"voice": self._audio("stereo_voice"), "mix": self._audio("adjust_volume")}
+        self._clear_separation_chunks()
+        self.buffers.clear()
+        return tracks
+
+    def _persists(self, final: bool) -> bool:
+        return self.checkpoint == "all" or (final and self.checkpoint == "final")
+
+    def _audio_stage(
+        self,
+        name: str,
+        path: Path,
+        produce: Callable[[], tuple],
+        *,
+        final: bool = False,
+        inputs: list | None = None,
+        params: dict | None = None,
+    ) -> None:
+        """Declare a full-length audio stage whose result is handed on in memory.
+
+        ``produce`` returns ``(data, sample_rate)``; the buffer is kept in
+        ``self.buffers[name]`` for the stages after it. It may instead write
+        ``path`` itself and return ``None`` when the stage is persisted. When the checkpoint
+        policy persists ``path`` the stage is fingerprinted like any other and
+        also writes the file; otherwise it only runs once a later stage asks
+        for its buffer, and those stages fingerprint its inputs and parameters
+        instead (see :meth:`_audio_inputs` and :meth:`_audio_params`).
+        """
+        persisted = self._persists(final)
+        inputs = list(inputs or [])
+
+        def run() -> None:
+            produced = produce()
+            if produced is None:
+                return
+            data, sample_rate = produced
+            self.buffers[name] = (data, sample_rate)
+            if persisted:
+                self.audio_utils.write_audio(path, data, sample_rate)
+
+        self._audio_sources[name] = _AudioSource(
+            path=path,
+            run=run,
+            inputs=[path] if persisted else inputs,
+            params={} if persisted else {name: params or {}},
+            persisted=persisted,
+        )
+        if persisted:
+            self.stages.run(name, run, outputs=[path], inputs=inputs, params=params)
+
+    def _audio(self, name: str) -> tuple:
+        """Buffer of audio stage ``name``: from this run, its checkpoint or by running it."""
+        if name not in self.buffers:
+            source = self._audio_sources[name]
+            if source.persisted and Path(source.path).exists():
+                self.buffers[name] = self.audio_utils.read_audio(source.path)
+            else:
+                source.run()
+        return self.buffers[name]
+
+    def _audio_inputs(self, name: str) -> list:
+        """What a stage reading ``name`` fingerprints: its file, or its inputs when not persisted."""
+        return self._audio_sources[name].inputs
+
+    def _audio_params(self, name: str) -> dict:
+        """Parameters of ``name`` a stage reading it must fingerprint (none when persisted)."""
+        return self._audio_sources[name].params
 
     def _prepare_subtitles(self) -> None:
-        if not self.out_path.exists():
-            self.vocabulary.modify_subtitles_with_vocabular_text_only(
+        self.stages.run(
+            "prepare_subtitles",
+            lambda: self.vocabulary.modify_subtitles_with_vocabular_text_only(
                 self.subtitle,
                 self.vocabular,
                 self.out_path,
-            )
+            ),
+            outputs=[self.out_path],
+            inputs=[self.subtitle, self.vocabular],
+        )
+
+    def _speaker_references(self) -> list[Path]:
+        return [
+            Path(speaker["ref_file"])
+            for speaker in self.speakers.values()
+            if isinstance(speaker, dict) and speaker.get("ref_file") and Path(speaker["ref_file"]).is_file()
+        ]
+
+    def _speaker_params(self) -> dict:
+        """Speaker settings that change the synthesized voice or its timing."""
+        fields = ("ref_text", "speeds", "symbol_durations")
+        return {
+            name: {field: speaker.get(field) for field in fields}
+            for name, speaker in self.speakers.items()
+            if isinstance(speaker, dict)
+        }
+
+    def _table_outputs(self, path: Path, csv_view: bool | None = None) -> list[Path]:
+        """Artefacts of a stage writing the subtitle table named ``path``."""
+        views = self.csv_views if csv_view is None else csv_view
+        return [snapshot_path(path), *([path] if views else [])]
 
     def _convert_subs_to_audio(self) -> None:
-        if not self.srt_csv_file.exists():
-            self.subtitle_csv.srt_to_csv(self.out_path, self.srt_csv_file)
+        self.stages.run(
+            "srt_to_csv",
+            lambda: self.subtitle_csv.srt_to_csv(self.out_path, self.srt_csv_file, csv_view=self.csv_views),
+            outputs=self._table_outputs(self.srt_csv_file),
+            inputs=[self.out_path],
+        )
 
-        if not self.output_csv_with_speakers.exists():
-            self.subtitle_csv.add_speaker_columns(self.srt_csv_file, self.output_csv_with_speakers)
+        self.stages.run(
+            "speaker_columns",
+            lambda: self.subtitle_csv.add_speaker_columns(
+                self.srt_csv_file, self.output_csv_with_speakers, csv_view=self.csv_views
+            ),
+            outputs=self._table_outputs(self.output_csv_with_speakers),
+            inputs=table_files(self.srt_csv_file),
+        )
 
-        if not self.output_with_preview_speeds_csv.exists():
-            self.subtitle_csv.add_speed_columns_with_speakers(
-                self.output_csv_with_speakers, self.speakers, self.output_with_preview_speeds_csv
-            )
+        self.stages.run(
+            "speed_columns",
+            lambda: self.subtitle_csv.add_speed_columns_with_speakers(
+                self.output_csv_with_speakers,
+                self.speakers,
+                self.output_with_preview_speeds_csv,
+                csv_view=self.csv_views,
+            ),
+            outputs=self._table_outputs(self.output_with_preview_speeds_csv),
+            inputs=table_files(self.output_csv_with_speakers),
+            params={"speakers": self._speaker_params(), "default": self.speakers.get("default_speaker_name")},
+        )
 
-        if not self.tts_audio.F5TTS.all_segments_in_folder_check(
-            self.output_with_preview_speeds_csv,
-            self.directory,
-        ):
-            self.tts_audio.F5TTS().generate_from_csv_with_speakers(
+        # A changed voice or speed re-runs this stage without ``rewrite``: the
+        # journal identities of the segments include the reference audio, its
+        # text and the duration target, so exactly the lines synthesized with
+        # the old settings are generated again and the others are reused.
+        self.stages.run(
+            "tts",
+            lambda: self._get_tts_engine().generate_from_csv_with_speakers(
                 self.output_with_preview_speeds_csv,
                 self.directory,
                 self.speakers,
                 self.default_speaker,
                 rewrite=False,
-            )
+                batch_size=self.tts_batch_size,
+                duration_mode=self.tts_duration_mode,
+                segment_cache=self._get_segment_cache(),
+            ),
+            inputs=[*table_files(self.output_with_preview_speeds_csv), *self._speaker_references()],
+            params={"speakers": self._speaker_params(), "duration_mode": self.tts_duration_mode},
+            done=lambda: self.tts_audio.F5TTS.all_segments_in_folder_check(
+                self.output_with_preview_speeds_csv,
+                self.directory,
+            ),
+        )
 
-        if not self.corrected_time_output_speed_csv.exists():
-            self.sync_utils.correct_end_times_in_csv(
+        self.stages.run(
+            "correct_end_times",
+            lambda: self.sync_utils.correct_end_times_in_csv(
                 self.directory,
                 self.output_with_preview_speeds_csv,
                 self.corrected_time_output_speed_csv,
-            )
+            ),
+            outputs=self._table_outputs(self.corrected_time_output_speed_csv, csv_view=True),
+            inputs=[*table_files(self.output_with_preview_speeds_csv), *self._segment_files()],
+        )
 
-        if not self.output_audio_file.exists():
-            self.audio_utils.collect_full_audiotrack(
+        def render_voice() -> tuple:
+            data, sample_rate = self.audio_utils.render_full_audiotrack(
                 self.directory,
                 self.corrected_time_output_speed_csv,
-                self.output_audio_file,
             )
+            if data is None:
+                raise RuntimeError(f"No audio segments to concatenate in {self.directory}")
+            return data, sample_rate
+
+        self._audio_stage(
+            "collect_audiotrack",
+            self.output_audio_file,
+            render_voice,
+            inputs=[*table_files(self.corrected_time_output_speed_csv), *self._segment_files()],
+        )
+
+        def stereo_voice() -> tuple | None:
+            # The voice-over is converted from the TTS rate to the output rate
+            # here, once, so the mux gets both tracks at the same rate.
+            if self._persists(final=True) and self._audio_sources["collect_audiotrack"].persisted:
+                self.buffers.pop("collect_audiotrack", None)
+                self.audio_utils.resample_file(
+                    self.output_audio_file, self.stereo_eng_file, self.rates.output, channels=2
+                )
+                return None
+            data, sample_rate = self._audio("collect_audiotrack")
+            stereo = self.audio_utils.mono_to_stereo(data)
+            return self.audio_utils.resample(stereo, sample_rate, self.rates.output), self.rates.output
+
+        self._audio_stage(
+            "stereo_voice",
+            self.stereo_eng_file,
+            stereo_voice,
+            final=True,
+            inputs=self._audio_inputs("collect_audiotrack"),
+            params={"sample_rate": self.rates.output, **self._audio_params("collect_audiotrack")},
+        )
+
+    def _segment_files(self) -> list[Path]:
+        return sorted(self.directory.glob("segment_*.wav"))
+
+    def _get_tts_engine(self):
+        if self.tts_engine is None:
+            self.tts_engine = self.tts_audio.get_shared_tts(**self.tts_options)
+        return self.tts_engine
 
-        if not self.stereo_eng_file.exists():
-            self.audio_utils.convert_mono_to_stereo(self.output_audio_file, self.stereo_eng_file)
+    def _get_segment_cache(self):
+        if self.segment_cache_dir is None:
+            return None
+        from .segment_cache import SegmentCache
+
+        return SegmentCache(self.segment_cache_dir, max_bytes=self.segment_cache_max_bytes)
 
     def _extract_ukrainian_audio(self, video_path: str) -> None:
-        if not self.out_ukr_audio.exists():
-            self.ffmpeg_utils.extract_audio(video_path, self.out_ukr_audio)
+        self.stages.run(
+            "extract_audio",
+            lambda: self.ffmpeg_utils.extract_audio(
+                video_path, self.out_ukr_audio, sample_rate=self.rates.working
+            ),
+            outputs=[self.out_ukr_audio],
+            sources=[video_path],
+            params={"sample_rate": self.rates.working},
+        )
 
     def _separate_accompaniment(self) -> None:
-        if not self.acomponiment.exists():
-            self.sample_rate = self.librosa.get_samplerate(self.out_ukr_audio)
-            extracted = self.audio_utils.extract_acomponiment_or_vocals(
-                self.directory,
-                self.subtitle_name,
-                self.out_ukr_audio,
-                sample_rate=self.sample_rate,
+        def separate() -> tuple:
+            original, self.sample_rate = self.audio_utils.read_audio(self.out_ukr_audio)
+            windows = {}
+            if windowed:
+                windows = {
+                    "volume_intervals": self.ffmpeg_utils.parse_volume_intervals(self.srt_csv_file),
+                    "context": self.separation_context,
+                }
+            chunks = {}
+            if self.separation_chunk_seconds > 0:
+                chunks = {
+                    "checkpoint_dir": self.separation_chunk_dir,
+                    "chunk_seconds": self.separation_chunk_seconds,
+                    "workers": self.separation_workers,
+                }
+            accompaniment = self.audio_utils.separate_accompaniment(
+                original, self.sample_rate, **windows, **chunks, **self.separation_options
             )
-            self.audio_utils.normalize_stereo_audio(extracted, self.acomponiment)
-            os.remove(extracted)
+            return self.audio_utils.normalize_stereo(accompaniment), self.sample_rate
+
+        windowed = self.separation_scope == "windows"
+        params = dict(self.separation_options, chunk_seconds=self.separation_chunk_seconds)
+        if windowed:
+            params.update(scope=self.separation_scope, context=self.separation_context)
+        self._audio_stage(
+            "separate_accompaniment",
+            self.acomponiment,
+            separate,
+            inputs=[self.out_ukr_audio, *(table_files(self.srt_csv_file) if windowed else [])],
+            params=params,
+        )
+        if self._audio_sources["separate_accompaniment"].persisted:
+            self._clear_separation_chunks()
+
+    def _clear_separation_chunks(self) -> None:
+        """Drop the Demucs chunk checkpoints once a track built from them is on disk.
+
+        That is the accompaniment itself when it is persisted, otherwise the
+        ``_6`` mix (or, without checkpoints, the end of :meth:`render_audio`).
+        Until then an interrupted run resumes from the finished chunks.
+        """
+        if self.separation_chunk_dir.exists():
+            self.audio_utils.clear_separation_checkpoints(self.separation_chunk_dir)
 
     def _adjust_volume(self) -> None:
-        if not self.output_ukr_audio.exists():
+        def adjust() -> tuple | None:
             volume_intervals = self.ffmpeg_utils.parse_volume_intervals(self.srt_csv_file)
-            self.audio_utils.normalize_stereo_audio(self.acomponiment, self.output_ukr_audio)
-            self.audio_utils.adjust_stereo_volume_with_librosa(
-                self.out_ukr_audio,
-                self.acomponiment,
-                self.output_ukr_audio,
+            if self._persists(final=True) and self._audio_sources["separate_accompaniment"].persisted:
+                # Both tracks live on disk: stream the mix instead of holding
+                # three full-length buffers.
+                self.buffers.pop("separate_accompaniment", None)
+                self.audio_utils.mix_voice_intervals_to_file(
+                    self.out_ukr_audio,
+                    self.acomponiment,
+                    self.acomponiment,
+                    self.output_ukr_audio,
+                    volume_intervals,
+                    self.acomponiment_coef,
+                    self.voice_coef,
+                    self.duck_attack,
+                    self.duck_release,
+                )
+                return None
+            accompaniment, sample_rate = self._audio("separate_accompaniment")
+            original, _ = self.audio_utils.read_audio(self.out_ukr_audio)
+            mixed = self.audio_utils.mix_voice_intervals(
+                original,
+                accompaniment,
+                accompaniment,
+                sample_rate,
                 volume_intervals,
-                self.acomponiment,
                 self.acomponiment_coef,
                 self.voice_coef,
+                self.duck_attack,
+                self.duck_release,
             )
+            return mixed, sample_rate
+
+        self._audio_stage(
+            "adjust_volume",
+            self.output_ukr_audio,
+            adjust,
+            final=True,
+            inputs=[
+                *table_files(self.srt_csv_file),
+                self.out_ukr_audio,
+                *self._audio_inputs("separate_accompaniment"),
+            ],
+            params={
+                "acomponiment_coef": self.acomponiment_coef,
+                "voice_coef": self.voice_coef,
+                "duck_attack": self.duck_attack,
+                "duck_release": self.duck_release,
+                **self._audio_params("separate_accompaniment"),
+            },
+        )
+        if self._audio_sources["adjust_volume"].persisted:
+            self._clear_separation_chunks()
 
     def _mix_video(self, video_path: str) -> None:
         ext = Path(video_path).suffix.lower()
         self.mix_video = self.directory.parent / f"{self.subtitle_name}_out_mix{ext}"
-        if not self.mix_video.exists():
-            self.ffmpeg_utils.create_ffmpeg_mix_video(
+        self.stages.run(
+            "mix_video",
+            lambda: self.ffmpeg_utils.create_ffmpeg_mix_video(
                 video_path,
                 self.output_ukr_audio,
                 self.stereo_eng_file,
                 self.mix_video,
-            )
+                sample_rate=self.rates.output,
+            ),
+            outputs=[self.mix_video],
+            inputs=[self.output_ukr_audio, self.stereo_eng_file],
+            sources=[video_path],
+            params={"sample_rate": self.rates.output},
+        )
 
     @staticmethod
     def cleanup_stale_lock(directory: Path, lock_timeout: float) -> bool:
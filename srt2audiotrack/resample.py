@@ -0,0 +1,90 @@
+"""Sample-rate conversion (soxr) and the pipeline's sample-rate plan."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+# Whisper input rate.
+STT_SAMPLE_RATE = 16000
+# Demucs models run at 44.1 kHz, and so does the final AAC encode by default.
+SEPARATION_SAMPLE_RATE = 44100
+
+
+def resample(audio: np.ndarray, sr_in: int, sr_out: int, quality: str = "HQ") -> np.ndarray:
+    """``audio`` (1-D or ``(frames, channels)``) at ``sr_out`` as float32.
+
+    All channels are converted in one soxr call; equal rates return the
+    input unchanged.
+    """
+
+    audio = np.asarray(audio, dtype=np.float32)
+    if sr_in == sr_out:
+        return audio
+    import soxr
+
+    return soxr.resample(audio, sr_in, sr_out, quality=quality).astype(np.float32, copy=False)
+
+
+class StreamResampler:
+    """Block-by-block resampling of a ``(frames, channels)`` stream."""
+
+    def __init__(self, sr_in: int, sr_out: int, channels: int, quality: str = "HQ") -> None:
+        import soxr
+
+        self.passthrough = sr_in == sr_out
+        self._stream = None if self.passthrough else soxr.ResampleStream(
+            sr_in, sr_out, channels, dtype="float32", quality=quality
+        )
+
+    def process(self, block: np.ndarray, last: bool = False) -> np.ndarray:
+        block = np.asarray(block, dtype=np.float32)
+        if self.passthrough:
+            return block
+        return self._stream.resample_chunk(block, last=last)
+
+
+def resample_file(source: str | Path, target: str | Path, sr_out: int, channels: int | None = None,
+                  blocksize: int = 1 << 16, subtype: str | None = None) -> None:
+    """Resample an audio file to ``sr_out`` with memory bounded by ``blocksize``.
+
+    With ``channels`` a mono source is duplicated (or extra channels are
+    dropped) after resampling, so a mono voice-over is converted only once.
+    """
+
+    import soundfile as sf
+
+    with sf.SoundFile(str(source)) as reader:
+        channels = channels or reader.channels
+        resampler = StreamResampler(reader.samplerate, sr_out, reader.channels)
+        with sf.SoundFile(str(target), "w", sr_out, channels, subtype=subtype) as writer:
+            while True:
+                block = reader.read(blocksize, dtype="float32", always_2d=True)
+                last = len(block) < blocksize
+                block = resampler.process(block, last=last)
+                if block.shape[1] != channels:
+                    block = np.repeat(block[:, :1], channels, axis=1) if block.shape[1] == 1 else block[:, :channels]
+                writer.write(block)
+                if last:
+                    break
+
+
+@dataclass(frozen=True)
+class RatePlan:
+    """Sample rates of one job's soundtrack and muxed tracks.
+
+    The soundtrack is extracted straight at ``working`` and separated and
+    mixed there; the voice-over is converted once to ``output`` when it is
+    made stereo.
+    """
+
+    working: int = SEPARATION_SAMPLE_RATE
+    output: int = SEPARATION_SAMPLE_RATE
+
+    @classmethod
+    def for_output(cls, output: int = SEPARATION_SAMPLE_RATE) -> "RatePlan":
+        """Plan for an ``output`` rate: work at it so nothing is converted before the encode."""
+
+        return cls(working=output, output=output)
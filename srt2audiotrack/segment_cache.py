@@ -0,0 +1,204 @@
+"""Content-addressed cache of synthesized segments shared between jobs."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import soundfile as sf
+
+from .hashing import text_digest
+
+# Bump when the key layout or the stored audio changes meaning.
+CACHE_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially re-wrapped lines share a cache entry."""
+
+    return " ".join(str(text).split())
+
+
+class SegmentCache:
+    """Store of ``(wav, metadata)`` entries keyed by :meth:`key`.
+
+    Entries live in ``root/<2 hex>/<key>.wav`` with a ``<key>.json`` sidecar
+    holding the sample rate and whatever the caller recorded (retries, Whisper
+    validation...). Files are written under unique temporary names and moved
+    into place, so several workers on one host can share the directory; a
+    reader racing an eviction simply sees a miss.
+
+    Reads refresh the entry's mtime, and once the cache grows past
+    ``max_bytes`` the least recently used entries are removed down to
+    ``low_watermark`` of it. Eviction is serialized between processes with an
+    ``O_EXCL`` lock file; a worker that finds it taken skips the sweep, and a
+    lock older than ``stale_lock_seconds`` is broken.
+    """
+
+    lock_name = ".evict.lock"
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_bytes: int = 10 * 1024**3,
+        low_watermark: float = 0.9,
+        evict_every: int = 32,
+        stale_lock_seconds: float = 600.0,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark
+        self.evict_every = max(evict_every, 1)
+        self.stale_lock_seconds = stale_lock_seconds
+        self._puts = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, ref_digest: str, ref_text: str, target: str, model_id: str, seed_policy: str) -> str:
+        """Cache key of one synthesized line.
+
+        ``target`` describes how the take was sized (duration mode, planned
+        duration or speed, subtitle limit) and ``seed_policy`` whether any
+        sample is acceptable or a specific seed was requested.
+        """
+
+        return text_digest(CACHE_VERSION, model_id, seed_policy, ref_digest, normalize_text(ref_text), target,
+                           normalize_text(text))
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        folder = self.root / key[:2]
+        return folder / f"{key}.wav", folder / f"{key}.json"
+
+    def _temporary(self, path: Path) -> Path:
+        return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+
+    def _write_json(self, path: Path, metadata: dict) -> None:
+        partial = self._temporary(path)
+        with open(partial, "w", encoding="utf-8") as handle:
+            json.dump(metadata, handle, ensure_ascii=False)
+        os.replace(partial, path)
+
+    def _read_json(self, path: Path) -> dict | None:
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def get(self, key: str):
+        """Return ``(wav, sr, metadata)`` for ``key`` or ``None`` on a miss."""
+
+        wav_path, meta_path = self._paths(key)
+        metadata = self._read_json(meta_path)
+        try:
+            if metadata is None:
+                raise FileNotFoundError(meta_path)
+            wav, sr = sf.read(str(wav_path), dtype="float32")
+            os.utime(wav_path)
+        except (OSError, RuntimeError):  # missing, evicted meanwhile or unreadable
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return wav, sr, metadata
+
+    def put(self, key: str, wav, sample_rate: int, **metadata) -> None:
+        wav_path, meta_path = self._paths(key)
+        wav_path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self._temporary(wav_path)
+        sf.write(str(partial), wav, sample_rate, format="WAV")
+        os.replace(partial, wav_path)
+        self._write_json(meta_path, {"sample_rate": sample_rate, **metadata})
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % self.evict_every == 0
+        if sweep:
+            self.evict()
+
+    def update(self, key: str, **metadata) -> None:
+        """Merge ``metadata`` into an existing entry (e.g. a validation result)."""
+
+        _, meta_path = self._paths(key)
+        current = self._read_json(meta_path)
+        if current is not None:
+            self._write_json(meta_path, {**current, **metadata})
+
+    def size(self) -> int:
+        return sum(path.stat().st_size for path in self.root.glob("*/*") if path.is_file())
+
+    def _acquire_eviction_lock(self) -> bool:
+        lock = self.root / self.lock_name
+        for _ in range(2):
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                if not self._break_stale_lock(lock):
+                    return False
+        return False
+
+    def _break_stale_lock(self, lock: Path) -> bool:
+        """Remove ``lock`` if a crashed worker left it behind.
+
+        The lock is moved onto a unique name first, so of several workers
+        breaking it only one succeeds, and the moved file is checked again:
+        a lock taken fresh since it was found stale is handed back.
+        """
+
+        try:
+            if time.time() - lock.stat().st_mtime < self.stale_lock_seconds:
+                return False
+            moved = self._temporary(lock.with_name(f"{lock.name}.stale"))
+            os.replace(lock, moved)
+        except FileNotFoundError:
+            return True  # released or broken meanwhile: try to take it
+        try:
+            if time.time() - moved.stat().st_mtime < self.stale_lock_seconds:
+                try:
+                    os.link(moved, lock)
+                except FileExistsError:
+                    pass
+                return False
+            return True
+        finally:
+            moved.unlink(missing_ok=True)
+
+    def evict(self) -> int:
+        """Drop least recently used entries while over ``max_bytes``.
+
+        Returns the number of bytes freed.
+        """
+
+        if not self.root.is_dir() or not self._acquire_eviction_lock():
+            return 0
+        try:
+            entries = []
+            total = 0
+            for wav_path in self.root.glob("*/*.wav"):
+                meta_path = wav_path.with_suffix(".json")
+                try:
+                    stat = wav_path.stat()
+                    size = stat.st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, size, wav_path, meta_path))
+                total += size
+            if total <= self.max_bytes:
+                return 0
+            target = self.max_bytes * self.low_watermark
+            freed = 0
+            for _, size, wav_path, meta_path in sorted(entries, key=lambda entry: entry[0]):
+                if total - freed <= target:
+                    break
+                meta_path.unlink(missing_ok=True)
+                wav_path.unlink(missing_ok=True)
+                freed += size
+            return freed
+        finally:
+            (self.root / self.lock_name).unlink(missing_ok=True)
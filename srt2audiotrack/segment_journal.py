@@ -0,0 +1,208 @@
+"""Per-segment journal for resumable TTS runs."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from .hashing import text_digest
+
+
+def write_audio_atomic(path: str | Path, wav, sample_rate: int) -> None:
+    """Write a WAV file so that ``path`` either holds the full file or nothing."""
+
+    path = Path(path)
+    partial = path.with_name(path.name + ".part")
+    sf.write(str(partial), wav, sample_rate, format="WAV")
+    os.replace(partial, path)
+
+
+def audio_metadata(path: str | Path, wav, sample_rate: int) -> dict:
+    """Journal fields describing the segment just written to ``path``.
+
+    ``frames`` and ``sample_rate`` let later stages size the segment without
+    decoding it; ``bytes`` ties them to the file they were measured on.
+    """
+
+    wav = np.asarray(wav, dtype=np.float32)
+    return {
+        "frames": len(wav),
+        "sample_rate": sample_rate,
+        "peak": round(float(np.max(np.abs(wav))), 6) if wav.size else 0.0,
+        "rms": round(float(np.sqrt(np.mean(np.square(wav)))), 6) if wav.size else 0.0,
+        "bytes": Path(path).stat().st_size,
+    }
+
+
+def probe_segment(path: str | Path, entry: dict | None = None) -> tuple[int, int] | None:
+    """``(frames, sample_rate)`` of a segment file without decoding its audio.
+
+    The journal ``entry`` is used when it was recorded for the file now on
+    disk (same size); otherwise the WAV header is read. Returns ``None`` when
+    the file does not exist.
+    """
+
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+    if entry and entry.get("bytes") == size and entry.get("frames") is not None and entry.get("sample_rate"):
+        return int(entry["frames"]), int(entry["sample_rate"])
+    info = sf.info(str(path))
+    return info.frames, info.samplerate
+
+
+class SegmentJournal:
+    """Append-only JSON-lines record of the segments of one output folder.
+
+    Every line holds the ``index`` of a CSV row plus any fields known about its
+    segment (text, speaker, speed, retries, validation results...). Later lines
+    for the same index are merged over earlier ones, so the journal can be
+    appended to from several stages without rewriting it. A torn last line
+    left by a crash is ignored.
+    """
+
+    filename = "segments.jsonl"
+
+    def __init__(self, folder: str | Path) -> None:
+        self.folder = Path(folder)
+        self.path = self.folder / self.filename
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[int, dict]:
+        entries: dict[int, dict] = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                index = record.get("index")
+                if index is None:
+                    continue
+                entries.setdefault(index, {}).update(record)
+        return entries
+
+    def append(self, index: int, **fields) -> None:
+        record = {"index": index, **fields}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as journal:
+                journal.write(line)
+                journal.flush()
+                os.fsync(journal.fileno())
+
+    def replace(self, entries: dict[int, dict]) -> None:
+        """Atomically rewrite the journal with one merged line per entry."""
+
+        partial = self.path.with_name(self.path.name + ".part")
+        with self._lock:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            with open(partial, "w", encoding="utf-8") as journal:
+                for index in sorted(entries):
+                    journal.write(json.dumps({**entries[index], "index": index}, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(partial, self.path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+
+    @staticmethod
+    def segment_path(folder: str | Path, index: int) -> Path:
+        """Path of the segment generated for the CSV row ``index`` (0-based)."""
+
+        return Path(folder) / f"segment_{index + 1}.wav"
+
+
+def segment_identity(row: dict, *conditioning: object) -> str:
+    """Stable identity of the segment for a CSV row.
+
+    It covers the text, speaker and duration of the row plus ``conditioning``:
+    everything else the synthesized audio depends on (the digest of the
+    speaker's reference audio, its reference text, the duration target...),
+    so changing a voice or the speeds makes the segment stale. The start time
+    is left out on purpose: moving a line on the timeline does not change the
+    audio synthesized for it.
+    """
+
+    return text_digest(
+        " ".join(row["Text"].split()), row.get("Speaker", ""), f"{float(row['Duration']):.3f}", *conditioning
+    )
+
+
+def reconcile_segments(
+    journal: SegmentJournal, rows: list[dict], identities: list[str] | None = None
+) -> dict[int, dict]:
+    """Line up the segments of an earlier run with the current CSV ``rows``.
+
+    Segments are matched to rows by :func:`segment_identity`, so inserting or
+    deleting a subtitle line only shifts the files of the lines after it
+    instead of invalidating them. Matched files are moved to their new
+    ``segment_N.wav`` position (copied when several rows share an identity),
+    files of rows that changed or disappeared are deleted, and the journal is
+    rewritten to the new layout.
+
+    ``identities`` are those of ``rows``, by default :func:`segment_identity`
+    without conditioning. Journal entries written before identities existed
+    are kept in place when their text still matches, as before. Returns the
+    entries of the rows whose segment is ready; every other row has to be
+    synthesized.
+    """
+
+    folder = journal.folder
+    entries = journal.load()
+    if identities is None:
+        identities = [segment_identity(row) for row in rows]
+
+    def ready(index: int) -> bool:
+        return SegmentJournal.segment_path(folder, index).exists()
+
+    sources: dict[str, int] = {}
+    for index, entry in sorted(entries.items()):
+        if entry.get("identity") and ready(index):
+            sources.setdefault(entry["identity"], index)
+
+    kept: dict[int, dict] = {}
+    moves: list[tuple[int, int]] = []
+    for index, (row, identity) in enumerate(zip(rows, identities)):
+        entry = entries.get(index)
+        if ready(index) and entry is not None and entry.get("identity") == identity:
+            kept[index] = entry
+        elif ready(index) and (entry is None or "identity" not in entry) and \
+                (entry is None or entry.get("text") == row["Text"]):
+            kept[index] = {**(entry or {}), "identity": identity}
+        elif identity in sources:
+            moves.append((sources[identity], index))
+            kept[index] = {**entries[sources[identity]], "index": index}
+
+    if moves:
+        staging = folder / ".relocate"
+        staging.mkdir(exist_ok=True)
+        for source in {source for source, _ in moves}:
+            shutil.copyfile(SegmentJournal.segment_path(folder, source), staging / f"{source}.wav")
+        for source, target in moves:
+            shutil.copyfile(staging / f"{source}.wav", staging / f"{source}-{target}.part")
+            os.replace(staging / f"{source}-{target}.part", SegmentJournal.segment_path(folder, target))
+        shutil.rmtree(staging)
+
+    for stale in folder.glob("segment_*.wav"):
+        index = int(stale.stem.split("_")[-1]) - 1 if stale.stem.split("_")[-1].isdigit() else None
+        if index is not None and index not in kept:
+            stale.unlink()
+
+    removed = sum(1 for index in entries if index >= len(rows))
+    print(f"Segments: {len(kept) - len(moves)} kept, {len(moves)} relocated, "
+          f"{len(rows) - len(kept)} to synthesize, {removed} removed")
+    journal.replace(kept)
+    return kept
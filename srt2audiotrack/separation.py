@@ -0,0 +1,362 @@
+"""In-process Demucs separation of the accompaniment."""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+from .envelope import DuckingEnvelope
+from .hashing import array_digest
+from .resample import resample
+
+DEFAULT_MODEL = "mdx_extra"
+
+_shared_separators: dict[tuple, "DemucsSeparator"] = {}
+_shared_pools: dict[tuple[int, int], ProcessPoolExecutor] = {}
+_shared_lock = threading.Lock()
+
+
+class DemucsSeparator:
+    """A Demucs model kept in memory and applied to numpy arrays.
+
+    The model is loaded on first use. ``segment`` (seconds), ``overlap`` and
+    ``shifts`` are passed to ``demucs.apply.apply_model``; ``threads`` caps
+    torch's intra-op threads on CPU (``0`` keeps torch's default).
+    Separations are serialized, so one instance can serve several threads.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        device: str | None = None,
+        segment: float | None = None,
+        overlap: float = 0.25,
+        shifts: int = 1,
+        threads: int = 0,
+    ) -> None:
+        self.model_name = model
+        self.device = device
+        self.segment = segment
+        self.overlap = overlap
+        self.shifts = shifts
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            import torch
+            from demucs.pretrained import get_model
+
+            if self.device is None:
+                self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Loading Demucs model {self.model_name} on {self.device}")
+            model = get_model(self.model_name)
+            model.to(self.device)
+            model.eval()
+            self._model = model
+        return self._model
+
+    @property
+    def samplerate(self) -> int:
+        return self.model.samplerate
+
+    def separate(self, audio: np.ndarray, sample_rate: int) -> tuple[dict[str, np.ndarray], int]:
+        """All stems of ``(frames, channels)`` ``audio`` at the model's rate."""
+
+        import torch
+        from demucs.apply import apply_model
+
+        model = self.model
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.ndim == 1:
+            audio = audio[:, None]
+        if audio.shape[1] < model.audio_channels:
+            audio = np.repeat(audio[:, :1], model.audio_channels, axis=1)
+        audio = resample(audio[:, :model.audio_channels], sample_rate, model.samplerate)
+
+        mix = torch.from_numpy(np.ascontiguousarray(audio.T))
+        # Same normalization as ``demucs.separate``.
+        reference = mix.mean(0)
+        mean, std = reference.mean(), reference.std() + 1e-8
+        mix = (mix - mean) / std
+        with self._lock, torch.inference_mode():
+            previous_threads = torch.get_num_threads()
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            try:
+                sources = apply_model(
+                    model,
+                    mix[None],
+                    device=self.device,
+                    shifts=self.shifts,
+                    split=True,
+                    overlap=self.overlap,
+                    segment=self.segment,
+                    progress=False,
+                )[0]
+            finally:
+                torch.set_num_threads(previous_threads)
+        sources = sources * std + mean
+        stems = {name: source.cpu().numpy().T for name, source in zip(model.sources, sources)}
+        return stems, model.samplerate
+
+    def accompaniment(self, audio: np.ndarray, sample_rate: int, target_rate: int | None = None) -> np.ndarray:
+        """Everything but the vocals of ``audio`` as float32 ``(frames, channels)``.
+
+        The result is at ``target_rate`` (by default ``sample_rate``), i.e. what
+        ``demucs --two-stems vocals`` writes as ``no_vocals``.
+        """
+
+        stems, model_rate = self.separate(audio, sample_rate)
+        rest = sum(stem for name, stem in stems.items() if name != "vocals").astype(np.float32)
+        return resample(rest, model_rate, target_rate or sample_rate)
+
+    def accompaniment_many(self, pieces: list[np.ndarray], sample_rate: int) -> list[np.ndarray]:
+        """:meth:`accompaniment` of each of ``pieces``."""
+
+        return [self.accompaniment(piece, sample_rate) for piece in pieces]
+
+
+def _separate_chunk(options: dict, chunk: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Pool task: accompaniment of one chunk with the worker's resident model."""
+
+    return get_shared_separator(**options).accompaniment(chunk, sample_rate)
+
+
+def _limit_worker_threads(threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+class ChunkedSeparator:
+    """Separate long tracks as overlapping chunks, in parallel and resumably.
+
+    The track is cut into ``chunk_seconds`` pieces extended by
+    ``overlap_seconds`` on each side. Chunks go to the shared pool of
+    ``workers`` processes (see :func:`get_shared_pool`), each holding its own
+    Demucs model and ``cpu_count / workers`` torch threads; ``workers=0``
+    sizes the pool to the machine (a single in-process worker when the model
+    runs on CUDA). Neighbouring chunks are crossfaded linearly across their
+    overlap.
+
+    Every finished chunk is saved in ``checkpoint_dir`` under a digest of its
+    samples and the separation options, so an interrupted run only separates
+    the chunks that are still missing. :meth:`clear` removes them once the
+    result is safely stored.
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir: str | Path,
+        chunk_seconds: float = 60.0,
+        overlap_seconds: float = 2.0,
+        workers: int = 0,
+        separate: Callable[[np.ndarray, int], np.ndarray] | None = None,
+        **separator_options,
+    ) -> None:
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.workers = workers
+        self.separator_options = separator_options
+        self._separate = separate
+
+    def clear(self) -> None:
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+    def _worker_count(self) -> int:
+        if self._separate is not None:
+            return 1
+        if self.workers > 0:
+            return self.workers
+        device = self.separator_options.get("device")
+        if device is None:
+            import torch
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        return 1 if str(device).startswith("cuda") else max(1, (os.cpu_count() or 1) // 4)
+
+    def chunks(self, frames: int, sample_rate: int) -> list[tuple[int, int, int, int]]:
+        """``(start, end, core_start, core_end)`` of every chunk of a track."""
+
+        step = max(int(self.chunk_seconds * sample_rate), 1)
+        overlap = min(int(self.overlap_seconds * sample_rate), step // 2)
+        bounds = list(range(0, frames, step)) + [frames]
+        if len(bounds) > 2 and bounds[-1] - bounds[-2] < 2 * overlap:
+            del bounds[-2]  # a short tail joins the previous chunk so every overlap is symmetric
+        return [
+            (max(core_start - overlap, 0), min(core_end + overlap, frames), core_start, core_end)
+            for core_start, core_end in zip(bounds, bounds[1:])
+        ]
+
+    def _checkpoint(self, chunk: np.ndarray, sample_rate: int) -> Path:
+        options = sorted(self.separator_options.items())
+        return self.checkpoint_dir / f"{array_digest(chunk, sample_rate, options)}.npy"
+
+    def accompaniment(self, audio: np.ndarray, sample_rate: int) -> np.ndarray:
+        return self.accompaniment_many([audio], sample_rate)[0]
+
+    def accompaniment_many(self, pieces: list[np.ndarray], sample_rate: int) -> list[np.ndarray]:
+        """:meth:`accompaniment` of several tracks, their chunks submitted to the pool together."""
+
+        pieces = [np.asarray(piece, dtype=np.float32) for piece in pieces]
+        layouts = [self.chunks(len(piece), sample_rate) for piece in pieces]
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        paths = [
+            [self._checkpoint(piece[start:end], sample_rate) for start, end, _, _ in spans]
+            for piece, spans in zip(pieces, layouts)
+        ]
+        missing = [(p, n) for p, piece_paths in enumerate(paths) for n, path in enumerate(piece_paths)
+                   if not path.exists()]
+        total = sum(len(spans) for spans in layouts)
+        print(f"Separation: {total} chunks, {total - len(missing)} restored from {self.checkpoint_dir}")
+
+        def chunk(p: int, n: int) -> np.ndarray:
+            start, end, _, _ = layouts[p][n]
+            return pieces[p][start:end]
+
+        def store(p: int, n: int, separated: np.ndarray) -> None:
+            partial = paths[p][n].with_name(paths[p][n].name + ".part")
+            with open(partial, "wb") as handle:
+                np.save(handle, np.asarray(separated, dtype=np.float32))
+            os.replace(partial, paths[p][n])
+
+        workers = self._worker_count()
+        if workers == 1:
+            separate = self._separate or partial(_separate_chunk, self.separator_options)
+            for p, n in missing:
+                store(p, n, separate(chunk(p, n), sample_rate))
+        elif missing:
+            threads = self.separator_options.get("threads") or max(1, (os.cpu_count() or 1) // workers)
+            pool = get_shared_pool(workers, threads)
+            try:
+                futures = {
+                    pool.submit(_separate_chunk, self.separator_options, chunk(p, n), sample_rate): (p, n)
+                    for p, n in missing
+                }
+                for future in as_completed(futures):
+                    store(*futures[future], future.result())
+            except BrokenProcessPool:
+                _discard_shared_pool(workers, threads)
+                raise
+
+        return [self._stitch(piece, spans, piece_paths) for piece, spans, piece_paths in zip(pieces, layouts, paths)]
+
+    @staticmethod
+    def _stitch(audio: np.ndarray, spans: list[tuple[int, int, int, int]], paths: list[Path]) -> np.ndarray:
+        result = np.zeros_like(audio)
+        for n, ((start, end, core_start, core_end), path) in enumerate(zip(spans, paths)):
+            separated = np.load(path)[:end - start]
+            # Ramps over the overlaps with the neighbours; they sum to one.
+            x = [start, 2 * core_start - start, 2 * core_end - end, end]
+            y = [0.0 if n else 1.0, 1.0, 1.0, 0.0 if n + 1 < len(spans) else 1.0]
+            weight = np.interp(np.arange(start, start + len(separated)), x, y).astype(np.float32)
+            result[start:start + len(separated)] += weight[:, None] * separated
+        return result
+
+
+def separate_windows(
+    separate_many: Callable[[list[np.ndarray], int], list[np.ndarray]],
+    audio: np.ndarray,
+    sample_rate: int,
+    volume_intervals: np.ndarray | Iterable[tuple[int, int]],
+    context: float = 2.0,
+    crossfade: float = 0.5,
+) -> np.ndarray:
+    """Separate ``audio`` only around the subtitle intervals (``(start, end)`` in milliseconds).
+
+    Each interval is padded by ``context`` seconds so the model hears what
+    surrounds it and overlapping padded windows are merged. All windows go to
+    ``separate_many(windows, sample_rate)`` in one call, so a pooled
+    separator works on them in parallel. The separated windows are crossfaded into ``audio`` over ``crossfade`` seconds (at most
+    ``context``) before and after each interval. Outside the windows the
+    result is ``audio`` itself. ``audio`` and the separated chunks are
+    ``(frames, channels)`` with the same channel count.
+    """
+
+    audio = np.asarray(audio, dtype=np.float32)
+    fade = min(crossfade, context)
+    envelope = DuckingEnvelope.from_ms(volume_intervals, sample_rate, attack=fade, release=fade)
+    pad = int(context * sample_rate)
+    windows: list[list[int]] = []
+    for start, end in envelope.intervals:
+        start, end = max(start - pad, 0), min(end + pad, len(audio))
+        if start >= end:
+            continue
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+
+    result = audio.copy()
+    covered = sum(end - start for start, end in windows)
+    print(f"Separating {covered / sample_rate:.0f}s of {len(audio) / sample_rate:.0f}s "
+          f"({100 * covered / max(len(audio), 1):.0f}%) in {len(windows)} subtitle windows")
+    originals = [audio[start:end] for start, end in windows]
+    for (start, end), original, separated in zip(windows, originals, separate_many(originals, sample_rate)):
+        separated = np.asarray(separated, dtype=np.float32)[:len(original)]
+        if len(separated) < len(original):  # resampling may drop a trailing frame
+            separated = np.pad(separated, ((0, len(original) - len(separated)), (0, 0)))
+        gain = envelope.gain(start, end - start)
+        if gain is not None:
+            result[start:end] = original + gain[:, None] * (separated - original)
+    return result
+
+
+def get_shared_separator(**options) -> DemucsSeparator:
+    """Process-wide :class:`DemucsSeparator` for the given options.
+
+    Like :func:`~srt2audiotrack.tts_audio.get_shared_tts`, the model is
+    loaded once and reused by every later job with the same settings.
+    """
+
+    key = tuple(sorted(options.items()))
+    with _shared_lock:
+        separator = _shared_separators.get(key)
+        if separator is None:
+            separator = DemucsSeparator(**options)
+            _shared_separators[key] = separator
+    return separator
+
+
+def get_shared_pool(workers: int, threads: int) -> ProcessPoolExecutor:
+    """Process-wide pool of ``workers`` separation processes with ``threads`` torch threads each.
+
+    Like the separators of :func:`get_shared_separator`, the pool outlives
+    the job that started it: its workers keep their Demucs models loaded
+    for every later job and daemon pass.
+    """
+
+    key = (workers, threads)
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_worker_threads,
+                initargs=(threads,),
+            )
+            _shared_pools[key] = pool
+    return pool
+
+
+def _discard_shared_pool(workers: int, threads: int) -> None:
+    """Forget a pool whose worker died, so the next job starts a fresh one."""
+
+    with _shared_lock:
+        pool = _shared_pools.pop((workers, threads), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
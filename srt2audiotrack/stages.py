@@ -0,0 +1,146 @@
+"""Fingerprinted pipeline stages.
+
+Every stage declares the files it reads, the parameters it depends on and
+the artefacts it writes. The fingerprint of those is recorded in a manifest
+in the job directory, and a stage only runs again when its outputs are
+missing or its fingerprint changed. Because upstream artefacts are hashed by
+content, a rerun that reproduces identical output does not invalidate the
+stages after it.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable
+
+from .hashing import file_digest, text_digest
+
+MISSING = "missing"
+
+
+class StageManifest:
+    """``stages.json`` of one job directory.
+
+    Besides the fingerprint of each stage it caches the digest of every
+    hashed file by ``(size, mtime)``, so unchanged multi-gigabyte artefacts are
+    not re-read on every run.
+    """
+
+    filename = "stages.json"
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.path = self.directory / self.filename
+        self.stages: dict[str, dict] = {}
+        self.files: dict[str, list] = {}
+        # A job directory filled before manifests existed: its outputs are
+        # adopted once instead of being rebuilt.
+        self.adopt_unrecorded = (
+            not self.path.exists() and self.directory.is_dir() and any(self.directory.iterdir())
+        )
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as manifest:
+                data = json.load(manifest)
+        except (OSError, json.JSONDecodeError):
+            return
+        self.stages = data.get("stages", {})
+        self.files = data.get("files", {})
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(self.path.name + ".part")
+        with open(partial, "w", encoding="utf-8") as manifest:
+            json.dump({"stages": self.stages, "files": self.files}, manifest, indent=1, sort_keys=True)
+        os.replace(partial, self.path)
+
+    def digest(self, path: str | Path) -> str:
+        """Content digest of ``path``, reusing the recorded one if its stat is unchanged."""
+
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return MISSING
+        key = str(path.resolve())
+        cached = self.files.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = file_digest(path)
+        self.files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    @staticmethod
+    def source_digest(path: str | Path) -> str:
+        """Cheap identity of a large external source: its path, size and mtime."""
+
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return MISSING
+        return text_digest(path.resolve(), stat.st_size, stat.st_mtime_ns)
+
+    def fingerprint(
+        self,
+        name: str,
+        inputs: Iterable[str | Path] = (),
+        sources: Iterable[str | Path] = (),
+        params: dict | None = None,
+    ) -> str:
+        return text_digest(
+            name,
+            *(self.digest(path) for path in inputs),
+            *(self.source_digest(path) for path in sources),
+            json.dumps(params or {}, sort_keys=True, default=str),
+        )
+
+    def run(
+        self,
+        name: str,
+        run: Callable[[], object],
+        *,
+        outputs: Iterable[str | Path] = (),
+        inputs: Iterable[str | Path] = (),
+        sources: Iterable[str | Path] = (),
+        params: dict | None = None,
+        done: Callable[[], bool] | None = None,
+    ) -> bool:
+        """Run stage ``name`` unless its outputs are current. Returns whether it ran.
+
+        ``inputs`` are hashed by content, ``sources`` (e.g. the input video)
+        by path, size and mtime. ``done`` adds a completeness check for stages
+        whose outputs cannot be listed up front.
+
+        The stage is marked as running in the manifest before ``run`` starts,
+        so outputs left half-written by a crash are never taken as current.
+        Outputs without any record are only adopted in a job directory from
+        before manifests existed.
+        """
+
+        fingerprint = self.fingerprint(name, inputs, sources, params)
+        complete = all(Path(path).exists() for path in outputs) and (done is None or done())
+        entry = self.stages.get(name, {})
+        recorded = entry.get("fingerprint")
+        if complete and not entry.get("running"):
+            if recorded == fingerprint:
+                return False
+            if recorded is None and self.adopt_unrecorded:
+                self.stages[name] = {"fingerprint": fingerprint}
+                self.save()
+                return False
+        if entry.get("running"):
+            print(f"Stage {name}: interrupted earlier, running again")
+        elif complete and recorded is not None:
+            print(f"Stage {name}: inputs or parameters changed, running again")
+        self.stages[name] = {"running": True}
+        self.save()
+        run()
+        # Inputs may be rewritten by the stage itself (e.g. resumed segments).
+        self.stages[name] = {"fingerprint": self.fingerprint(name, inputs, sources, params)}
+        self.save()
+        return True
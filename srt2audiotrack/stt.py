@@ -1,29 +1,144 @@
-import whisper
+import bisect
+
 import numpy as np
-import torch
-import sys
+
+from .resample import STT_SAMPLE_RATE, resample
+
 # import whisperx
 
 # def create_model_whisperx(name="large-v3"):
 #     model = whisperx.load_model(name, device="cuda")
 #     return model
 
-def create_model_whisper(name="large-v3"):
+WHISPER_SAMPLE_RATE = STT_SAMPLE_RATE
+# Whisper decodes at most 30 s of audio per window.
+MAX_CLIP_SECONDS = 30.0
+
+
+def to_whisper_audio(wav, sr):
+    """Return ``wav`` as mono float32 at 16 kHz, the rate Whisper expects."""
+    if hasattr(wav, "detach"):  # torch.Tensor
+        wav = wav.detach().cpu().numpy()
+    wav = np.asarray(wav, dtype=np.float32)
+    if wav.ndim > 1:
+        wav = wav.mean(axis=1, dtype=np.float32)
+    return resample(wav, sr, WHISPER_SAMPLE_RATE)
+
+
+def create_model_whisper(name="large-v3", device=None):
+    import whisper
+
     print(f"Loading Whisper model: {name}")
-    model = whisper.load_model(name)
+    model = whisper.load_model(name, device=device)
     print("Whisper model loaded successfully")
     return model
 
-def create_model(name="large-v3",whisperx=False):
-    return create_model_whisper(name)
+
+class OpenAIWhisperBackend:
+    """openai-whisper model; batches are transcribed one clip at a time."""
+
+    def __init__(self, name="large-v3", device=None):
+        self.name = name
+        self.model = create_model_whisper(name, device=device)
+
+    def transcribe(self, wav, sr, language="en"):
+        import torch
+
+        audio = to_whisper_audio(wav, sr)
+        return self.model.transcribe(audio, language=language, fp16=torch.cuda.is_available())["text"]
+
+    def transcribe_batch(self, clips, language="en"):
+        return [self.transcribe(wav, sr, language=language) for wav, sr in clips]
+
+
+class FasterWhisperBackend:
+    """faster-whisper (CTranslate2) model, int8 by default for fast CPU inference.
+
+    ``transcribe_batch`` lays the clips out on one timeline separated by
+    silence and decodes them as ``clip_timestamps`` windows in batches of
+    ``batch_size``, so a whole group of segments costs one pipeline call.
+    """
+
+    gap_seconds = 1.0
+
+    def __init__(self, name="large-v3", device=None, compute_type="int8", cpu_threads=0, batch_size=8):
+        from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+        print(f"Loading faster-whisper model: {name} ({compute_type})")
+        self.name = name
+        self.batch_size = batch_size
+        self.model = WhisperModel(name, device=device or "auto", compute_type=compute_type,
+                                  cpu_threads=cpu_threads)
+        self.pipeline = BatchedInferencePipeline(model=self.model)
+        print("faster-whisper model loaded successfully")
+
+    def transcribe(self, wav, sr, language="en"):
+        segments, _ = self.model.transcribe(to_whisper_audio(wav, sr), language=language, beam_size=5)
+        return "".join(segment.text for segment in segments)
+
+    def transcribe_batch(self, clips, language="en"):
+        texts = [None] * len(clips)
+        gap = np.zeros(int(self.gap_seconds * WHISPER_SAMPLE_RATE), dtype=np.float32)
+        parts, windows, owners = [], [], []
+        offset = 0
+        for index, (wav, sr) in enumerate(clips):
+            audio = to_whisper_audio(wav, sr)
+            if len(audio) == 0:
+                texts[index] = ""
+                continue
+            if len(audio) > MAX_CLIP_SECONDS * WHISPER_SAMPLE_RATE:
+                texts[index] = self.transcribe(audio, WHISPER_SAMPLE_RATE, language=language)
+                continue
+            windows.append({"start": offset, "end": offset + len(audio)})
+            owners.append(index)
+            parts.extend([audio, gap])
+            offset += len(audio) + len(gap)
+        if windows:
+            starts = [window["start"] / WHISPER_SAMPLE_RATE for window in windows]
+            collected = [[] for _ in windows]
+            segments, _ = self.pipeline.transcribe(
+                np.concatenate(parts),
+                language=language,
+                clip_timestamps=windows,
+                vad_filter=False,
+                batch_size=self.batch_size,
+            )
+            for segment in segments:
+                # Timestamps are on the concatenated timeline; the window that
+                # starts last at or before the segment owns it.
+                window = max(bisect.bisect_right(starts, segment.start + 0.01) - 1, 0)
+                collected[window].append(segment.text)
+            for window, index in enumerate(owners):
+                texts[index] = "".join(collected[window])
+        return texts
+
+
+BACKENDS = {
+    "openai": OpenAIWhisperBackend,
+    "faster-whisper": FasterWhisperBackend,
+}
+
+
+def create_model(name="large-v3",whisperx=False, device=None, backend="openai", **options):
+    """Create the STT backend used to validate generated speech.
+
+    ``backend`` is a key of :data:`BACKENDS`; extra ``options`` go to the
+    backend (e.g. ``compute_type`` and ``batch_size`` for faster-whisper).
+    """
+    try:
+        backend_cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown STT backend: {backend}. Expected one of {sorted(BACKENDS)}") from None
+    return backend_cls(name, device=device, **options)
+
 
 def wav2txt(model, wav, sr, language="en"):
-    # Ensure the audio is in the correct format (float32) for Whisper
-    if isinstance(wav, torch.Tensor):
-        wav = wav.numpy()
-    if wav.dtype != np.float32:
-        wav = wav.astype(np.float32)
-    return model.transcribe(wav, language=language)["text"]
+    return model.transcribe(wav, sr, language=language)
+
+
+def wavs2txt(model, clips, language="en"):
+    """Transcribe a list of ``(wav, sr)`` clips in one backend call."""
+    return model.transcribe_batch(clips, language=language)
 
 # def wav2txt(model, wav, sr, language="en"):
 #     print("\n=== Starting wav2txt ===")
@@ -1,27 +1,18 @@
 import csv
 import re
-from datetime import datetime, timedelta
-import pandas as pd
-import srt
+from datetime import timedelta
 from pathlib import Path
-from . import tts_audio
 
-def format_timedelta(td: timedelta) -> str:
-    """
-    Convert a timedelta to an SRT‐style timestamp 'HH:MM:SS,mmm'.
-    """
-    total_ms = int(td.total_seconds() * 1000)
-    ms = total_ms % 1000
-    total_s = total_ms // 1000
-    hours = total_s // 3600
-    minutes = (total_s % 3600) // 60
-    seconds = total_s % 60
-    return f"{hours:02}:{minutes:02}:{seconds:02},{ms:03}"
+import numpy as np
 
+from . import calibration
+from .subtitle_table import SubtitleTable
+from .timeline import parse_timestamp, timedelta_to_ms
 
 
+def srt_to_csv(srt_file, csv_file, csv_view=False):
+    import srt
 
-def srt_to_csv(srt_file, csv_file):
     def fallback_parse_srt(srt_text):
         """Minimal fallback parser if srt.parse() fails."""
         lines = srt_text.replace('\ufeff', '').replace('\r\n', '\n').split('\n')
@@ -42,10 +33,9 @@ def srt_to_csv(srt_file, csv_file):
             elif line == "":
                 if subtitle_number and start_time and end_time and subtitle_text:
                     text = ' '.join(subtitle_text)
-                    start_dt = datetime.strptime(start_time, '%H:%M:%S,%f')
-                    end_dt = datetime.strptime(end_time, '%H:%M:%S,%f')
-                    entries.append(srt.Subtitle(index=subtitle_number, start=start_dt - datetime(1900, 1, 1),
-                                                end=end_dt - datetime(1900, 1, 1), content=text))
+                    entries.append(srt.Subtitle(index=subtitle_number,
+                                                start=timedelta(milliseconds=parse_timestamp(start_time)),
+                                                end=timedelta(milliseconds=parse_timestamp(end_time)), content=text))
                 subtitle_number = None
                 start_time = None
                 end_time = None
@@ -56,10 +46,9 @@ def srt_to_csv(srt_file, csv_file):
         # Final subtitle block
         if subtitle_number and start_time and end_time and subtitle_text:
             text = ' '.join(subtitle_text)
-            start_dt = datetime.strptime(start_time, '%H:%M:%S,%f')
-            end_dt = datetime.strptime(end_time, '%H:%M:%S,%f')
-            entries.append(srt.Subtitle(index=subtitle_number, start=start_dt - datetime(1900, 1, 1),
-                                        end=end_dt - datetime(1900, 1, 1), content=text))
+            entries.append(srt.Subtitle(index=subtitle_number,
+                                        start=timedelta(milliseconds=parse_timestamp(start_time)),
+                                        end=timedelta(milliseconds=parse_timestamp(end_time)), content=text))
         return entries
 
     # Read the file
@@ -73,91 +62,89 @@ def srt_to_csv(srt_file, csv_file):
         print(f"[Warning] Failed to parse with `srt` module: {e}")
         subtitles = fallback_parse_srt(srt_text)
 
-    # Write CSV
-    with open(csv_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile, quoting=csv.QUOTE_ALL)
-        writer.writerow(['Number', 'Start Time', 'End Time', 'Duration', 'Symbol Duration', 'Text'])
-
-        for sub in subtitles:
-            start_str = format_timedelta(sub.start)
-            end_str = format_timedelta(sub.end)
-            duration = (sub.end - sub.start).total_seconds()
-            text = sub.content.replace('\n', ' ').strip()
-            symbol_duration = duration / len(text) if len(text) > 0 else 0
-
-            writer.writerow([sub.index, start_str, end_str, duration, symbol_duration, text])
-            print("\t".join(map(str, [sub.index, start_str, end_str, duration, symbol_duration, text])))
-
-
-
-def add_speaker_columns(input_csv, output_csv, speakers=[]):
-    with open(input_csv, 'r', encoding='utf-8') as input_file, open(output_csv, 'w', newline='',
-                                                                     encoding='utf-8') as output_file:
-        reader = csv.DictReader(input_file)
-        fieldnames = reader.fieldnames[:-1] + ['Speaker', 'Text']
-        writer = csv.DictWriter(output_file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-
-        for row in reader:
-            text = row['Text']
-            # Extract the first occurrence of [ ... ]
-            match = re.search(r"\[(.*?)\]: ", text)
-            first_bracket_content =  match.group(1) if match else None
+    starts = [timedelta_to_ms(sub.start) for sub in subtitles]
+    ends = [timedelta_to_ms(sub.end) for sub in subtitles]
+    texts = [sub.content.replace('\n', ' ').strip() for sub in subtitles]
+    durations = (np.asarray(ends, dtype=np.int64) - np.asarray(starts, dtype=np.int64)) / 1000
+    lengths = np.array([len(text) for text in texts], dtype=np.float64)
+    symbol_durations = np.divide(durations, lengths, out=np.zeros_like(durations), where=lengths > 0)
+
+    table = SubtitleTable({
+        'Number': [sub.index for sub in subtitles],
+        'Start Time': starts,
+        'End Time': ends,
+        'Duration': durations,
+        'Symbol Duration': symbol_durations,
+        'Text': texts,
+    })
+    table.save(csv_file, csv_view)
+    print(f"{len(table)} subtitles written to {csv_file}")
+
+
+def add_speaker_columns(input_csv, output_csv, speakers=[], csv_view=False):
+    table = SubtitleTable.load(input_csv)
+    speaker_names = []
+    texts = []
+    for text in table['Text'].tolist():
+        # Extract the first occurrence of [ ... ]
+        match = re.search(r"\[(.*?)\]: ", text)
+        if match:
+            speaker_names.append(match.group(1))
             # Remove only the first occurrence
-            cleaned_text = re.sub(r"\[.*?\]: ", "", text, count=1).strip()
-            if first_bracket_content:
-                row["Speaker"] = first_bracket_content
-                row["Text"] = cleaned_text
-            else:
-                row["Speaker"] = ""
-            writer.writerow(row)
-            print("\t".join(map(str, row.values())))
-
-def find_closest_from_floor_value_index(value, array):
-    """
-    Find the closest floor value (largest value ≤ input value) and its index in a sorted array.
-    
-    :param value: The target value to compare against.
-    :param array: A list of numbers (assumed to be sorted in ascending order).
-    :return: A tuple (floor_value, index) where:
-             - floor_value is the closest value ≤ target value.
-             - index is the position of floor_value in the array.
+            texts.append(re.sub(r"\[.*?\]: ", "", text, count=1).strip())
+        else:
+            speaker_names.append("")
+            texts.append(text)
+    table.insert('Speaker', speaker_names, before='Text')
+    table['Text'] = texts
+    table.save(output_csv, csv_view)
+    tagged = sum(1 for name in speaker_names if name)
+    print(f"Speakers: {tagged} of {len(table)} lines tagged, written to {output_csv}")
+
+def interpolate_speeds(symbol_durations, speeds, calibrated_symbol_durations):
+    """Vectorized inverse of a speaker's calibration curve.
+
+    Returns ``(speeds, tts_symbol_durations)`` for every target symbol
+    duration: the TTS speed whose calibrated symbol duration equals the
+    target, interpolated linearly in ``1 / speed`` between calibration points.
+    The curve is made non-increasing first so the lookup stays monotone, and
+    targets outside it are clamped to the slowest or fastest calibrated speed.
     """
-    max_value, index = array[0], 0  # Initialize with the first element
-    
-    for i, arr in enumerate(array):
-        if arr < value:
-            max_value, index = arr, i 
-            break  # Stop when we find the first value greater than the target
-        max_value, index = arr, i  # Update max_value and index
-    
-    return max_value, index
-
-
-def add_speed_columns_with_speakers(output_csv_with_speakers, speakers, output_with_preview_speeds_csv):
-    with open(output_csv_with_speakers, 'r', encoding='utf-8') as input_file, open(output_with_preview_speeds_csv, 'w', newline='', encoding='utf-8') as output_file:
-        reader = csv.DictReader(input_file)
-        fieldnames = reader.fieldnames[:-2] + ['TTS Symbol Duration', 'TTS Speed Closest', 'Speaker', 'Text']
-        writer = csv.DictWriter(output_file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-        writer.writeheader()    
-
-        for row in reader:
-            symbol_duration = float(row['Symbol Duration'])
-            speaker_name = row['Speaker']
-            try:
-                speaker = speakers[speaker_name]
-            except KeyError:
-                print(f"Speaker {speaker_name} not found in speakers")
-                speaker_name = speakers["default_speaker_name"]
-                speaker = speakers[speaker_name]
-                print(f"Speaker not found in speakers, using default speaker {speaker_name}")
-            closest_duration, index = find_closest_from_floor_value_index(symbol_duration, speaker['symbol_durations'])
-            closet_speed = speaker['speeds'][index]
-            row['TTS Symbol Duration'] = closest_duration
-            row['TTS Speed Closest'] = closet_speed
-            row['Speaker'] = speaker_name
-            writer.writerow(row)
-            print("\t".join(map(str, row.values())))
+    speeds = np.asarray(speeds, dtype=float)
+    order = np.argsort(speeds)
+    speeds = speeds[order]
+    curve = np.minimum.accumulate(np.asarray(calibrated_symbol_durations, dtype=float)[order])
+    # np.interp needs increasing sample points: walk the curve from fast to slow.
+    durations, inverse_speeds = curve[::-1], 1.0 / speeds[::-1]
+    targets = np.clip(np.asarray(symbol_durations, dtype=float), durations[0], durations[-1])
+    return 1.0 / np.interp(targets, durations, inverse_speeds), targets
+
+
+def add_speed_columns_with_speakers(output_csv_with_speakers, speakers, output_with_preview_speeds_csv,
+                                    csv_view=False):
+    table = SubtitleTable.load(output_csv_with_speakers)
+    names = table['Speaker']
+    unknown = sorted(set(names.tolist()) - set(speakers))
+    if unknown:
+        default = speakers["default_speaker_name"]
+        print(f"Speakers {', '.join(map(repr, unknown))} not found in speakers, using default speaker {default}")
+        names = np.where(np.isin(names, unknown), default, names)
+
+    tts_speeds = np.zeros(len(table))
+    tts_symbol_durations = np.zeros(len(table))
+    for speaker_name in dict.fromkeys(names.tolist()):
+        speaker = speakers[speaker_name]
+        rows = names == speaker_name
+        speeds, symbol_durations = interpolate_speeds(
+            table['Symbol Duration'][rows], speaker['speeds'], speaker['symbol_durations'])
+        tts_speeds[rows] = speeds.round(4)
+        tts_symbol_durations[rows] = symbol_durations
+        print(f"Speaker {speaker_name}: {int(rows.sum())} rows, speeds {speeds.min():.2f}-{speeds.max():.2f}")
+
+    table['Speaker'] = names
+    table.insert('TTS Symbol Duration', tts_symbol_durations, before='Speaker')
+    table.insert('TTS Speed Closest', tts_speeds, before='Speaker')
+    table.save(output_with_preview_speeds_csv, csv_view)
 
 def get_speakers_from_folder(voice_folder):
     speakers = {}
@@ -201,15 +188,26 @@ def check_texts(voice_dir):
             exit(1)
     print("All text files are OK!")
 
-def check_speeds_csv(voice_dir):
+def check_speeds_csv(voice_dir, tts=None, tts_options=None):
+    """Make sure every voice has a ``speeds.csv`` matching its reference.
+
+    Calibrations are keyed by a hash of the reference wav and text, so a
+    voice is only re-calibrated when its reference changes, and a voice
+    already calibrated elsewhere is restored from the user cache.
+    """
     for sound_file in Path(voice_dir).glob("*.wav"):
         text_file_path = sound_file.with_suffix(".txt")
         with open(text_file_path) as text_file:
             text = text_file.read().strip()
 
         speeds_file = Path(voice_dir) / Path(sound_file).stem / "speeds.csv"
-        if not speeds_file.is_file():
-            tts_audio.F5TTS().generate_speeds_csv(speeds_file, text, sound_file)
+        key = calibration.calibration_key(sound_file, text)
+        if not calibration.restore(speeds_file, key):
+            if tts is None:
+                from . import tts_audio
+                tts = tts_audio.get_shared_tts(**(tts_options or {}))
+            tts.generate_speeds_csv(speeds_file, text, sound_file)
+            calibration.store(speeds_file, key)
     print("All speeds.csv are OK!")
 
 def take_first(dct):
@@ -220,6 +218,8 @@ def csv2excel(csv_file, excel_file,
                 sort_columns=["similarity"], ascending=True, 
                 drop_rows_with=({"gen_error":["0"]},), 
                 drop_columns=["Duration","Symbol Duration","TTS Symbol Duration","TTS Speed Closest","Speaker"]):
+    import pandas as pd
+
     df = pd.read_csv(csv_file, delimiter=delimiter)
     
     df.drop(drop_columns, axis=1, inplace=True)
@@ -236,4 +236,3 @@ def csv2excel(csv_file, excel_file,
     df = df.sort_values(by=sort_columns, ascending=ascending)
     df.to_excel(excel_file, index=False)
     
-
@@ -0,0 +1,177 @@
+"""Typed, columnar form of the subtitle CSVs passed between stages."""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from .timeline import format_timestamp, parse_timestamps
+
+TIME_COLUMNS = ("Start Time", "End Time")
+INT_COLUMNS = ("Number",)
+FLOAT_COLUMNS = ("Duration", "Symbol Duration", "TTS Symbol Duration", "TTS Speed Closest")
+
+SNAPSHOT_SUFFIX = ".npz"
+# Recorded in a snapshot saved without a CSV view.
+_NO_VIEW = [-1, -1]
+
+
+def _column(name: str, values) -> np.ndarray:
+    """``values`` converted to the type of column ``name``."""
+
+    if name in TIME_COLUMNS:
+        values = list(values) if not isinstance(values, np.ndarray) else values
+        if len(values) and isinstance(values[0], str):
+            return parse_timestamps(values)
+        return np.asarray(values, dtype=np.int64)
+    if name in INT_COLUMNS:
+        return np.asarray(values, dtype=np.int64)
+    if name in FLOAT_COLUMNS:
+        return np.asarray(values, dtype=np.float64)
+    return np.asarray(values, dtype=str)
+
+
+def snapshot_path(csv_path: str | Path) -> Path:
+    return Path(csv_path).with_suffix(SNAPSHOT_SUFFIX)
+
+
+def table_files(csv_path: str | Path) -> list[Path]:
+    """Files holding the table named ``csv_path``: its snapshot and, when there is one, its CSV view.
+
+    Stages fingerprint these, so a hand-edited CSV view invalidates the
+    stages after it.
+    """
+
+    return [path for path in (snapshot_path(csv_path), Path(csv_path)) if path.exists()]
+
+
+class SubtitleTable:
+    """Columns of one subtitle CSV as numpy arrays.
+
+    Times are ``int64`` milliseconds (see :mod:`~srt2audiotrack.timeline`),
+    ``Number`` is ``int64``, durations and speeds are ``float64`` and the
+    remaining columns are strings. Column order is the CSV field order.
+
+    Stages hand tables on as typed ``.npz`` snapshots written by
+    :meth:`save`; the CSV named by the table path is only an optional view
+    of it, for reading or editing by hand. :meth:`load` uses the snapshot
+    unless that CSV differs from the view the snapshot was saved with, so a
+    CSV edited by hand (e.g. to fix a speaker) still wins.
+    """
+
+    def __init__(self, columns: dict[str, Iterable]) -> None:
+        self.columns: dict[str, np.ndarray] = {}
+        for name, values in columns.items():
+            self[name] = values
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values) -> None:
+        column = _column(name, values)
+        if self.columns and name not in self.columns and len(column) != len(self):
+            raise ValueError(f"Column {name!r} has {len(column)} rows, the table has {len(self)}")
+        self.columns[name] = column
+
+    @property
+    def fieldnames(self) -> list[str]:
+        return list(self.columns)
+
+    def insert(self, name: str, values, before: str) -> None:
+        """Add column ``name`` just before column ``before`` (or replace it in place)."""
+
+        if name in self.columns:
+            self[name] = values
+            return
+        self[name] = values
+        column = self.columns.pop(name)
+        order = self.fieldnames
+        order.insert(order.index(before), name)
+        self.columns = {field: column if field == name else self.columns[field] for field in order}
+
+    def rows(self) -> list[dict]:
+        """The table as CSV-style rows of strings."""
+
+        text = {name: self._formatted(name) for name in self.columns}
+        return [dict(zip(text, values)) for values in zip(*text.values())]
+
+    def _formatted(self, name: str) -> list[str]:
+        column = self.columns[name]
+        if name in TIME_COLUMNS:
+            return [format_timestamp(value) for value in column.tolist()]
+        return [str(value) for value in column.tolist()]
+
+    @classmethod
+    def read_csv(cls, path: str | Path) -> "SubtitleTable":
+        with open(path, "r", encoding="utf-8", newline="") as handle:
+            reader = csv.reader(handle)
+            fieldnames = next(reader)
+            records = list(reader)
+        values = list(zip(*records)) if records else [()] * len(fieldnames)
+        return cls(dict(zip(fieldnames, values)))
+
+    def write_csv(self, path: str | Path) -> None:
+        """Write the CSV view in one bulk write."""
+
+        buffer = io.StringIO(newline="")
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        writer.writerow(self.fieldnames)
+        writer.writerows(zip(*(self._formatted(name) for name in self.columns)))
+        with open(path, "w", encoding="utf-8", newline="") as handle:
+            handle.write(buffer.getvalue())
+
+    def save(self, path: str | Path, csv_view: bool = False) -> None:
+        """Write the typed snapshot of the table named ``path``, and the CSV view at ``path`` if asked.
+
+        Without ``csv_view`` an earlier view at ``path`` is removed, as it no
+        longer matches the table.
+        """
+
+        path = Path(path)
+        if csv_view:
+            self.write_csv(path)
+            stat = path.stat()
+            recorded = [stat.st_size, stat.st_mtime_ns]
+        else:
+            path.unlink(missing_ok=True)
+            recorded = _NO_VIEW
+        snapshot = snapshot_path(path)
+        partial = snapshot.with_name(snapshot.name + ".part")
+        with open(partial, "wb") as handle:
+            np.savez(
+                handle,
+                __fields__=np.asarray(self.fieldnames, dtype=str),
+                __csv__=np.asarray(recorded, dtype=np.int64),
+                **{f"c{n}": column for n, column in enumerate(self.columns.values())},
+            )
+        os.replace(partial, snapshot)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "SubtitleTable":
+        """Table named ``path``: its snapshot, or the CSV at ``path`` when that was edited or has no snapshot."""
+
+        path = Path(path)
+        try:
+            stat = path.stat()
+            view = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            view = None
+        try:
+            with np.load(snapshot_path(path), allow_pickle=False) as snapshot:
+                if view is None or snapshot["__csv__"].tolist() == view:
+                    fields = snapshot["__fields__"].tolist()
+                    return cls({name: snapshot[f"c{n}"] for n, name in enumerate(fields)})
+        except (OSError, KeyError, ValueError):
+            pass
+        return cls.read_csv(path)
@@ -0,0 +1,60 @@
+"""Subtitle timestamps as integer milliseconds.
+
+Stages hand times on as ``int64`` millisecond columns of a
+:class:`~srt2audiotrack.subtitle_table.SubtitleTable` snapshot, and all
+arithmetic happens on those. ``HH:MM:SS,mmm`` strings are parsed here only
+when a table is read from an SRT or a CSV view, and produced again only when
+one is written.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import timedelta
+from typing import Iterable
+
+import numpy as np
+
+_TIMESTAMP = re.compile(r"\s*(\d+):(\d{1,2}):(\d{1,2})(?:[,.](\d{1,6}))?\s*")
+
+
+def parse_timestamp(text: str) -> int:
+    """Milliseconds of an ``HH:MM:SS,mmm`` (or ``HH:MM:SS.mmm``) timestamp."""
+
+    match = _TIMESTAMP.fullmatch(text)
+    if match is None:
+        raise ValueError(f"Invalid time format: '{text}'. Expected format is 'HH:MM:SS,mmm' or 'HH:MM:SS.mmm'.")
+    hours, minutes, seconds, fraction = match.groups()
+    milliseconds = int((fraction or "0").ljust(3, "0")[:3])
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + milliseconds
+
+
+def parse_timestamps(texts: Iterable[str]) -> np.ndarray:
+    """:func:`parse_timestamp` over a column, as an ``int64`` array."""
+
+    return np.fromiter((parse_timestamp(text) for text in texts), dtype=np.int64)
+
+
+def format_timestamp(milliseconds: int) -> str:
+    """SRT-style ``HH:MM:SS,mmm`` for a time in milliseconds."""
+
+    seconds, ms = divmod(int(milliseconds), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{ms:03}"
+
+
+def timedelta_to_ms(td: timedelta) -> int:
+    return td // timedelta(milliseconds=1)
+
+
+def ms_to_samples(milliseconds, sample_rate: int):
+    """Sample index of each time, truncated like ``int(seconds * sample_rate)``."""
+
+    return np.asarray(milliseconds, dtype=np.int64) * sample_rate // 1000
+
+
+def frames_to_ms(frames: int, sample_rate: int) -> int:
+    """Length of ``frames`` samples in whole milliseconds (truncated)."""
+
+    return int(frames) * 1000 // int(sample_rate)
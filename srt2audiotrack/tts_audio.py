@@ -2,43 +2,95 @@ import os
 import csv
 import random
 import sys
+import threading
 import soundfile as sf
-import torch
 import tqdm
-from cached_path import cached_path
 from pathlib import Path
-from omegaconf import OmegaConf
 from importlib.resources import files
-from hydra.utils import get_class
-import librosa
 from . import stt
 import re
-from . import subtitle_csv
+from dataclasses import dataclass, field
+from . import calibration, subtitle_csv
+from .hashing import file_digest, text_digest
+from .segment_cache import SegmentCache
+from .subtitle_table import SubtitleTable
+from .segment_journal import (
+    SegmentJournal,
+    audio_metadata,
+    reconcile_segments,
+    segment_identity,
+    write_audio_atomic,
+)
+from .validation import SKIPPED_TIER, ValidationPolicy, ValidationWorker
+from .lazy_imports import import_librosa
 import difflib
 
 
-from f5_tts.infer.utils_infer import (
-    hop_length,
-    infer_process,
-    load_model,
-    load_vocoder,
-    preprocess_ref_audio_text,
-    # remove_silence_edges,
-    # save_spectrogram,
-    target_sample_rate,
-)
-from f5_tts.model import DiT, UNetT
-from f5_tts.model.utils import seed_everything
+# Columns appended to the subtitle CSV in the ``_errors.csv`` validation report.
+REPORT_FIELDS = ["similarity", "gen_error", "whisper_text", "subtitle_text", "retries", "validation_tier"]
+
+
+def _infer_utils():
+    """Import ``f5_tts.infer.utils_infer`` on first use.
+
+    It drags in torch, torchaudio and the vocoders, so it is only loaded once
+    an :class:`F5TTS` is actually created.
+    """
+    from f5_tts.infer import utils_infer
+    return utils_infer
+
+
+_shared_engines = {}
+
+
+def get_shared_tts(**kwargs):
+    """Return a process-wide :class:`F5TTS` instance for the given settings.
+
+    The F5 checkpoint, the vocoder and the Whisper model are loaded on the
+    first call only; later calls with the same keyword arguments reuse the
+    resident models.
+    """
+    key = tuple(sorted(kwargs.items()))
+    engine = _shared_engines.get(key)
+    if engine is None:
+        engine = F5TTS(**kwargs)
+        _shared_engines[key] = engine
+    return engine
+
+
+@dataclass
+class ReferenceBundle:
+    """Preprocessed reference of one speaker, shared by all its segments."""
+
+    ref_file: str  # clipped and silence-trimmed wav written by F5-TTS
+    ref_text: str  # normalized reference text
+    audio: object  # torch.Tensor loaded from ``ref_file``
+    sample_rate: int
+    max_chars: int  # longest text chunk that fits next to this reference
+    # target_rms -> (mel conditioning tensor, original RMS), see F5TTS.infer_batch
+    conditioning: dict = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.audio.shape[-1] / self.sample_rate
 
 
 class F5TTS:
     def __init__(self, model_type="F5-TTS", ckpt_file="", vocab_file="", ode_method="euler",
-                 use_ema=True, vocoder_name="vocos", local_path=None, device=None):
+                 use_ema=True, vocoder_name="vocos", local_path=None, device=None, stt_device=None,
+                 stt_backend="openai", stt_model="large-v3", stt_compute_type="int8", stt_fast_model=None,
+                 validation_accept_similarity=1.0, validation_short_chars=0, validation_short_sample=1.0):
+        import torch
+
+        utils_infer = _infer_utils()
         self.final_wave = None
-        self.target_sample_rate = target_sample_rate
-        self.hop_length = hop_length
+        self.target_sample_rate = utils_infer.target_sample_rate
+        self.hop_length = utils_infer.hop_length
         self.seed = -1
+        self.seed_policy = "random"  # every line is sampled with a fresh seed
         self.mel_spec_type = vocoder_name
+        self._references = {}
+        self.inference_count = 0  # F5 sampling calls, used to report retries
         self.device = device or (
             "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
         )
@@ -46,12 +98,42 @@ class F5TTS:
 
         self.load_vocoder_model(vocoder_name, local_path)
         self.load_ema_model(model_type, ckpt_file, vocoder_name, vocab_file, ode_method, use_ema)
-        self.stt_model = stt.create_model()
+        # Whisper tiers, cheapest first; a tier is loaded the first time a segment reaches it.
+        self.stt_tiers = [name for name in (stt_fast_model, stt_model) if name]
+        self._stt_options = {"device": stt_device, "backend": stt_backend}
+        if stt_backend == "faster-whisper":
+            self._stt_options["compute_type"] = stt_compute_type
+        self._stt_models = {}
+        self._stt_lock = threading.Lock()
+        self.validation_policy = ValidationPolicy(
+            accept_similarity=validation_accept_similarity,
+            short_line_chars=validation_short_chars,
+            short_line_sample=validation_short_sample,
+        )
+        if len(self.stt_tiers) == 1:
+            self.get_stt_model(stt_model)  # no escalation possible: load it up front as before
+
+    @property
+    def stt_model(self):
+        """The most accurate Whisper tier (``stt_model``)."""
+        return self.get_stt_model(self.stt_tiers[-1])
+
+    def get_stt_model(self, name):
+        with self._stt_lock:
+            if name not in self._stt_models:
+                self._stt_models[name] = stt.create_model(name, **self._stt_options)
+            return self._stt_models[name]
 
     def load_vocoder_model(self, vocoder_name, local_path):
-        self.vocoder = load_vocoder(vocoder_name, local_path is not None, local_path, self.device)
+        self.vocoder = _infer_utils().load_vocoder(vocoder_name, local_path is not None, local_path, self.device)
 
     def load_ema_model(self, model_type, ckpt_file, mel_spec_type, vocab_file, ode_method, use_ema):
+        from cached_path import cached_path
+        from hydra.utils import get_class
+        from omegaconf import OmegaConf
+        from f5_tts.model import DiT, UNetT
+
+        load_model = _infer_utils().load_model
         # Use correct model name
         model = "F5TTS_v1_Base"
         
@@ -92,6 +174,8 @@ class F5TTS:
         self.ema_model = load_model(
             model_cls, model_cfg, ckpt_file, mel_spec_type, vocab_file, ode_method, use_ema, self.device
         )
+        # Identifies the weights for caches of synthesized audio.
+        self.model_id = text_digest(model_type, ckpt_file, mel_spec_type, vocab_file, ode_method, use_ema)
 
     def export_wav(self, wav, file_wave, remove_silence=None):
         sf.write(file_wave, wav, self.target_sample_rate)
@@ -102,21 +186,26 @@ class F5TTS:
               remove_silence=True, # to start from start
               file_wave=None, seed=-1,
               remove_silence_top_db=35):
+        from f5_tts.model.utils import seed_everything
+
+        utils_infer = _infer_utils()
         if seed == -1:
             seed = random.randint(0, sys.maxsize)
         seed_everything(seed)
         self.seed = seed
+        self.inference_count += 1
 
-        ref_file, ref_text = preprocess_ref_audio_text(ref_file, ref_text)#, device=self.device)
+        reference = self.get_reference(ref_file, ref_text)
+        gen_text_batches = utils_infer.chunk_text(gen_text, max_chars=reference.max_chars)
+        show_info(f"Generating audio in {len(gen_text_batches)} batches...")
 
-        wav, sr, spect = infer_process(
-            ref_file,
-            ref_text,
-            gen_text,
+        wav, sr, spect = next(utils_infer.infer_batch_process(
+            (reference.audio, reference.sample_rate),
+            reference.ref_text,
+            gen_text_batches,
             self.ema_model,
             self.vocoder,
             self.mel_spec_type,
-            show_info=show_info,
             progress=progress,
             target_rms=target_rms,
             cross_fade_duration=cross_fade_duration,
@@ -126,10 +215,10 @@ class F5TTS:
             speed=speed,
             fix_duration=fix_duration,
             device=self.device,
-        )
+        ))
 
         if remove_silence:
-            trimmed, index = librosa.effects.trim(wav, top_db=remove_silence_top_db)
+            trimmed, index = import_librosa().effects.trim(wav, top_db=remove_silence_top_db)
             print(f"Trimmed from {file_wave} from sample {index[0]} to {index[1]}")
             wav = trimmed
             
@@ -139,6 +228,121 @@ class F5TTS:
 
         return wav, sr
 
+    def get_reference(self, ref_file, ref_text):
+        """Return the preprocessed reference for ``ref_file``.
+
+        Decoding, resampling and silence clipping happen once per reference
+        content; the bundle is memoized by the file's SHA-1 and the reference
+        text, so every segment and retry of a speaker reuses it.
+        """
+        key = (file_digest(ref_file), ref_text)
+        reference = self._references.get(key)
+        if reference is None:
+            import torchaudio
+
+            utils_infer = _infer_utils()
+            processed_file, processed_text = utils_infer.preprocess_ref_audio_text(ref_file, ref_text)
+            audio, sr = torchaudio.load(processed_file)
+            audio_seconds = audio.shape[-1] / sr
+            max_chars = int(len(processed_text.encode("utf-8")) / audio_seconds * (22 - audio_seconds))
+            reference = ReferenceBundle(processed_file, processed_text, audio, sr, max_chars)
+            self._references[key] = reference
+        return reference
+
+    def _reference_conditioning(self, reference, target_rms):
+        """Return the reference mel spectrogram used to condition the sampler."""
+        cached = reference.conditioning.get(target_rms)
+        if cached is None:
+            import torch
+            import torchaudio
+
+            audio = reference.audio
+            if audio.shape[0] > 1:
+                audio = torch.mean(audio, dim=0, keepdim=True)
+            rms = torch.sqrt(torch.mean(torch.square(audio)))
+            if rms < target_rms:
+                audio = audio * target_rms / rms
+            if reference.sample_rate != self.target_sample_rate:
+                audio = torchaudio.transforms.Resample(reference.sample_rate, self.target_sample_rate)(audio)
+            with torch.inference_mode():
+                cond = self.ema_model.mel_spec(audio.to(self.device)).permute(0, 2, 1)
+            cached = (cond, rms)
+            reference.conditioning[target_rms] = cached
+        return cached
+
+    def infer_batch(self, ref_file, ref_text, gen_texts, speeds=None, fix_durations=None, target_rms=0.1,
+                    sway_sampling_coef=-1, cfg_strength=2, nfe_step=32, remove_silence=True, seed=-1,
+                    remove_silence_top_db=35):
+        """Synthesize several lines of one speaker in a single padded forward pass.
+
+        Every line gets its own duration (from ``speeds`` or ``fix_durations``,
+        which, as in F5-TTS, include the reference length). Lines must fit in
+        one text chunk, see ``ReferenceBundle.max_chars``.
+
+        Returns a list of ``(wav, sr)`` tuples in the order of ``gen_texts``.
+        """
+        import torch
+        from f5_tts.model.utils import convert_char_to_pinyin, seed_everything
+
+        if seed == -1:
+            seed = random.randint(0, sys.maxsize)
+        seed_everything(seed)
+        self.seed = seed
+
+        count = len(gen_texts)
+        self.inference_count += 1
+        speeds = speeds or [1.0] * count
+        fix_durations = fix_durations or [None] * count
+        reference = self.get_reference(ref_file, ref_text)
+        cond, rms = self._reference_conditioning(reference, target_rms)
+        ref_text = reference.ref_text
+        if len(ref_text[-1].encode("utf-8")) == 1:
+            ref_text = ref_text + " "
+
+        ref_audio_len = cond.shape[1]
+        ref_text_len = len(ref_text.encode("utf-8"))
+        text_list = convert_char_to_pinyin([ref_text + gen_text for gen_text in gen_texts])
+        durations = []
+        for gen_text, text_tokens, speed, fix_duration in zip(gen_texts, text_list, speeds, fix_durations):
+            if fix_duration is not None:
+                duration = int(fix_duration * self.target_sample_rate / self.hop_length)
+            else:
+                gen_text_len = len(gen_text.encode("utf-8"))
+                local_speed = 0.3 if gen_text_len < 10 else speed
+                duration = ref_audio_len + int(ref_audio_len / ref_text_len * gen_text_len / local_speed)
+            # The sampler never generates fewer frames than the prompt needs.
+            durations.append(max(duration, max(len(text_tokens), ref_audio_len) + 1))
+
+        print(f"Batch-generating {count} lines for {ref_file}")
+        with torch.inference_mode():
+            generated, _ = self.ema_model.sample(
+                cond=cond.expand(count, -1, -1),
+                text=text_list,
+                duration=torch.tensor(durations, dtype=torch.long, device=cond.device),
+                lens=torch.full((count,), ref_audio_len, dtype=torch.long, device=cond.device),
+                steps=nfe_step,
+                cfg_strength=cfg_strength,
+                sway_sampling_coef=sway_sampling_coef,
+            )
+            del _
+            generated = generated.to(torch.float32)[:, ref_audio_len:max(durations), :]
+            generated = generated.permute(0, 2, 1)
+            if self.mel_spec_type == "vocos":
+                waves = self.vocoder.decode(generated)
+            else:
+                waves = self.vocoder(generated)
+            if rms < target_rms:
+                waves = waves * rms / target_rms
+            waves = waves.reshape(count, -1).cpu().numpy()
+
+        results = []
+        for wave, duration in zip(waves, durations):
+            wav = wave[:(duration - ref_audio_len) * self.hop_length]
+            if remove_silence:
+                wav, _ = import_librosa().effects.trim(wav, top_db=remove_silence_top_db)
+            results.append((wav, self.target_sample_rate))
+        return results
+
     @staticmethod
     def all_segments_in_folder_check(csv_file:str, folder:str):
         """
@@ -148,13 +352,11 @@ class F5TTS:
             csv_file (str): Path to the CSV file containing the fragment details.
             folder (str): Path to the folder where the fragments should be located.
         """
-        with open(csv_file, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            missing_files = []
-            for i, _ in enumerate(reader):
-                expected_file = f"segment_{i + 1}.wav"
-                if not os.path.exists(os.path.join(folder, expected_file)):
-                    missing_files.append(expected_file)
+        missing_files = []
+        for i in range(len(SubtitleTable.load(csv_file))):
+            expected_file = f"segment_{i + 1}.wav"
+            if not os.path.exists(os.path.join(folder, expected_file)):
+                missing_files.append(expected_file)
 
         if not missing_files:
             print("All fragments are present in the folder.")
@@ -187,7 +389,7 @@ class F5TTS:
         predicted_speed = speed_1 + (limit_duration - duration_1) * (speed_2 - speed_1) / (duration_2 - duration_1)
         return predicted_speed
 
-    def infer_wav(self, gen_text, speed, ref_file, ref_text, file_wave=None):
+    def infer_wav(self, gen_text, speed, ref_file, ref_text, file_wave=None, fix_duration=None):
         wav, sr = self.infer(
             ref_file=ref_file,
             ref_text=ref_text,
@@ -195,11 +397,67 @@ class F5TTS:
             speed=speed,
             show_info=print,
             progress=tqdm,
-            fix_duration=None,
+            fix_duration=fix_duration,
             file_wave=file_wave
         )
         return wav, sr, len(wav) / sr 
 
+    @staticmethod
+    def planned_duration(row):
+        """Seconds of speech to synthesize for ``row`` in ``fixed`` duration mode.
+
+        The speaker's calibrated symbol duration at the row's speed predicts
+        how long the line takes; it is capped by the subtitle ``Duration`` so
+        the first take already fits.
+        """
+        duration = float(row['Duration'])
+        symbol_duration = row.get('TTS Symbol Duration')
+        if symbol_duration in (None, ""):
+            return duration
+        return max(min(duration, len(row['Text']) * float(symbol_duration)), 0.1)
+
+    def fits_one_chunk(self, text, ref_file, ref_text):
+        """Whether F5 synthesizes ``text`` in a single chunk next to this reference."""
+        return len(text.encode("utf-8")) <= self.get_reference(ref_file, ref_text).max_chars
+
+    def row_duration_mode(self, row, ref_file, ref_text, duration_mode="fixed"):
+        """``duration_mode`` used for ``row``: longer lines than one F5 chunk fall back to ``search``.
+
+        F5 applies ``fix_duration`` to every chunk of a line, so a line split
+        in N chunks would come out N times its planned length.
+        """
+        if duration_mode == "fixed" and not self.fits_one_chunk(row['Text'], ref_file, ref_text):
+            return "search"
+        return duration_mode
+
+    def fix_duration_for(self, row, ref_file, ref_text):
+        """Total F5 ``fix_duration`` (reference plus generated speech) for ``row``."""
+        return self.get_reference(ref_file, ref_text).duration + self.planned_duration(row)
+
+    def synthesis_target(self, row, duration_mode="fixed"):
+        """The length or speed the first take of ``row`` is synthesized at, as text."""
+        if duration_mode == "fixed":
+            target = f"fixed:{self.planned_duration(row):.3f}"
+        else:
+            target = f"{duration_mode}:{float(row.get('TTS Speed Closest', 1.0)):.3f}"
+        return f"{target}:limit={float(row['Duration']):.3f}"
+
+    def segment_cache_key(self, row, ref_file, ref_text, duration_mode="fixed"):
+        """:class:`SegmentCache` key of the final take for ``row``."""
+        target = self.synthesis_target(row, self.row_duration_mode(row, ref_file, ref_text, duration_mode))
+        return SegmentCache.key(row['Text'], file_digest(ref_file), ref_text, target, self.model_id, self.seed_policy)
+
+    def segment_identity(self, row, ref_file, ref_text, duration_mode="fixed"):
+        """Journal identity of the segment for ``row``, see :func:`segment_identity`.
+
+        The speaker's reference audio and text, the duration target and the
+        model are part of it, so a changed voice, speed or checkpoint makes the
+        journaled segment stale instead of being reused.
+        """
+        reference = file_digest(ref_file) if Path(ref_file).is_file() else str(ref_file)
+        target = self.synthesis_target(row, self.row_duration_mode(row, ref_file, ref_text, duration_mode))
+        return segment_identity(row, reference, ref_text, target, self.model_id)
+
     def generate_wav_if_longer(self, wav, sr, gen_text, duration, previous_duration, previous_speed, 
                                 ref_file, ref_text, i, 
                                 counter_max=10):
@@ -227,8 +485,9 @@ class F5TTS:
             counter += 1
             if counter > counter_max:
                 wav, sr,previous_duration = self.infer_wav(gen_text, start_speed, ref_file, ref_text)
+                previous_speed = start_speed
                 break
-        return wav, sr, previous_duration
+        return wav, sr, previous_duration, previous_speed
 
     def clean_text(self,text,replacement = r"[.,!?\-:;’'\"]"):
         text = text.strip().lower().replace("\n", " ")
@@ -242,62 +501,239 @@ class F5TTS:
 
     def is_generated_text_equal_to_subtitles_text(self,wav,sr,subtitles_text):
         gen_text = stt.wav2txt(self.stt_model, wav, sr)
+        return self.compare_texts(gen_text, subtitles_text)
+
+    def validate_segments(self, items):
+        """Validate ``(wav, sr, subtitles_text)`` items through the Whisper tiers.
+
+        Every item the :class:`ValidationPolicy` selects is transcribed by the
+        cheapest tier in one batch call; only items whose verdict the policy
+        does not accept go on to the next tier. Each outcome ends with the name
+        of the tier that decided it, or ``"skipped"``.
+        """
+        outcomes = [None] * len(items)
+        todo = []
+        for n, (_, _, text) in enumerate(items):
+            if self.validation_policy.should_validate(self.clean_text(text)):
+                todo.append(n)
+            else:
+                outcomes[n] = (True, "", self.clean_text(text), 1.0, SKIPPED_TIER)
+        for level, tier in enumerate(self.stt_tiers):
+            if not todo:
+                break
+            final = level == len(self.stt_tiers) - 1
+            gen_texts = stt.wavs2txt(self.get_stt_model(tier), [items[n][:2] for n in todo])
+            escalate = []
+            for n, gen_text in zip(todo, gen_texts):
+                outcomes[n] = (*self.compare_texts(gen_text, items[n][2], warn=final), tier)
+                is_equal, _, _, similarity, _ = outcomes[n]
+                if not final and not self.validation_policy.accepts(is_equal, similarity):
+                    escalate.append(n)
+            todo = escalate
+        return outcomes
+
+    def compare_texts(self, gen_text, subtitles_text, warn=True):
         gen_text = self.clean_text(gen_text)
         subtitles_text = self.clean_text(subtitles_text)
         similarity = self.similarity(gen_text,subtitles_text)
-        if gen_text != subtitles_text:
+        if warn and gen_text != subtitles_text:
             print(f"ALARM !!! Generated text: {gen_text} != Subtitles text: {subtitles_text} \n Similarity: {similarity}")
         return gen_text == subtitles_text,gen_text,subtitles_text,similarity 
 
-    def generate_from_csv_with_speakers(self, csv_file, output_folder, speakers, default_speaker, rewrite=False):
+    @staticmethod
+    def speaker_reference(row, speakers, default_speaker):
+        """Return ``(ref_file, ref_text)`` for the speaker of a CSV row."""
+        try:
+            speaker_name = row['Speaker']
+            return speakers[speaker_name]["ref_file"], speakers[speaker_name]["ref_text"]
+        except:
+            print("Something is wrong. Let's take default speaker")
+            return default_speaker["ref_file"], default_speaker["ref_text"]
+
+    def group_for_batches(self, pending, batch_size):
+        """Split pending rows into synthesis groups.
+
+        Rows are grouped by speaker and sorted by their expected length
+        (characters divided by speed), so a padded batch wastes few frames.
+        Rows whose text needs more than one F5 chunk are returned alone.
+        """
+        if batch_size <= 1:
+            return [[item] for item in pending]
+        by_speaker = {}
+        singles = []
+        for item in pending:
+            _, row, _, ref_file, ref_text = item
+            if not self.fits_one_chunk(row['Text'], ref_file, ref_text):
+                singles.append([item])
+            else:
+                by_speaker.setdefault((str(ref_file), ref_text), []).append(item)
+        groups = []
+        for items in by_speaker.values():
+            items.sort(key=lambda item: len(item[1]['Text']) / float(item[1].get('TTS Speed Closest', 1.0)))
+            groups.extend(items[start:start + batch_size] for start in range(0, len(items), batch_size))
+        return groups + singles
+
+    def first_takes(self, group, duration_mode="fixed"):
+        """Synthesize the first take of every row in ``group``.
+
+        In ``fixed`` mode each line is generated at exactly its planned length
+        (see :meth:`planned_duration`); in ``search`` mode, and for lines too
+        long for one F5 chunk (see :meth:`row_duration_mode`), F5 derives the
+        length from the row's speed.
+        """
+        fix_durations = None
+        if duration_mode == "fixed":
+            fix_durations = [
+                self.fix_duration_for(row, ref_file, ref_text)
+                if self.row_duration_mode(row, ref_file, ref_text, duration_mode) == "fixed" else None
+                for _, row, _, ref_file, ref_text in group
+            ]
+        if len(group) == 1:
+            _, row, _, ref_file, ref_text = group[0]
+            wav, sr, _ = self.infer_wav(
+                row['Text'],
+                float(row.get('TTS Speed Closest', 1.0)),
+                ref_file,
+                ref_text,
+                fix_duration=fix_durations[0] if fix_durations else None,
+            )
+            return [(wav, sr)]
+        _, _, _, ref_file, ref_text = group[0]
+        return self.infer_batch(
+            ref_file,
+            ref_text,
+            [row['Text'] for _, row, _, _, _ in group],
+            speeds=[float(row.get('TTS Speed Closest', 1.0)) for _, row, _, _, _ in group],
+            fix_durations=fix_durations,
+        )
+
+    def generate_from_csv_with_speakers(self, csv_file, output_folder, speakers, default_speaker, rewrite=False,
+                                        batch_size=1, duration_mode="fixed", validation_queue_size=8,
+                                        validation_batch_size=8, segment_cache=None):
+        """Generate ``segment_N.wav`` for every row of ``csv_file``.
+
+        With ``batch_size > 1`` the first take of up to ``batch_size`` lines of
+        the same speaker is synthesized in one forward pass. ``duration_mode``
+        selects how the first take is sized (``fixed`` or ``search``, see
+        :meth:`first_takes`); lines that still come out too long are
+        regenerated by the speed search, and the number of extra inferences is
+        reported in the ``retries`` column of the errors CSV.
+
+        Each segment is written atomically as soon as it is ready and recorded
+        in the folder's :class:`SegmentJournal` under its identity (text,
+        speaker, duration, reference audio and text, duration target and model;
+        see :meth:`segment_identity`), so an interrupted run resumes at the first
+        missing segment and, after subtitle edits, only added or changed lines
+        are synthesized (see :func:`reconcile_segments`). Whisper validation runs on a
+        :class:`ValidationWorker` thread and records each result in the journal as
+        it arrives; at most ``validation_queue_size`` segments wait for it and
+        up to ``validation_batch_size`` of them are transcribed per STT call. The
+        errors CSV is written once validation is done, in subtitle order.
+
+        With a :class:`SegmentCache`, lines already synthesized for the same
+        speaker, text and target (in any job, or before ``rewrite``) are copied
+        from the cache together with their validation result instead of being
+        generated again.
+        """
         os.makedirs(output_folder, exist_ok=True)
+        journal = SegmentJournal(output_folder)
+        if rewrite:
+            journal.reset()
         filename_errors_csv = f"{str(csv_file)[:-4]}_errors.csv"
-        with open(csv_file, 'r', encoding='utf-8') as csvfile, \
-             open(filename_errors_csv, 'w', newline='', encoding='utf-8') as csv_writer:
-            reader = csv.DictReader(csvfile)
-            writer_filednames = [*reader.fieldnames, "similarity","gen_error","whisper_text","subtitle_text"]
+        table = SubtitleTable.load(csv_file)
+        with open(filename_errors_csv, 'w', newline='', encoding='utf-8') as csv_writer:
+            writer_filednames = [*table.fieldnames, *REPORT_FIELDS]
             writer = csv.DictWriter(csv_writer, fieldnames=writer_filednames, delimiter=';')
             writer.writeheader()
-            generated_segments = []
-            generated_texts = []
-            for i, row in enumerate(reader):
-                file_wave = os.path.join(output_folder, f"segment_{i + 1}.wav")
-                if not rewrite and os.path.exists(file_wave):
+            # Report lines by row index, written in subtitle order once validation is done.
+            report = {}
+
+            def record_validation(key, outcome):
+                # Runs on the validation thread; the report is read only after it exits.
+                i, row, retries = key
+                is_equal, whisper_text, subtitles_text, similarity, tier = outcome
+                result = {"similarity": f"{similarity:.2f}", "gen_error": "1" if not is_equal else "0", "whisper_text": whisper_text, "subtitle_text": subtitles_text, "retries": retries, "validation_tier": tier}
+                journal.append(i, **result)
+                report[i] = {**row, **result}
+                if i in cache_keys:
+                    segment_cache.update(cache_keys[i], **{name: result[name] for name in REPORT_FIELDS if name != "retries"})
+
+            cache_keys = {}
+
+            rows = table.rows()
+            references = [self.speaker_reference(row, speakers, default_speaker) for row in rows]
+            identities = [
+                self.segment_identity(row, ref_file, ref_text, duration_mode)
+                for row, (ref_file, ref_text) in zip(rows, references)
+            ]
+            entries = {} if rewrite else reconcile_segments(journal, rows, identities)
+            pending = []
+            unvalidated = []
+            for i, row in enumerate(rows):
+                file_wave = SegmentJournal.segment_path(output_folder, i)
+                entry = entries.get(i)
+                if entry is not None:
+                    # Finished by an earlier run: keep its line in the report.
+                    if "gen_error" in entry:
+                        report[i] = {**row, **{name: entry.get(name, "") for name in REPORT_FIELDS}}
+                    elif "retries" in entry:
+                        unvalidated.append((i, row, file_wave, entry.get("retries", "")))
                     continue
-                duration = float(row['Duration'])
-                gen_text = row['Text']
-                generated_texts.append(gen_text)
-                previous_speed = float(row.get('TTS Speed Closest', 1.0))  # Read the speed from `speed_tts_closest`, default to 1.0 if missing
-
-                try:
-                    speaker_name = row['Speaker']
-                    ref_text = speakers[speaker_name]["ref_text"]
-                    ref_file = speakers[speaker_name]["ref_file"]
-                except:
-                    print("Something is wrong. Let's take default speaker")
-                    ref_text = default_speaker["ref_text"]
-                    ref_file = default_speaker["ref_file"]
-
-                file_wave_debug = None # f"segment_{i}_speed_{previous_speed}.wav" # for debug
-                wav, sr, previous_duration = self.infer_wav(gen_text, previous_speed, ref_file, ref_text,file_wave=file_wave_debug)
-                
-                wav, sr, previous_duration = self.generate_wav_if_longer(wav, sr, gen_text, duration, previous_duration, previous_speed, ref_file, ref_text, i)
-
-                print(f"Generated WAV-{i} with symbol duration {previous_duration}")        
-                generated_segments.append((wav, file_wave, sr)) 
-                is_equal,gen_text,subtitles_text, similarity = self.is_generated_text_equal_to_subtitles_text(wav, sr, gen_text)
-                writer.writerow({**row, "similarity": f"{similarity:.2f}", "gen_error": "1" if not is_equal else "0", "whisper_text": gen_text, "subtitle_text": subtitles_text})
-            
-            # Reset to the beginning of the file
-            csvfile.seek(0)
-            # Re-create the DictReader to re-parse the header row
-            reader = csv.DictReader(csvfile)      
-            
-            for i, row in enumerate(reader):
-                wav, file_wave, sr = generated_segments[i]
-                generated_texts.append(row['Text'])
-                sf.write(file_wave, wav, sr)
-                print(f"Saved WAV as {file_wave}")
+                ref_file, ref_text = references[i]
+                if segment_cache is not None:
+                    key = self.segment_cache_key(row, ref_file, ref_text, duration_mode)
+                    cached = segment_cache.get(key)
+                    if cached is None:
+                        cache_keys[i] = key
+                    else:
+                        wav, sr, metadata = cached
+                        write_audio_atomic(file_wave, wav, sr)
+                        journal.append(i, text=row['Text'], speaker=row.get('Speaker', ''), duration=len(wav) / sr,
+                                       retries=0, cache_key=key, identity=identities[i],
+                                       **audio_metadata(file_wave, wav, sr))
+                        if "gen_error" in metadata:
+                            result = {**{name: metadata.get(name, "") for name in REPORT_FIELDS}, "retries": 0}
+                            journal.append(i, **result)
+                            report[i] = {**row, **result}
+                        else:
+                            cache_keys[i] = key
+                            unvalidated.append((i, row, file_wave, 0))
+                        continue
+                pending.append((i, row, str(file_wave), ref_file, ref_text))
+            print(f"{len(pending)} segments to generate, {len(entries)} reused from {journal.path}")
+            if segment_cache is not None:
+                print(f"Segment cache {segment_cache.root}: {segment_cache.hits} hits, {segment_cache.misses} misses")
+
+            with ValidationWorker(self.validate_segments, record_validation,
+                                  maxsize=validation_queue_size, batch_size=validation_batch_size) as validator:
+                for i, row, file_wave, retries in unvalidated:
+                    wav, sr = sf.read(str(file_wave), dtype='float32')
+                    validator.submit((i, row, retries), wav, sr, row['Text'])
+
+                for group in self.group_for_batches(pending, batch_size):
+                    first_takes = self.first_takes(group, duration_mode)
+                    for (i, row, file_wave, ref_file, ref_text), (wav, sr) in zip(group, first_takes):
+                        duration = float(row['Duration'])
+                        gen_text = row['Text']
+                        previous_speed = float(row.get('TTS Speed Closest', 1.0))  # Read the speed from `speed_tts_closest`, default to 1.0 if missing
+                        previous_duration = len(wav) / sr
+
+                        inferences = self.inference_count
+                        wav, sr, previous_duration, speed = self.generate_wav_if_longer(wav, sr, gen_text, duration, previous_duration, previous_speed, ref_file, ref_text, i)
+                        retries = self.inference_count - inferences
+
+                        print(f"Generated WAV-{i} with symbol duration {previous_duration}")
+                        write_audio_atomic(file_wave, wav, sr)
+                        journal.append(i, text=row['Text'], speaker=row.get('Speaker', ''), duration=previous_duration,
+                                       retries=retries, speed=speed, identity=identities[i],
+                                       **audio_metadata(file_wave, wav, sr))
+                        print(f"Saved WAV as {file_wave}")
+                        if i in cache_keys:
+                            segment_cache.put(cache_keys[i], wav, sr, duration=previous_duration, retries=retries)
+                        validator.submit((i, row, retries), wav, sr, gen_text)
+            writer.writerows(report[i] for i in sorted(report))
+        if segment_cache is not None:
+            segment_cache.evict()
         excel_file_name = os.path.basename(filename_errors_csv)
         excel_file_name = excel_file_name.split("_3.0_")[0] + ".xlsx"
         parent_of_parent = os.path.dirname(os.path.dirname(filename_errors_csv))
@@ -307,20 +743,43 @@ class F5TTS:
 
 
 
-    def generate_speeds_csv(self, output_csv, ref_text, ref_file):
-        gen_text = "Some call me nature, others call me mother nature. Let's try some long text. We are just trying to get more fidelity. It's OK!"
-        speeds = [0.3,0.4,0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 1.8, 1.9, 2.0, 2.1, 2.2, 2.3, 2.4, 2.5]
-        rows = []
-        Path(output_csv).parent.mkdir(parents=True, exist_ok=True)
-        for speed in speeds:
-
-            file_name = Path(output_csv).parent/f"gen_out_{speed}.wav"
+    def generate_speeds_csv(self, output_csv, ref_text, ref_file, adaptive=True, batch_size=8):
+        """Write the speed/duration calibration of one speaker to ``output_csv``.
 
+        With ``adaptive`` only the speeds needed to describe the curve are
+        synthesized (see :func:`calibration.adaptive_sweep`), up to
+        ``batch_size`` of them per forward pass; the other rows are
+        interpolated and have an empty ``file_name``.
+        """
+        gen_text = calibration.CALIBRATION_TEXT
+        speeds = calibration.CALIBRATION_SPEEDS
+        Path(output_csv).parent.mkdir(parents=True, exist_ok=True)
+        fits_one_chunk = self.fits_one_chunk(gen_text, ref_file, ref_text)
+
+        def measure(batch_speeds):
+            durations = []
+            for start in range(0, len(batch_speeds), batch_size):
+                chunk = batch_speeds[start:start + batch_size]
+                if fits_one_chunk:
+                    takes = self.infer_batch(ref_file, ref_text, [gen_text] * len(chunk), speeds=chunk)
+                else:
+                    takes = [self.infer(ref_file, ref_text, gen_text, speed=speed, fix_duration=None,
+                                        remove_silence=True) for speed in chunk]
+                for speed, (wav, sr) in zip(chunk, takes):
+                    sf.write(str(Path(output_csv).parent / f"gen_out_{speed}.wav"), wav, sr)
+                    durations.append(len(wav) / sr)
+            return durations
+
+        if adaptive:
+            durations, measured = calibration.adaptive_sweep(measure, speeds)
+        else:
+            durations, measured = measure(list(speeds)), set(speeds)
+        print(f"Calibrated {ref_file}: synthesized {len(measured)} of {len(speeds)} speeds")
 
-            wav, sr = self.infer(ref_file, ref_text, gen_text, speed=speed,fix_duration=None, remove_silence=True,  file_wave=file_name)
-            duration = len(wav) / sr
+        rows = []
+        for speed, duration in zip(speeds, durations):
+            file_name = Path(output_csv).parent/f"gen_out_{speed}.wav" if speed in measured else ""
             symbol_duration = duration / len(gen_text)  # Assuming each character is considered a symbol
-
             rows.append([speed, duration, symbol_duration, file_name])
 
         with open(output_csv, 'w', newline='', encoding='utf-8') as csvfile:
@@ -0,0 +1,124 @@
+"""Background validation of generated segments."""
+
+from __future__ import annotations
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from .hashing import text_digest
+
+_STOP = object()
+
+# Value of the ``validation_tier`` report column for lines the policy skipped.
+SKIPPED_TIER = "skipped"
+
+
+@dataclass(frozen=True)
+class ValidationPolicy:
+    """Decide which segments are transcribed and when a cheap verdict is final.
+
+    Lines shorter than ``short_line_chars`` (after cleaning) are only validated
+    for a ``short_line_sample`` fraction of them; the choice is derived from the
+    text so reruns pick the same lines. A fast-tier transcription is accepted
+    when it matches the subtitle or reaches ``accept_similarity``; anything
+    else is escalated to the next tier.
+    """
+
+    accept_similarity: float = 1.0
+    short_line_chars: int = 0
+    short_line_sample: float = 1.0
+
+    def should_validate(self, text: str) -> bool:
+        if len(text) >= self.short_line_chars or self.short_line_sample >= 1.0:
+            return True
+        if self.short_line_sample <= 0.0:
+            return False
+        bucket = int(text_digest(text)[:8], 16) / 0xFFFFFFFF
+        return bucket < self.short_line_sample
+
+    def accepts(self, is_equal: bool, similarity: float) -> bool:
+        return is_equal or similarity >= self.accept_similarity
+
+
+class ValidationWorker:
+    """Run Whisper validation on a consumer thread fed by a bounded queue.
+
+    ``validate_batch(items)`` receives up to ``batch_size`` queued
+    ``(wav, sr, text)`` tuples at once and returns one outcome per item; each
+    outcome is handed to ``on_result(key, outcome)`` on the worker thread, so
+    synthesis of the next line overlaps transcription of the previous ones.
+    ``submit`` blocks once ``maxsize`` segments are waiting, which bounds the
+    memory held by generated audio.
+    """
+
+    def __init__(
+        self,
+        validate_batch: Callable,
+        on_result: Callable,
+        maxsize: int = 8,
+        batch_size: int = 1,
+        name: str = "SegmentValidation",
+    ) -> None:
+        self._validate_batch = validate_batch
+        self._on_result = on_result
+        self._batch_size = max(batch_size, 1)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(maxsize, 1))
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def __enter__(self) -> "ValidationWorker":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Finish what is queued but let the original error propagate.
+            self._stop()
+
+    def submit(self, key, wav, sr, text) -> None:
+        if self._error is not None:
+            raise RuntimeError("Segment validation failed") from self._error
+        self._queue.put((key, wav, sr, text))
+
+    def close(self) -> None:
+        self._stop()
+        if self._error is not None:
+            raise RuntimeError("Segment validation failed") from self._error
+
+    def _stop(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Block for one item, then take whatever else is already queued."""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        while len(batch) < self._batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch or self._error is not None:
+                continue  # keep draining so producers never block forever
+            try:
+                outcomes = self._validate_batch([(wav, sr, text) for _, wav, sr, text in batch])
+                for (key, _, _, _), outcome in zip(batch, outcomes):
+                    self._on_result(key, outcome)
+            except BaseException as exc:  # surfaced to the producer
+                self._error = exc
@@ -0,0 +1,91 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# test_output_folder installs a stub under this name; load the real module.
+sys.modules.pop("srt2audiotrack.audio_utils", None)
+audio_utils = importlib.import_module("srt2audiotrack.audio_utils")
+
+
+def test_mix_voice_intervals_blends_only_inside_intervals():
+    sr = 10
+    background = np.ones((30, 2), dtype=np.float32)
+    original = np.full((30, 2), 3.0, dtype=np.float32)
+
+    mixed = audio_utils.mix_voice_intervals(
+        original, background, background, sr, [(1000, 2000)], 0.25, 0.5,
+        attack=0.0, release=0.0,
+    )
+
+    assert mixed[:10].tolist() == background[:10].tolist()
+    assert mixed[10:20] == pytest.approx(np.full((10, 2), 0.25 + 0.25 + 1.5))
+    assert mixed[20:].tolist() == background[20:].tolist()
+    assert background[15, 0] == 1.0
+
+
+def test_normalize_stereo_and_file_round_trip(tmp_path):
+    audio = audio_utils.mono_to_stereo(np.full(1000, 0.5, dtype=np.float32))
+    normalized = audio_utils.normalize_stereo(audio, target_db=-12.0)
+
+    path = tmp_path / "track.flac"
+    audio_utils.write_audio(path, normalized, 24000)
+    data, sr = audio_utils.read_audio(path)
+
+    assert sr == 24000
+    assert data.shape == (1000, 2)
+    assert data.dtype == np.float32
+    assert 20 * np.log10(np.sqrt(np.mean(data ** 2))) == pytest.approx(-12.0, abs=0.1)
+
+
+def test_streaming_mix_matches_in_memory_mix(tmp_path):
+    sr = 1000
+    rng = np.random.default_rng(0)
+    original = rng.uniform(-0.5, 0.5, (2500, 2)).astype(np.float32)
+    background = rng.uniform(-0.5, 0.5, (2400, 2)).astype(np.float32)
+    intervals = [(100, 900), (1500, 2450)]
+    audio_utils.write_audio(tmp_path / "original.wav", original, sr)
+    audio_utils.write_audio(tmp_path / "background.wav", background, sr)
+    original, _ = audio_utils.read_audio(tmp_path / "original.wav")
+    background, _ = audio_utils.read_audio(tmp_path / "background.wav")
+
+    audio_utils.mix_voice_intervals_to_file(
+        tmp_path / "original.wav", tmp_path / "background.wav", tmp_path / "background.wav",
+        tmp_path / "mixed.wav", intervals, 0.3, 0.6, blocksize=256, subtype="FLOAT",
+    )
+    streamed, streamed_sr = audio_utils.read_audio(tmp_path / "mixed.wav")
+    expected = audio_utils.mix_voice_intervals(original, background, background, sr, intervals, 0.3, 0.6)
+
+    assert streamed_sr == sr
+    assert streamed.shape == expected.shape
+    assert streamed == pytest.approx(expected, abs=1e-6)
+
+
+def test_render_places_segments_at_start_times_and_sums_overlaps(tmp_path):
+    sr = 100
+    (tmp_path / "lines.csv").write_text(
+        "Start Time,End Time,Text\n"
+        "00:00:00.500,00:00:01.000,one\n"
+        "00:00:00.800,00:00:01.500,two\n"
+        "00:00:03.000,00:00:03.200,three\n"
+    )
+    sf.write(tmp_path / "segment_1.wav", np.full(50, 0.25, dtype=np.float32), sr, subtype="FLOAT")
+    sf.write(tmp_path / "segment_2.wav", np.full(40, 0.5, dtype=np.float32), sr, subtype="FLOAT")
+    sf.write(tmp_path / "segment_3.wav", np.full(20, 0.75, dtype=np.float32), sr, subtype="FLOAT")
+
+    audio, rendered_sr = audio_utils.render_full_audiotrack(tmp_path, tmp_path / "lines.csv")
+
+    assert rendered_sr == sr
+    assert audio.dtype == np.float32
+    assert len(audio) == 320
+    assert audio[:50].tolist() == [0.0] * 50
+    assert audio[50:80] == pytest.approx(0.25)
+    assert audio[80:100] == pytest.approx(0.75)
+    assert audio[100:120] == pytest.approx(0.5)
+    assert audio[300:320] == pytest.approx(0.75)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack import calibration
+
+
+def test_adaptive_sweep_interpolates_smooth_curve():
+    batches = []
+
+    def measure(speeds):
+        batches.append(list(speeds))
+        return [10.0 / speed for speed in speeds]
+
+    durations, measured = calibration.adaptive_sweep(measure)
+
+    assert len(measured) < len(calibration.CALIBRATION_SPEEDS)
+    assert len(batches) == 2
+    for speed, duration in zip(calibration.CALIBRATION_SPEEDS, durations):
+        assert duration == pytest.approx(10.0 / speed)
+
+
+def test_adaptive_sweep_refines_irregular_curve():
+    def truth(speed):
+        return 10.0 / speed + (2.0 if speed < 1.0 else 0.0)
+
+    durations, measured = calibration.adaptive_sweep(lambda speeds: [truth(speed) for speed in speeds])
+
+    assert {0.9, 1.0} <= measured
+    for speed, duration in zip(calibration.CALIBRATION_SPEEDS, durations):
+        assert duration == pytest.approx(truth(speed), rel=0.05)
+
+
+def test_restore_uses_key_and_shared_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SRT2AUDIOTRACK_CACHE_DIR", str(tmp_path / "cache"))
+    ref = tmp_path / "voice.wav"
+    ref.write_bytes(b"RIFF-voice")
+    key = calibration.calibration_key(ref, "hello")
+
+    speeds = tmp_path / "voice" / "speeds.csv"
+    assert not calibration.restore(speeds, key)
+
+    speeds.parent.mkdir()
+    speeds.write_text("speed,duration,symbol_duration,file_name\n")
+    calibration.store(speeds, key)
+    assert calibration.restore(speeds, key)
+    assert not calibration.restore(speeds, calibration.calibration_key(ref, "changed"))
+
+    other = tmp_path / "other" / "speeds.csv"
+    assert calibration.restore(other, key)
+    assert other.read_text() == speeds.read_text()
@@ -0,0 +1,110 @@
+import os
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack import cli
+
+
+class StubPipeline:
+    """Records the jobs it runs; a job is done once its muxed video exists."""
+
+    runs: list = []
+    engines: list = []
+    failing: set = set()
+
+    def __init__(self, subtitle, tts_engine=None, **_settings):
+        self.subtitle = Path(subtitle)
+        self.directory = self.subtitle.parent / self.subtitle.stem
+        self.tts_engine = tts_engine
+
+    def run(self, video_path, **_run_settings):
+        StubPipeline.runs.append(self.subtitle.name)
+        StubPipeline.engines.append(self.tts_engine)
+        self.tts_engine.generate_from_csv_with_speakers()
+        if self.subtitle.name in StubPipeline.failing:
+            raise RuntimeError("synthesis failed")
+        (self.subtitle.parent / f"{self.subtitle.stem}_out_mix.mp4").touch()
+
+
+def _job(folder: Path, name: str) -> Path:
+    subtitle = folder / f"{name}.srt"
+    subtitle.touch()
+    subtitle.with_suffix(".mp4").touch()
+    return subtitle
+
+
+def _run_worker(manifest_dir: Path, **kwargs) -> None:
+    cli.run_worker(
+        manifest_dir,
+        {"tts_options": {"stt_model": "small"}},
+        ".mp4",
+        worker_id="test",
+        lock_timeout=60.0,
+        heartbeat_interval=1.0,
+        pipeline_factory=StubPipeline,
+        **kwargs,
+    )
+
+
+def _reset_stub(monkeypatch, failing=()):
+    monkeypatch.setattr(StubPipeline, "runs", [])
+    monkeypatch.setattr(StubPipeline, "engines", [])
+    monkeypatch.setattr(StubPipeline, "failing", set(failing))
+    built = []
+
+    class Engine:
+        def generate_from_csv_with_speakers(self):
+            return None
+
+    def get_shared_tts(**options):
+        built.append(options)
+        return Engine()
+
+    fake = types.ModuleType("srt2audiotrack.tts_audio")
+    fake.get_shared_tts = get_shared_tts
+    monkeypatch.setitem(sys.modules, "srt2audiotrack.tts_audio", fake)
+    return built
+
+
+def test_worker_rereads_manifests_and_shares_one_engine(tmp_path, monkeypatch):
+    built = _reset_stub(monkeypatch)
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    (manifests / "a.txt").write_text(f"{_job(tmp_path, 'one')}\n{_job(tmp_path, 'two')}\n")
+    sleeps = []
+
+    def sleep(seconds):
+        # A job queued while the worker is idle is picked up on the next pass.
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            (manifests / "b.txt").write_text(f"{_job(tmp_path, 'three')}\n")
+
+    monkeypatch.setattr(cli.time, "sleep", sleep)
+    _run_worker(manifests, poll_interval=7.5, max_iterations=4)
+
+    assert StubPipeline.runs == ["one.srt", "two.srt", "three.srt"]
+    # Passes 2 and 4 find nothing to do and wait for the poll interval.
+    assert sleeps == [7.5, 7.5]
+    assert built == [{"stt_model": "small"}]
+    assert len({id(engine) for engine in StubPipeline.engines}) == 1
+
+
+def test_worker_does_not_retry_failed_jobs_and_exits_when_idle(tmp_path, monkeypatch):
+    _reset_stub(monkeypatch, failing={"bad.srt"})
+    manifests = tmp_path / "manifests"
+    manifests.mkdir()
+    (manifests / "jobs.txt").write_text(f"{_job(tmp_path, 'bad')}\n{_job(tmp_path, 'good')}\n")
+
+    def sleep(_seconds):
+        raise AssertionError("an idle worker with exit_when_idle must not poll")
+
+    monkeypatch.setattr(cli.time, "sleep", sleep)
+
+    _run_worker(manifests, exit_when_idle=True, max_iterations=5)
+
+    # The failing job is tried once; the second pass finds nothing and stops.
+    assert StubPipeline.runs == ["bad.srt", "good.srt"]
+    assert not (tmp_path / "bad_out_mix.mp4").exists()
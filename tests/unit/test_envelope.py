@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.envelope import DuckingEnvelope
+
+
+def _full(envelope, frames):
+    gain = envelope.gain(0, frames)
+    return np.zeros(frames, dtype=np.float32) if gain is None else gain
+
+
+def test_zero_ramps_switch_hard_at_interval_edges():
+    envelope = DuckingEnvelope([(10, 20)], sample_rate=100, attack=0.0, release=0.0)
+
+    gain = _full(envelope, 30)
+
+    assert gain[:10].tolist() == [0.0] * 10
+    assert gain[10:20].tolist() == [1.0] * 10
+    assert gain[20:].tolist() == [0.0] * 10
+
+
+def test_ramps_are_linear_and_overlapping_intervals_merge():
+    envelope = DuckingEnvelope([(60, 70), (20, 30), (25, 40)], sample_rate=100, attack=0.04, release=0.1)
+
+    gain = _full(envelope, 80)
+
+    assert envelope.intervals == [(20, 40), (60, 70)]
+    assert gain[16:21].tolist() == pytest.approx([0.0, 0.25, 0.5, 0.75, 1.0])
+    assert gain[39:50].tolist() == pytest.approx([1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.0])
+
+
+def test_intervals_whose_ramps_meet_are_coalesced():
+    envelope = DuckingEnvelope([(10, 20), (24, 30)], sample_rate=100, attack=0.03, release=0.03)
+
+    assert envelope.intervals == [(10, 30)]
+    assert _full(envelope, 40)[10:30].tolist() == [1.0] * 20
+
+
+def test_gain_skips_blocks_outside_and_between_intervals():
+    envelope = DuckingEnvelope.from_ms(np.array([[1000, 2000], [5000, 6000]]), sample_rate=100)
+
+    assert envelope.gain(0, 50) is None
+    assert envelope.gain(300, 100) is None
+    assert envelope.gain(700, 100) is None
+    block = envelope.gain(90, 20)
+    assert block[0] == 0.0 and block[-1] == 1.0
+    assert np.all(np.diff(block) >= 0)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.hashing import file_digest
+
+
+def test_file_digest_tracks_content(tmp_path):
+    ref = tmp_path / "speaker.wav"
+    ref.write_bytes(b"RIFF-one")
+    first = file_digest(ref)
+    assert file_digest(ref) == first
+
+    copy = tmp_path / "copy.wav"
+    copy.write_bytes(b"RIFF-one")
+    assert file_digest(copy) == first
+
+    ref.write_bytes(b"RIFF-two-longer")
+    assert file_digest(ref) != first
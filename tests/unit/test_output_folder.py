@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from pathlib import Path
 import os
+import shutil
 import sys
 import types
 from types import SimpleNamespace
 
+import pytest
+
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 librosa_stub = types.ModuleType("librosa")
@@ -16,6 +19,7 @@ for name in ["subtitle_csv", "tts_audio", "sync_utils", "ffmpeg_utils", "audio_u
     sys.modules[f"srt2audiotrack.{name}"] = types.ModuleType(name)
 
 from srt2audiotrack.pipeline import SubtitlePipeline
+from srt2audiotrack.subtitle_table import snapshot_path
 
 
 def _touch(path: Path) -> None:
@@ -24,6 +28,12 @@ def _touch(path: Path) -> None:
     path.write_text("stub")
 
 
+def _save_table(path: Path, text: str, csv_view: bool) -> None:
+    snapshot_path(path).write_text(text)
+    if csv_view:
+        Path(path).write_text(text)
+
+
 def _make_dependencies() -> dict:
     def modify_subtitles_with_vocabular_text_only(_subtitle: Path, _vocab: Path, out_path: Path) -> None:
         Path(out_path).write_text("modified")
@@ -32,14 +42,14 @@ def _make_dependencies() -> dict:
         modify_subtitles_with_vocabular_text_only=modify_subtitles_with_vocabular_text_only
     )
 
-    def srt_to_csv(_src: Path, dest: Path) -> None:
-        Path(dest).write_text("Start Time\n00:00:00,000")
+    def srt_to_csv(_src: Path, dest: Path, csv_view: bool = False) -> None:
+        _save_table(dest, "Start Time\n00:00:00,000", csv_view)
 
-    def add_speaker_columns(_src: Path, dest: Path) -> None:
-        Path(dest).write_text("speaker")
+    def add_speaker_columns(_src: Path, dest: Path, csv_view: bool = False) -> None:
+        _save_table(dest, "speaker", csv_view)
 
-    def add_speed_columns_with_speakers(_src: Path, _speakers: dict, dest: Path) -> None:
-        Path(dest).write_text("speed")
+    def add_speed_columns_with_speakers(_src: Path, _speakers: dict, dest: Path, csv_view: bool = False) -> None:
+        _save_table(dest, "speed", csv_view)
 
     subtitle_csv_module = SimpleNamespace(
         srt_to_csv=srt_to_csv,
@@ -55,52 +65,75 @@ def _make_dependencies() -> dict:
         def generate_from_csv_with_speakers(self, *_args, **_kwargs) -> None:  # pragma: no cover - stub
             return None
 
-    tts_audio_module = SimpleNamespace(F5TTS=StubF5TTS)
+    tts_audio_module = SimpleNamespace(F5TTS=StubF5TTS, get_shared_tts=lambda **_options: StubF5TTS())
 
-    def correct_end_times_in_csv(_directory: Path, _src: Path, dest: Path) -> None:
-        Path(dest).write_text("corrected")
+    def correct_end_times_in_csv(_directory: Path, _src: Path, dest: Path, csv_view: bool = True) -> None:
+        _save_table(dest, "corrected", csv_view)
 
     sync_utils_module = SimpleNamespace(correct_end_times_in_csv=correct_end_times_in_csv)
 
-    def collect_full_audiotrack(_directory: Path, _csv_file: Path, output_audio_file: Path) -> None:
-        _touch(output_audio_file)
+    def render_full_audiotrack(_directory: Path, _csv_file: Path) -> tuple:
+        return "voice", 1
+
+    def mono_to_stereo(data: str) -> str:
+        return f"stereo {data}"
+
+    def normalize_stereo(data: str, *_args, **_kwargs) -> str:
+        return f"normalized {data}"
+
+    def resample(data: str, _sr_in: int, _sr_out: int) -> str:
+        return data
+
+    def resample_file(source: Path, target: Path, _sr_out: int, channels: int | None = None) -> None:
+        write_audio(target, mono_to_stereo(Path(source).read_text()), 1)
+
+    def read_audio(path: Path) -> tuple:
+        return Path(path).read_text(), 1
 
-    def convert_mono_to_stereo(_input_path: Path, output_path: Path) -> None:
-        _touch(output_path)
+    def write_audio(path: Path, data: str, _sample_rate: int) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(str(data))
 
-    def normalize_stereo_audio(_input_path: Path, output_path: Path, *_args, **_kwargs) -> None:
-        _touch(output_path)
+    def separate_accompaniment(data: str, _sample_rate: int, checkpoint_dir: Path | None = None, **_options) -> str:
+        if checkpoint_dir is not None:
+            _touch(Path(checkpoint_dir) / "chunk_0.npy")
+        return f"accompaniment {data}"
 
-    def extract_acomponiment_or_vocals(
-        directory: Path,
-        subtitle_name: str,
-        _out_ukr_audio: Path,
-        *,
-        sample_rate: int,
-        **_kwargs,
-    ) -> Path:
-        temp = Path(directory) / f"{subtitle_name}_temp.flac"
-        _touch(temp)
-        return temp
+    def clear_separation_checkpoints(checkpoint_dir: Path) -> None:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
 
-    def adjust_stereo_volume_with_librosa(*_args, **_kwargs) -> None:  # pragma: no cover - stub
-        return None
+    def mix_voice_intervals(_original, background, _accompaniment, _sr, _intervals, acc_coef, voice_coef,
+                            *_ramps) -> str:
+        return f"{background} {acc_coef} {voice_coef}"
+
+    def mix_voice_intervals_to_file(_original, background, _accompaniment, output, _intervals, acc_coef,
+                                    voice_coef, *_ramps) -> None:
+        write_audio(output, f"{Path(background).read_text()} {acc_coef} {voice_coef}", 1)
 
     audio_utils_module = SimpleNamespace(
-        collect_full_audiotrack=collect_full_audiotrack,
-        convert_mono_to_stereo=convert_mono_to_stereo,
-        normalize_stereo_audio=normalize_stereo_audio,
-        extract_acomponiment_or_vocals=extract_acomponiment_or_vocals,
-        adjust_stereo_volume_with_librosa=adjust_stereo_volume_with_librosa,
+        render_full_audiotrack=render_full_audiotrack,
+        mono_to_stereo=mono_to_stereo,
+        resample=resample,
+        resample_file=resample_file,
+        normalize_stereo=normalize_stereo,
+        read_audio=read_audio,
+        write_audio=write_audio,
+        separate_accompaniment=separate_accompaniment,
+        clear_separation_checkpoints=clear_separation_checkpoints,
+        mix_voice_intervals=mix_voice_intervals,
+        mix_voice_intervals_to_file=mix_voice_intervals_to_file,
     )
 
-    def extract_audio(_video_path: str, out_path: Path) -> None:
+    def extract_audio(_video_path: str, out_path: Path, **_kwargs) -> None:
         _touch(out_path)
 
     def parse_volume_intervals(_csv_path: Path) -> list:
         return []
 
-    def create_ffmpeg_mix_video(_video_path: str, _output_ukr_audio: Path, _stereo_eng_file: Path, mix_video: Path) -> None:
+    def create_ffmpeg_mix_video(
+        _video_path: str, _output_ukr_audio: Path, _stereo_eng_file: Path, mix_video: Path, **_kwargs
+    ) -> None:
         _touch(mix_video)
 
     ffmpeg_utils_module = SimpleNamespace(
@@ -199,9 +232,10 @@ def test_run_pipeline_uses_output_folder(tmp_path: Path) -> None:
 
     for path in [
         pipeline.out_path,
-        pipeline.srt_csv_file,
-        pipeline.output_csv_with_speakers,
-        pipeline.output_with_preview_speeds_csv,
+        snapshot_path(pipeline.srt_csv_file),
+        snapshot_path(pipeline.output_csv_with_speakers),
+        snapshot_path(pipeline.output_with_preview_speeds_csv),
+        snapshot_path(pipeline.corrected_time_output_speed_csv),
         pipeline.corrected_time_output_speed_csv,
         pipeline.output_audio_file,
         pipeline.stereo_eng_file,
@@ -214,3 +248,133 @@ def test_run_pipeline_uses_output_folder(tmp_path: Path) -> None:
 
     assert pipeline.mix_video.exists()
     assert pipeline.mix_video.parent == kwargs["output_folder"]
+    # Only the last subtitle table gets a CSV view unless csv_views is set.
+    assert not pipeline.srt_csv_file.exists()
+
+
+def test_coefficient_change_reruns_only_mixing(tmp_path: Path) -> None:
+    kwargs = _pipeline_kwargs(tmp_path)
+    video = kwargs["subtitle"].with_suffix(".mp4")
+    video.write_text("vid")
+    SubtitlePipeline(**kwargs, **_make_dependencies()).run(str(video))
+
+    calls: list[str] = []
+    dependencies = _make_dependencies()
+    for module_name in ["subtitle_csv_module", "audio_utils_module", "ffmpeg_utils_module", "sync_utils_module"]:
+        module = dependencies[module_name]
+        for name, function in list(vars(module).items()):
+            def recorded(*args, _name=name, _function=function, **kw):
+                calls.append(_name)
+                return _function(*args, **kw)
+
+            setattr(module, name, recorded)
+
+    kwargs["voice_coef"] = 0.5
+    SubtitlePipeline(**kwargs, **dependencies).run(str(video))
+
+    assert calls == [
+        "parse_volume_intervals",
+        "mix_voice_intervals_to_file",
+        "create_ffmpeg_mix_video",
+    ]
+
+
+def test_final_checkpoint_keeps_intermediate_tracks_in_memory(tmp_path: Path) -> None:
+    kwargs = _pipeline_kwargs(tmp_path)
+    video = kwargs["subtitle"].with_suffix(".mp4")
+    video.write_text("vid")
+    pipeline = SubtitlePipeline(**kwargs, **_make_dependencies(), checkpoint="final")
+
+    pipeline.run(str(video))
+
+    assert not pipeline.output_audio_file.exists()
+    assert not pipeline.acomponiment.exists()
+    assert pipeline.stereo_eng_file.read_text() == "stereo voice"
+    assert pipeline.output_ukr_audio.read_text() == "normalized accompaniment stub 0.1 0.2"
+    assert pipeline.mix_video.exists()
+
+
+def test_render_audio_without_checkpoints_writes_no_tracks(tmp_path: Path) -> None:
+    kwargs = _pipeline_kwargs(tmp_path)
+    video = kwargs["subtitle"].with_suffix(".mp4")
+    video.write_text("vid")
+    pipeline = SubtitlePipeline(**kwargs, **_make_dependencies(), checkpoint="none")
+
+    with pytest.raises(ValueError):
+        pipeline.run(str(video))
+    tracks = pipeline.render_audio(str(video))
+
+    assert tracks == {"voice": ("stereo voice", pipeline.rates.output), "mix": ("normalized accompaniment stub 0.1 0.2", 1)}
+    for path in [pipeline.output_audio_file, pipeline.stereo_eng_file, pipeline.acomponiment, pipeline.output_ukr_audio]:
+        assert not path.exists()
+
+
+def test_voice_change_reruns_tts_and_keeps_journal_reuse(tmp_path: Path) -> None:
+    kwargs = _pipeline_kwargs(tmp_path)
+    video = kwargs["subtitle"].with_suffix(".mp4")
+    video.write_text("vid")
+    calls: list[dict] = []
+
+    class RecordingTTS:
+        def generate_from_csv_with_speakers(self, *_args, **kw) -> None:
+            calls.append(kw)
+
+    SubtitlePipeline(**kwargs, **_make_dependencies(), tts_engine=RecordingTTS()).run(str(video))
+    SubtitlePipeline(**kwargs, **_make_dependencies(), tts_engine=RecordingTTS()).run(str(video))
+    assert len(calls) == 1
+
+    kwargs["speakers"]["spk"]["ref_text"] = "new reference"
+    SubtitlePipeline(**kwargs, **_make_dependencies(), tts_engine=RecordingTTS()).run(str(video))
+
+    assert len(calls) == 2
+    # Stale segments are found through their journal identities, not by
+    # throwing every segment away.
+    assert calls[-1]["rewrite"] is False
+
+
+def test_separation_change_reruns_mix_under_final_checkpoint(tmp_path: Path) -> None:
+    kwargs = _pipeline_kwargs(tmp_path)
+    video = kwargs["subtitle"].with_suffix(".mp4")
+    video.write_text("vid")
+    SubtitlePipeline(**kwargs, **_make_dependencies(), checkpoint="final").run(str(video))
+
+    calls: list[str] = []
+    dependencies = _make_dependencies()
+    separate = dependencies["audio_utils_module"].separate_accompaniment
+
+    def recorded(*args, **kw):
+        calls.append("separate_accompaniment")
+        return separate(*args, **kw)
+
+    dependencies["audio_utils_module"].separate_accompaniment = recorded
+    SubtitlePipeline(**kwargs, **dependencies, checkpoint="final").run(str(video))
+    assert calls == []
+
+    SubtitlePipeline(
+        **kwargs, **dependencies, checkpoint="final", separation_options={"model": "htdemucs"}
+    ).run(str(video))
+    assert calls == ["separate_accompaniment"]
+
+
+def test_separation_chunks_survive_until_the_final_mix_is_written(tmp_path: Path) -> None:
+    kwargs = _pipeline_kwargs(tmp_path)
+    video = kwargs["subtitle"].with_suffix(".mp4")
+    video.write_text("vid")
+    dependencies = _make_dependencies()
+    mix = dependencies["audio_utils_module"].mix_voice_intervals
+
+    def crash(*_args, **_kwargs):
+        raise RuntimeError("interrupted")
+
+    dependencies["audio_utils_module"].mix_voice_intervals = crash
+    pipeline = SubtitlePipeline(**kwargs, **dependencies, checkpoint="final")
+    with pytest.raises(RuntimeError):
+        pipeline.run(str(video))
+    # The accompaniment was never written, so its chunks are the only checkpoint.
+    assert (pipeline.separation_chunk_dir / "chunk_0.npy").exists()
+
+    dependencies["audio_utils_module"].mix_voice_intervals = mix
+    pipeline = SubtitlePipeline(**kwargs, **dependencies, checkpoint="final")
+    pipeline.run(str(video))
+    assert pipeline.output_ukr_audio.exists()
+    assert not pipeline.separation_chunk_dir.exists()
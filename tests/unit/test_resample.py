@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("soxr")
+sf = pytest.importorskip("soundfile")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.resample import RatePlan, StreamResampler, resample, resample_file
+
+
+def _tone(frames, sample_rate, channels=2):
+    t = np.arange(frames) / sample_rate
+    tone = np.sin(2 * np.pi * 440 * t).astype(np.float32)
+    return np.stack([tone * (n + 1) / channels for n in range(channels)], axis=1)
+
+
+def test_resample_converts_all_channels_at_once():
+    audio = _tone(24000, 24000)
+    out = resample(audio, 24000, 16000)
+    assert out.dtype == np.float32
+    assert out.shape == (16000, 2)
+    # Channels keep their relative level.
+    np.testing.assert_allclose(out[:, 1].std(), 2 * out[:, 0].std(), rtol=1e-3)
+    assert resample(audio, 24000, 24000) is audio
+    assert resample(audio[:, 0], 24000, 48000).shape == (48000,)
+
+
+def test_stream_resampler_matches_one_shot():
+    audio = _tone(48000, 48000)
+    stream = StreamResampler(48000, 44100, channels=2)
+    blocks = [audio[start:start + 5000] for start in range(0, len(audio), 5000)]
+    out = np.concatenate([stream.process(block, last=n == len(blocks) - 1) for n, block in enumerate(blocks)])
+    expected = resample(audio, 48000, 44100)
+    assert abs(len(out) - len(expected)) <= 1
+    frames = min(len(out), len(expected))
+    np.testing.assert_allclose(out[:frames], expected[:frames], atol=1e-3)
+
+
+def test_resample_file_streams_to_target_rate(tmp_path):
+    source, target = tmp_path / "in.wav", tmp_path / "out.flac"
+    sf.write(source, _tone(48000, 48000), 48000, subtype="FLOAT")
+    resample_file(source, target, 44100, blocksize=4096)
+    info = sf.info(target)
+    assert info.samplerate == 44100
+    assert info.channels == 2
+    assert abs(info.frames - 44100) <= 1
+
+
+def test_resample_file_upmixes_a_mono_source(tmp_path):
+    source, target = tmp_path / "voice.flac", tmp_path / "stereo.flac"
+    sf.write(source, _tone(24000, 24000, channels=1), 24000)
+    resample_file(source, target, 44100, channels=2, blocksize=4096)
+    out, sample_rate = sf.read(target, dtype="float32")
+    assert sample_rate == 44100
+    assert out.shape[1] == 2
+    np.testing.assert_array_equal(out[:, 0], out[:, 1])
+
+
+def test_rate_plan_follows_the_output_rate():
+    plan = RatePlan()
+    assert plan.working == plan.output == 44100
+    plan = RatePlan.for_output(48000)
+    assert plan.working == plan.output == 48000
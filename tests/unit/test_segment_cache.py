@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.segment_cache import SegmentCache
+
+
+def _key(text):
+    return SegmentCache.key(text, "ref-digest", "reference text", "fixed:1.000", "model", "random")
+
+
+def test_key_normalizes_whitespace():
+    assert _key("Thank  you.\n") == _key("Thank you.")
+    assert _key("Thank you.") != _key("Thank you!")
+
+
+def test_put_get_and_update_round_trip(tmp_path):
+    cache = SegmentCache(tmp_path)
+    key = _key("Yes.")
+    assert cache.get(key) is None
+
+    cache.put(key, np.zeros(2400, dtype=np.float32), 24000, retries=1)
+    cache.update(key, gen_error="0", similarity="1.00")
+
+    wav, sr, metadata = cache.get(key)
+    assert sr == 24000
+    assert len(wav) == 2400
+    assert metadata == {"sample_rate": 24000, "retries": 1, "gen_error": "0", "similarity": "1.00"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = SegmentCache(tmp_path, max_bytes=10**9)
+    keys = [_key(f"line {n}") for n in range(3)]
+    for n, key in enumerate(keys):
+        cache.put(key, np.zeros(24000, dtype=np.float32), 24000)
+        wav_path = cache._paths(key)[0]
+        os.utime(wav_path, (1000 + n, 1000 + n))
+    cache.get(keys[0])  # most recently used now
+
+    cache.max_bytes = cache.size() - 1
+    assert cache.evict() > 0
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert not (tmp_path / SegmentCache.lock_name).exists()
+
+
+def test_evict_skips_when_another_worker_holds_the_lock(tmp_path):
+    cache = SegmentCache(tmp_path, max_bytes=0)
+    cache.put(_key("Hello"), np.zeros(10, dtype=np.float32), 24000)
+    (tmp_path / SegmentCache.lock_name).touch()
+
+    assert cache.evict() == 0
+    assert cache.get(_key("Hello")) is not None
+
+
+def test_evict_breaks_a_stale_lock_but_not_a_fresh_one(tmp_path, monkeypatch):
+    cache = SegmentCache(tmp_path, max_bytes=0, stale_lock_seconds=60)
+    cache.put(_key("Hello"), np.zeros(10, dtype=np.float32), 24000)
+    lock = tmp_path / SegmentCache.lock_name
+    lock.touch()
+    os.utime(lock, (1000, 1000))
+
+    # Another worker breaks the stale lock and takes a fresh one just before
+    # this worker moves it aside: the fresh lock must survive.
+    stat = type(lock).stat
+    seen = []
+
+    def racing_stat(path, *args, **kwargs):
+        result = stat(path, *args, **kwargs)
+        if path == lock and not seen:
+            seen.append(path)
+            os.utime(lock, None)
+        return result
+
+    monkeypatch.setattr(type(lock), "stat", racing_stat)
+    assert cache.evict() == 0
+    assert lock.exists()
+    assert [path.name for path in tmp_path.iterdir() if path.is_file()] == [SegmentCache.lock_name]
+    monkeypatch.undo()
+
+    os.utime(lock, (1000, 1000))
+    assert cache.evict() > 0
+    assert not lock.exists()
@@ -0,0 +1,122 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+from srt2audiotrack.hashing import file_digest
+from srt2audiotrack.segment_journal import (
+    SegmentJournal,
+    audio_metadata,
+    probe_segment,
+    reconcile_segments,
+    segment_identity,
+    write_audio_atomic,
+)
+
+
+def test_journal_merges_entries_and_skips_torn_lines(tmp_path):
+    journal = SegmentJournal(tmp_path)
+    journal.append(0, text="Hello.", retries=0)
+    journal.append(1, text="Bye.", retries=2)
+    journal.append(0, similarity="1.00", gen_error="0")
+    with open(journal.path, "a", encoding="utf-8") as handle:
+        handle.write('{"index": 2, "text": "cut')
+
+    entries = journal.load()
+
+    assert sorted(entries) == [0, 1]
+    assert entries[0] == {"index": 0, "text": "Hello.", "retries": 0, "similarity": "1.00", "gen_error": "0"}
+    assert entries[1]["retries"] == 2
+
+
+def test_write_audio_atomic_leaves_no_partial_file(tmp_path):
+    target = SegmentJournal.segment_path(tmp_path, 0)
+    write_audio_atomic(target, np.zeros(240, dtype=np.float32), 24000)
+
+    assert target.name == "segment_1.wav"
+    assert target.exists()
+    assert list(tmp_path.glob("*.part")) == []
+
+
+def _row(text, duration="1.0", speaker="anna"):
+    return {"Text": text, "Duration": duration, "Speaker": speaker}
+
+
+def _synthesize(journal, rows):
+    for index, row in enumerate(rows):
+        write_audio_atomic(SegmentJournal.segment_path(journal.folder, index), np.full(10, index * 0.25, dtype=np.float32), 24000)
+        journal.append(index, text=row["Text"], retries=0, identity=segment_identity(row), gen_error="0")
+
+
+def test_reconcile_segments_relocates_after_inserted_line(tmp_path):
+    journal = SegmentJournal(tmp_path)
+    old_rows = [_row("One."), _row("Two."), _row("Three.")]
+    _synthesize(journal, old_rows)
+
+    new_rows = [_row("One."), _row("Inserted."), _row("Two."), _row("Three!")]
+    kept = reconcile_segments(journal, new_rows)
+
+    assert sorted(kept) == [0, 2]
+    assert sf.read(str(SegmentJournal.segment_path(tmp_path, 2)))[0][0] == pytest.approx(0.25)
+    assert not SegmentJournal.segment_path(tmp_path, 1).exists()
+    assert not SegmentJournal.segment_path(tmp_path, 3).exists()
+    assert journal.load()[2]["text"] == "Two."
+    assert not (tmp_path / ".relocate").exists()
+
+
+def test_reconcile_segments_keeps_legacy_segments_with_matching_text(tmp_path):
+    journal = SegmentJournal(tmp_path)
+    write_audio_atomic(SegmentJournal.segment_path(tmp_path, 0), np.zeros(10, dtype=np.float32), 24000)
+
+    kept = reconcile_segments(journal, [_row("Legacy."), _row("New.")])
+
+    assert list(kept) == [0]
+    assert kept[0]["identity"] == segment_identity(_row("Legacy."))
+
+
+def test_reconcile_segments_regenerates_after_reference_audio_changes(tmp_path):
+    folder = tmp_path / "job"
+    folder.mkdir()
+    reference = tmp_path / "anna.wav"
+    sf.write(str(reference), np.zeros(240, dtype=np.float32), 24000)
+    rows = [_row("One."), _row("Two.")]
+
+    def identities():
+        return [segment_identity(row, file_digest(reference), "anna ref", "fixed:1.000") for row in rows]
+
+    journal = SegmentJournal(folder)
+    for index, identity in enumerate(identities()):
+        write_audio_atomic(SegmentJournal.segment_path(folder, index), np.zeros(10, dtype=np.float32), 24000)
+        journal.append(index, text=rows[index]["Text"], retries=0, identity=identity, gen_error="0")
+    assert sorted(reconcile_segments(journal, rows, identities())) == [0, 1]
+
+    sf.write(str(reference), np.full(240, 0.5, dtype=np.float32), 24000)
+    kept = reconcile_segments(journal, rows, identities())
+
+    assert kept == {}
+    assert list(folder.glob("segment_*.wav")) == []
+
+
+def test_probe_segment_trusts_journal_only_for_the_file_it_describes(tmp_path, monkeypatch):
+    path = SegmentJournal.segment_path(tmp_path, 0)
+    wav = np.full(240, 0.5, dtype=np.float32)
+    write_audio_atomic(path, wav, 24000)
+    entry = audio_metadata(path, wav, 24000)
+
+    assert entry["frames"] == 240 and entry["peak"] == pytest.approx(0.5) and entry["rms"] == pytest.approx(0.5)
+
+    def no_header(_path):
+        raise AssertionError("header read although the journal entry matches")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(sf, "info", no_header)
+        assert probe_segment(path, entry) == (240, 24000)
+
+    write_audio_atomic(path, np.zeros(480, dtype=np.float32), 24000)
+    assert probe_segment(path, entry) == (480, 24000)
+    assert probe_segment(SegmentJournal.segment_path(tmp_path, 1), entry) is None
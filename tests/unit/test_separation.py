@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.separation import DemucsSeparator, get_shared_separator
+
+
+def test_shared_separator_is_reused_per_options_without_loading_the_model():
+    first = get_shared_separator(model="mdx_extra", overlap=0.25, shifts=1)
+
+    assert get_shared_separator(shifts=1, overlap=0.25, model="mdx_extra") is first
+    assert get_shared_separator(model="mdx_extra", overlap=0.5, shifts=1) is not first
+    assert isinstance(first, DemucsSeparator)
+    assert first._model is None
+
+
+def test_separate_windows_only_touches_padded_subtitle_windows():
+    np = pytest.importorskip("numpy")
+    from srt2audiotrack.separation import separate_windows
+
+    sr = 100
+    audio = np.ones((1000, 2), dtype=np.float32)
+    chunks = []
+
+    def separate(pieces, sample_rate):
+        chunks.append([len(piece) for piece in pieces])
+        return [np.zeros_like(piece) for piece in pieces]
+
+    result = separate_windows(
+        separate, audio, sr,
+        np.array([[2000, 3000], [3100, 3500], [8000, 9000]]),
+        context=0.5, crossfade=0.2,
+    )
+
+    assert chunks == [[250, 200]]
+    assert result[:150].tolist() == audio[:150].tolist()
+    assert result[200:350].tolist() == [[0.0, 0.0]] * 150
+    assert 0.0 < result[190, 0] < 1.0
+    assert result[400:750].tolist() == audio[400:750].tolist()
+    assert result[800:900].tolist() == [[0.0, 0.0]] * 100
+
+
+def test_chunked_separation_stitches_and_resumes_from_checkpoints(tmp_path):
+    np = pytest.importorskip("numpy")
+    from srt2audiotrack.separation import ChunkedSeparator
+
+    sr = 100
+    audio = np.random.default_rng(0).uniform(-1, 1, (930, 2)).astype(np.float32)
+    calls = []
+
+    def half(chunk, _sample_rate):
+        calls.append(len(chunk))
+        return chunk * 0.5
+
+    separator = ChunkedSeparator(tmp_path / "chunks", chunk_seconds=3, overlap_seconds=0.2, separate=half)
+    assert [span[2:] for span in separator.chunks(len(audio), sr)] == [(0, 300), (300, 600), (600, 930)]
+
+    result = separator.accompaniment(audio, sr)
+
+    assert result == pytest.approx(audio * 0.5, abs=1e-6)
+    assert calls == [320, 340, 350]
+
+    def interrupted(_chunk, _sample_rate):
+        raise AssertionError("chunk separated again")
+
+    resumed = ChunkedSeparator(tmp_path / "chunks", chunk_seconds=3, overlap_seconds=0.2, separate=interrupted)
+    assert resumed.accompaniment(audio, sr) == pytest.approx(result)
+    resumed.clear()
+    assert not (tmp_path / "chunks").exists()
+
+
+def test_chunked_separation_batches_several_tracks_and_keeps_the_pool(tmp_path, monkeypatch):
+    np = pytest.importorskip("numpy")
+    from srt2audiotrack import separation
+
+    sr = 100
+    pieces = [np.full((250, 2), 1.0, dtype=np.float32), np.full((700, 2), 2.0, dtype=np.float32)]
+    calls = []
+
+    def half(chunk, _sample_rate):
+        calls.append(len(chunk))
+        return chunk * 0.5
+
+    separator = separation.ChunkedSeparator(tmp_path / "chunks", chunk_seconds=3, overlap_seconds=0.2, separate=half)
+    results = separator.accompaniment_many(pieces, sr)
+
+    assert [result[:, 0].tolist() for result in results] == [[0.5] * 250, [1.0] * 700]
+    assert calls == [250, 320, 340, 120]
+
+    created = []
+
+    class FakePool:
+        def __init__(self, **kwargs):
+            created.append(kwargs["max_workers"])
+
+    monkeypatch.setattr(separation, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(separation, "_shared_pools", {})
+    assert separation.get_shared_pool(2, 4) is separation.get_shared_pool(2, 4)
+    assert created == [2]
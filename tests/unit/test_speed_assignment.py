@@ -0,0 +1,47 @@
+import csv
+import importlib
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# test_output_folder installs a stub under this name; load the real module.
+sys.modules.pop("srt2audiotrack.subtitle_csv", None)
+subtitle_csv = importlib.import_module("srt2audiotrack.subtitle_csv")
+
+SPEEDS = [0.5, 1.0, 2.0]
+SYMBOL_DURATIONS = [0.2, 0.1, 0.05]
+
+
+def test_interpolate_speeds_is_continuous_and_clamped():
+    speeds, durations = subtitle_csv.interpolate_speeds([0.3, 0.2, 0.075, 0.05, 0.01], SPEEDS, SYMBOL_DURATIONS)
+
+    assert speeds.tolist() == pytest.approx([0.5, 0.5, 1 / 0.75, 2.0, 2.0])
+    assert durations.tolist() == pytest.approx([0.2, 0.2, 0.075, 0.05, 0.05])
+
+
+def test_add_speed_columns_with_speakers_uses_default_speaker(tmp_path):
+    source = tmp_path / "speakers.csv"
+    with open(source, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["Number", "Start Time", "End Time", "Duration", "Symbol Duration", "Speaker", "Text"])
+        writer.writerow([1, "00:00:00,000", "00:00:01,000", 1.0, 0.1, "anna", "Hello there"])
+        writer.writerow([2, "00:00:01,000", "00:00:02,000", 1.0, 0.15, "nobody", "Hi"])
+    speakers = {
+        "anna": {"speeds": SPEEDS, "symbol_durations": SYMBOL_DURATIONS},
+        "default_speaker_name": "anna",
+    }
+
+    target = tmp_path / "speeds.csv"
+    subtitle_csv.add_speed_columns_with_speakers(source, speakers, target, csv_view=True)
+
+    with open(target, encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert [row["Speaker"] for row in rows] == ["anna", "anna"]
+    assert float(rows[0]["TTS Speed Closest"]) == pytest.approx(1.0)
+    assert 0.5 < float(rows[1]["TTS Speed Closest"]) < 1.0
+    assert list(rows[0])[-4:] == ["TTS Symbol Duration", "TTS Speed Closest", "Speaker", "Text"]
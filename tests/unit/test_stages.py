@@ -0,0 +1,70 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.stages import StageManifest
+
+
+def test_stage_reruns_only_when_fingerprint_changes(tmp_path):
+    source = tmp_path / "in.txt"
+    source.write_text("one")
+    output = tmp_path / "out.txt"
+    calls = []
+
+    def build():
+        calls.append(1)
+        output.write_text(source.read_text().upper())
+
+    def run(coef):
+        return StageManifest(tmp_path).run("upper", build, outputs=[output], inputs=[source], params={"coef": coef})
+
+    assert run(0.1)
+    assert not run(0.1)
+    assert run(0.2)
+    source.write_text("two")
+    assert run(0.2)
+    output.unlink()
+    assert run(0.2)
+    assert len(calls) == 4
+
+
+def test_existing_outputs_without_manifest_are_adopted(tmp_path):
+    output = tmp_path / "legacy.flac"
+    output.write_text("legacy")
+
+    manifest = StageManifest(tmp_path)
+    assert not manifest.run("mix", lambda: output.write_text("new"), outputs=[output])
+    assert output.read_text() == "legacy"
+    assert "mix" in StageManifest(tmp_path).stages
+
+
+def test_interrupted_stage_runs_again_even_with_recorded_params(tmp_path):
+    output = tmp_path / "out.txt"
+
+    def build():
+        output.write_text("done")
+
+    def crash():
+        output.write_text("trunc")
+        raise RuntimeError("killed")
+
+    assert StageManifest(tmp_path).run("extract", build, outputs=[output], params={"rate": 1})
+    try:
+        StageManifest(tmp_path).run("extract", crash, outputs=[output], params={"rate": 2})
+    except RuntimeError:
+        pass
+
+    assert StageManifest(tmp_path).run("extract", build, outputs=[output], params={"rate": 1})
+    assert output.read_text() == "done"
+
+
+def test_outputs_of_a_new_job_are_not_adopted(tmp_path):
+    job = tmp_path / "job"
+    output = job / "out.txt"
+    manifest = StageManifest(job)
+    job.mkdir()
+    output.write_text("partial")
+
+    assert manifest.run("extract", lambda: output.write_text("done"), outputs=[output])
+    assert output.read_text() == "done"
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.lazy_imports import LazyModule, check_startup_budget, measure_startup
+
+
+def test_cli_import_skips_heavy_modules_within_a_generous_budget():
+    # The tight budget is for the check_startup_budget CLI; here a loaded CI
+    # machine only has to stay far from a multi-second torch import.
+    ok, elapsed, heavy = check_startup_budget("srt2audiotrack.cli", budget=10.0)
+    assert heavy == []
+    assert ok, f"importing the CLI took {elapsed:.2f}s"
+
+
+def test_startup_check_catches_eager_imports_of_missing_packages(tmp_path, monkeypatch):
+    (tmp_path / "eager_cli.py").write_text("try:\n    import torch\nexcept ImportError:\n    pass\n")
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    _, heavy = measure_startup("eager_cli")
+    assert heavy == ["torch"]
+
+
+def test_lazy_module_imports_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+    lazy = LazyModule("colorsys")
+    assert "colorsys" not in sys.modules
+    assert lazy.rgb_to_hsv(0.0, 0.0, 0.0) == (0.0, 0.0, 0.0)
+    assert "colorsys" in sys.modules
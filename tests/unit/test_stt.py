@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("soxr")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack import stt
+
+
+def test_to_whisper_audio_downmixes_and_resamples():
+    stereo = np.zeros((24000, 2), dtype=np.float64)
+    audio = stt.to_whisper_audio(stereo, 24000)
+
+    assert audio.dtype == np.float32
+    assert audio.ndim == 1
+    assert len(audio) == stt.WHISPER_SAMPLE_RATE
+
+
+def test_create_model_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        stt.create_model(backend="vosk")
+
+
+def test_faster_whisper_batch_assigns_segments_to_their_clips():
+    from types import SimpleNamespace
+
+    backend = object.__new__(stt.FasterWhisperBackend)
+    backend.batch_size = 8
+    calls = []
+
+    def transcribe(audio, clip_timestamps, **_options):
+        calls.append(clip_timestamps)
+        # ``seek`` is the decoder frame offset, unrelated to the clip of a segment.
+        segments = [(0.0, "one"), (0.6, " two"), (2.1, "three"), (4.0, "four"), (4.7, " five")]
+        return [SimpleNamespace(start=start, seek=0, text=text) for start, text in segments], None
+
+    backend.pipeline = SimpleNamespace(transcribe=transcribe)
+    second = stt.WHISPER_SAMPLE_RATE
+    clips = [(np.ones(second, dtype=np.float32), second) for _ in range(3)]
+
+    assert backend.transcribe_batch(clips) == ["one two", "three", "four five"]
+    assert [window["start"] for window in calls[0]] == [0, 2 * second, 4 * second]
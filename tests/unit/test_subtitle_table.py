@@ -0,0 +1,97 @@
+import csv
+import importlib
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.segment_journal import SegmentJournal, write_audio_atomic
+from srt2audiotrack.subtitle_table import SubtitleTable, snapshot_path, table_files
+
+# test_output_folder installs stubs under these names; load the real modules.
+for name in ("subtitle_csv", "sync_utils"):
+    sys.modules.pop(f"srt2audiotrack.{name}", None)
+subtitle_csv = importlib.import_module("srt2audiotrack.subtitle_csv")
+sync_utils = importlib.import_module("srt2audiotrack.sync_utils")
+
+
+def _table():
+    return SubtitleTable({
+        "Number": [1, 2],
+        "Start Time": ["00:00:01,000", "00:00:02,500"],
+        "End Time": ["00:00:02,000", "00:00:03,000"],
+        "Duration": [1.0, 0.5],
+        "Symbol Duration": [0.1, 0.25],
+        "Text": ["[anna]: Hello there", "Hi"],
+    })
+
+
+def test_columns_are_typed_and_csv_is_a_view(tmp_path):
+    table = _table()
+    table.save(tmp_path / "lines.csv", csv_view=True)
+
+    assert table["Start Time"].tolist() == [1000, 2500]
+    assert table["Duration"].dtype == np.float64
+    with open(tmp_path / "lines.csv", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert rows == table.rows()
+    assert rows[1]["Start Time"] == "00:00:02,500"
+    assert snapshot_path(tmp_path / "lines.csv").exists()
+
+
+def test_load_prefers_snapshot_until_csv_is_edited(tmp_path, monkeypatch):
+    path = tmp_path / "lines.csv"
+    _table().save(path, csv_view=True)
+
+    with monkeypatch.context() as patched:
+        patched.setattr(SubtitleTable, "read_csv", classmethod(lambda cls, _path: pytest.fail("CSV parsed")))
+        assert SubtitleTable.load(path)["Text"].tolist() == ["[anna]: Hello there", "Hi"]
+
+    path.write_text(path.read_text(encoding="utf-8").replace('"Hi"', '"Hey"'), encoding="utf-8")
+    assert SubtitleTable.load(path)["Text"].tolist() == ["[anna]: Hello there", "Hey"]
+
+
+def test_tables_without_a_view_are_handed_on_as_snapshots(tmp_path):
+    path = tmp_path / "lines.csv"
+    path.write_text("stale view", encoding="utf-8")
+    _table().save(path)
+
+    assert not path.exists()
+    assert table_files(path) == [snapshot_path(path)]
+    assert SubtitleTable.load(path)["Start Time"].tolist() == [1000, 2500]
+
+
+def test_stages_annotate_the_table(tmp_path):
+    _table().save(tmp_path / "1.0.csv")
+    subtitle_csv.add_speaker_columns(tmp_path / "1.0.csv", tmp_path / "1.5.csv")
+    for index, frames in enumerate([36000, 24000]):
+        write_audio_atomic(SegmentJournal.segment_path(tmp_path, index), np.zeros(frames, dtype=np.float32), 24000)
+
+    sync_utils.correct_end_times_in_csv(tmp_path, tmp_path / "1.5.csv", tmp_path / "4.csv")
+
+    table = SubtitleTable.load(tmp_path / "4.csv")
+    assert table.fieldnames[-2:] == ["Speaker", "Text"]
+    assert table["Speaker"].tolist() == ["anna", ""]
+    assert table["Text"].tolist() == ["Hello there", "Hi"]
+    assert table["End Time"].tolist() == [2500, 3500]
+    assert table["Duration"].tolist() == [1.5, 1.0]
+    # Intermediate tables are snapshots only; the last one also has its CSV view.
+    assert not (tmp_path / "1.5.csv").exists()
+    assert (tmp_path / "4.csv").exists()
+
+
+def test_volume_intervals_are_integer_milliseconds(tmp_path):
+    pytest.importorskip("ffmpeg")
+    sys.modules.pop("srt2audiotrack.ffmpeg_utils", None)
+    ffmpeg_utils = importlib.import_module("srt2audiotrack.ffmpeg_utils")
+    _table().save(tmp_path / "lines.csv")
+
+    intervals = ffmpeg_utils.parse_volume_intervals(tmp_path / "lines.csv")
+
+    assert intervals.dtype == np.int64
+    assert intervals.tolist() == [[1000, 2000], [2500, 3000]]
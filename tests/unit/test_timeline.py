@@ -0,0 +1,43 @@
+import os
+import sys
+from datetime import timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.timeline import (
+    format_timestamp,
+    frames_to_ms,
+    ms_to_samples,
+    parse_timestamp,
+    parse_timestamps,
+    timedelta_to_ms,
+)
+
+
+def test_parse_accepts_comma_dot_and_short_fractions():
+    assert parse_timestamp("01:02:03,456") == 3723456
+    assert parse_timestamp(" 00:00:01.5 ") == 1500
+    assert parse_timestamp("00:00:02") == 2000
+    assert parse_timestamp("00:00:00,123999") == 123
+    assert parse_timestamps(["00:00:01,000", "00:00:00,250"]).tolist() == [1000, 250]
+
+
+def test_parse_rejects_other_formats():
+    with pytest.raises(ValueError, match="Invalid time format"):
+        parse_timestamp("1.5")
+
+
+def test_format_round_trips_and_truncates_timedeltas():
+    assert format_timestamp(parse_timestamp("26:59:59,999")) == "26:59:59,999"
+    assert timedelta_to_ms(timedelta(seconds=1, microseconds=999_999)) == 1999
+
+
+def test_sample_and_frame_conversions_truncate():
+    assert ms_to_samples(np.array([1001, 2500]), 44100).tolist() == [44144, 110250]
+    assert ms_to_samples(1001, 44100) == int(1.001 * 44100)
+    assert frames_to_ms(36000, 24000) == 1500
+    assert frames_to_ms(23999, 24000) == 999
@@ -0,0 +1,244 @@
+import csv
+import importlib
+import os
+import shutil
+import sys
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+sf = pytest.importorskip("soundfile")
+pytest.importorskip("tqdm")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+# test_output_folder installs stubs under these names; load the real modules.
+for name in ("subtitle_csv", "tts_audio"):
+    sys.modules.pop(f"srt2audiotrack.{name}", None)
+tts_audio = importlib.import_module("srt2audiotrack.tts_audio")
+
+from srt2audiotrack.segment_cache import SegmentCache
+from srt2audiotrack.subtitle_table import SubtitleTable
+from srt2audiotrack.validation import ValidationPolicy
+
+SR = 24000
+REF_TEXT = "ten chars!"
+
+
+class FakeTTS(tts_audio.F5TTS):
+    """F5TTS without models: takes are silent clips whose level encodes the line."""
+
+    def __init__(self, levels=None, stt_tiers=("large",), validation_policy=None):
+        self.target_sample_rate = SR
+        self.hop_length = 256
+        self.seed_policy = "random"
+        self.model_id = "fake-model"
+        self.inference_count = 0
+        self._references = {}
+        self.stt_tiers = list(stt_tiers)
+        # Skip Whisper unless a test asks for it.
+        self.validation_policy = validation_policy or ValidationPolicy(short_line_chars=10**6, short_line_sample=0.0)
+        self.levels = levels or {}
+        self.calls = []
+
+    def _take(self, text, seconds):
+        return np.full(int(seconds * SR), self.levels.get(text, 0.1), dtype=np.float32)
+
+    def infer_wav(self, gen_text, speed, ref_file, ref_text, file_wave=None, fix_duration=None):
+        self.inference_count += 1
+        self.calls.append(("single", gen_text, fix_duration))
+        seconds = fix_duration - self.get_reference(ref_file, ref_text).duration if fix_duration else 0.4
+        wav = self._take(gen_text, seconds)
+        return wav, SR, len(wav) / SR
+
+    def infer_batch(self, ref_file, ref_text, gen_texts, speeds=None, fix_durations=None, **_options):
+        self.inference_count += 1
+        self.calls.append(("batch", list(gen_texts), fix_durations))
+        return [(self._take(text, 0.4), SR) for text in gen_texts]
+
+    def get_stt_model(self, name):
+        return name
+
+
+@pytest.fixture
+def references(monkeypatch):
+    """Reference preprocessing without F5-TTS: one second of audio per reference."""
+
+    processed = []
+
+    def preprocess_ref_audio_text(ref_file, ref_text):
+        processed.append((ref_file, ref_text))
+        return ref_file, ref_text
+
+    monkeypatch.setattr(tts_audio, "_infer_utils",
+                        lambda: types.SimpleNamespace(preprocess_ref_audio_text=preprocess_ref_audio_text))
+    torchaudio = types.ModuleType("torchaudio")
+    torchaudio.load = lambda _path: (np.zeros((1, SR), dtype=np.float32), SR)
+    monkeypatch.setitem(sys.modules, "torchaudio", torchaudio)
+    return processed
+
+
+def _reference(folder, name="voice.wav"):
+    path = folder / name
+    sf.write(path, np.linspace(-0.5, 0.5, SR, dtype=np.float32), SR)
+    return str(path)
+
+
+def test_reference_is_preprocessed_once_per_content_and_text(tmp_path, references):
+    engine = FakeTTS()
+    ref_file = _reference(tmp_path)
+    copy = str(tmp_path / "copy.wav")
+    shutil.copy(ref_file, copy)
+
+    first = engine.get_reference(ref_file, REF_TEXT)
+    assert engine.get_reference(ref_file, REF_TEXT) is first
+    # Same audio under another name: keyed by content, not by path.
+    assert engine.get_reference(copy, REF_TEXT) is first
+    assert engine.get_reference(ref_file, "other text") is not first
+
+    assert references == [(ref_file, REF_TEXT), (ref_file, "other text")]
+    assert first.duration == 1.0
+    # Bytes of reference text per second, times the room left in 22 s.
+    assert first.max_chars == len(REF_TEXT) * 21
+
+
+def _rows(texts, speaker="spk"):
+    return [
+        {"Text": text, "Duration": "2.0", "Speaker": speaker, "TTS Speed Closest": "1.0", "TTS Symbol Duration": "0.05"}
+        for text in texts
+    ]
+
+
+def _subtitles(folder, texts):
+    """Subtitle table of ``texts`` (one speaker, 2 s each) saved with its CSV view."""
+
+    csv_file = folder / "film_3.0_output_speed.csv"
+    count = len(texts)
+    SubtitleTable({
+        "Number": range(1, count + 1),
+        "Start Time": [3000 * n for n in range(count)],
+        "End Time": [3000 * n + 2000 for n in range(count)],
+        "Duration": [2.0] * count,
+        "Text": texts,
+        "Speaker": ["spk"] * count,
+        "TTS Speed Closest": [1.0] * count,
+        "TTS Symbol Duration": [0.05] * count,
+    }).save(csv_file, csv_view=True)
+    return csv_file
+
+
+def _generate(engine, folder, csv_file, ref_file, monkeypatch, **options):
+    monkeypatch.setattr(tts_audio.subtitle_csv, "csv2excel", lambda *_args, **_kwargs: None)
+    speaker = {"ref_file": ref_file, "ref_text": REF_TEXT}
+    engine.generate_from_csv_with_speakers(csv_file, folder / "segments", {"spk": speaker}, speaker, **options)
+    with open(f"{str(csv_file)[:-4]}_errors.csv", encoding="utf-8", newline="") as report:
+        return list(csv.DictReader(report, delimiter=";"))
+
+
+def _segment_level(folder, index):
+    wav, _ = sf.read(folder / "segments" / f"segment_{index + 1}.wav", dtype="float32")
+    return round(float(wav[0]), 2)
+
+
+def test_group_for_batches_sorts_by_length_per_speaker_and_isolates_long_lines(tmp_path, references):
+    engine = FakeTTS()
+    ref_file, other = _reference(tmp_path), _reference(tmp_path, "other.wav")
+    long_text = "x" * (len(REF_TEXT) * 21 + 1)
+    texts = ["a longer line", "hi", long_text, "mid line", "yo"]
+    pending = [(i, row, f"segment_{i + 1}.wav", ref_file, REF_TEXT) for i, row in enumerate(_rows(texts))]
+    pending.append((5, _rows(["other voice"])[0], "segment_6.wav", other, REF_TEXT))
+
+    groups = engine.group_for_batches(pending, batch_size=2)
+
+    assert [[item[0] for item in group] for group in groups] == [[1, 4], [3, 0], [5], [2]]
+    assert engine.group_for_batches(pending, batch_size=1) == [[item] for item in pending]
+
+
+def test_batched_segments_are_written_in_row_order(tmp_path, references, monkeypatch):
+    texts = ["a longer line", "hi", "mid line", "yo"]
+    engine = FakeTTS(levels={text: (n + 1) / 10 for n, text in enumerate(texts)})
+    csv_file = _subtitles(tmp_path, texts)
+
+    report = _generate(engine, tmp_path, csv_file, _reference(tmp_path), monkeypatch, batch_size=2,
+                       duration_mode="search")
+
+    # Batches are synthesized shortest first ...
+    assert [call[1] for call in engine.calls] == [["hi", "yo"], ["mid line", "a longer line"]]
+    # ... but every take lands in the segment and report line of its row.
+    assert [_segment_level(tmp_path, n) for n in range(4)] == [0.1, 0.2, 0.3, 0.4]
+    assert [row["Text"] for row in report] == texts
+
+
+def test_fixed_mode_plans_single_chunk_lines_and_searches_long_ones(tmp_path, references):
+    engine = FakeTTS()
+    ref_file = _reference(tmp_path)
+    short, capped = _rows(["ten chars!", "x" * 60])
+    long_row = _rows(["x" * (len(REF_TEXT) * 21 + 1)])[0]
+
+    # Characters times the calibrated symbol duration, capped by the subtitle.
+    assert engine.planned_duration(short) == pytest.approx(0.5)
+    assert engine.planned_duration(capped) == pytest.approx(2.0)
+    assert engine.planned_duration({"Text": "hi", "Duration": "1.5"}) == 1.5
+    assert engine.row_duration_mode(short, ref_file, REF_TEXT) == "fixed"
+    assert engine.row_duration_mode(long_row, ref_file, REF_TEXT) == "search"
+    assert engine.row_duration_mode(short, ref_file, REF_TEXT, "search") == "search"
+
+    for row in (short, long_row):
+        engine.first_takes([(0, row, "segment_1.wav", ref_file, REF_TEXT)])
+    # fix_duration includes the one-second reference; the long line gets none.
+    assert engine.calls == [("single", short["Text"], pytest.approx(1.5)), ("single", long_row["Text"], None)]
+    assert engine.synthesis_target(short) == "fixed:0.500:limit=2.000"
+    assert engine.synthesis_target(long_row, "search") == "search:1.000:limit=2.000"
+
+
+def test_validation_escalates_only_lines_the_fast_tier_does_not_accept(monkeypatch):
+    policy = ValidationPolicy(accept_similarity=0.9, short_line_chars=4, short_line_sample=0.0)
+    engine = FakeTTS(stt_tiers=("fast", "large"), validation_policy=policy)
+    transcripts = {
+        "fast": {"clip-a": "Good morning.", "clip-b": "Good evening, sir", "clip-c": "No way"},
+        "large": {"clip-b": "Good morning, sir.", "clip-c": "Different text"},
+    }
+    transcribed = []
+
+    def wavs2txt(model, clips):
+        transcribed.append((model, [wav for wav, _ in clips]))
+        return [transcripts[model][wav] for wav, _ in clips]
+
+    monkeypatch.setattr(tts_audio.stt, "wavs2txt", wavs2txt)
+    items = [
+        ("clip-a", SR, "Good morning."),
+        ("clip-b", SR, "Good morning, sir."),
+        ("clip-c", SR, "Yes, indeed."),
+        ("clip-d", SR, "Ok."),
+    ]
+
+    outcomes = engine.validate_segments(items)
+
+    # One batch call per tier; the short line is never transcribed.
+    assert transcribed == [("fast", ["clip-a", "clip-b", "clip-c"]), ("large", ["clip-b", "clip-c"])]
+    assert [outcome[0] for outcome in outcomes] == [True, True, False, True]
+    assert [outcome[-1] for outcome in outcomes] == ["fast", "large", "large", "skipped"]
+
+
+def test_segment_cache_hit_skips_synthesis(tmp_path, references, monkeypatch):
+    texts = ["cached line", "fresh line"]
+    engine = FakeTTS(levels={"fresh line": 0.3})
+    csv_file = _subtitles(tmp_path, texts)
+    ref_file = _reference(tmp_path)
+    cache = SegmentCache(tmp_path / "cache")
+    cached_row = SubtitleTable.load(csv_file).rows()[0]
+    key = engine.segment_cache_key(cached_row, ref_file, REF_TEXT)
+    cache.put(key, np.full(SR // 2, 0.2, dtype=np.float32), SR, gen_error="0", similarity="1.00",
+              whisper_text="cached line", subtitle_text="cached line", validation_tier="large")
+
+    report = _generate(engine, tmp_path, csv_file, ref_file, monkeypatch, segment_cache=cache)
+
+    assert [call[1] for call in engine.calls] == ["fresh line"]
+    assert [_segment_level(tmp_path, n) for n in range(2)] == [0.2, 0.3]
+    # The cached validation result is reported without running Whisper again.
+    assert (report[0]["validation_tier"], report[0]["retries"]) == ("large", "0")
+    assert (cache.hits, cache.misses) == (1, 1)
+    # The fresh take is stored for the next job.
+    fresh_row = SubtitleTable.load(csv_file).rows()[1]
+    assert cache.get(engine.segment_cache_key(fresh_row, ref_file, REF_TEXT)) is not None
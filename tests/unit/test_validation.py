@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from srt2audiotrack.validation import ValidationPolicy, ValidationWorker
+
+
+def test_validation_worker_reports_results_off_thread():
+    results = []
+    threads = set()
+
+    def validate(items):
+        threads.add(threading.current_thread().name)
+        return [text.upper() for _, _, text in items]
+
+    worker = ValidationWorker(validate, lambda key, outcome: results.append((key, outcome)), maxsize=4, batch_size=3)
+    with worker:
+        for index, text in enumerate(["one", "two", "three"]):
+            worker.submit(index, None, 16000, text)
+
+    assert results == [(0, "ONE"), (1, "TWO"), (2, "THREE")]
+    assert threads == {"SegmentValidation"}
+
+
+def test_validation_worker_surfaces_errors_on_close():
+    def validate(items):
+        raise ValueError("whisper crashed")
+
+    worker = ValidationWorker(validate, lambda key, outcome: None)
+    with pytest.raises(RuntimeError):
+        with worker:
+            worker.submit(0, None, 16000, "line")
+
+
+def test_validation_policy_samples_short_lines_deterministically():
+    policy = ValidationPolicy(short_line_chars=10, short_line_sample=0.5)
+    lines = [f"hi {n}" for n in range(200)]
+
+    picked = [line for line in lines if policy.should_validate(line)]
+
+    assert 0 < len(picked) < len(lines)
+    assert picked == [line for line in lines if policy.should_validate(line)]
+    assert policy.should_validate("a line long enough to always be checked")
+    assert not ValidationPolicy(short_line_chars=10, short_line_sample=0.0).should_validate("hi")
+
+
+def test_validation_policy_accepts_exact_or_similar_enough():
+    policy = ValidationPolicy(accept_similarity=0.9)
+
+    assert policy.accepts(True, 0.5)
+    assert policy.accepts(False, 0.95)
+    assert not policy.accepts(False, 0.8)